@@ -0,0 +1,266 @@
+"""Failure alerting module."""
+
+import functools
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Tuple
+
+from .aws_clients import get_client
+from .status_table import StatusTable
+
+ALERT_WINDOW_SECONDS = 60.0
+
+# failures of other processes reaching the status table after the window closed
+ALERT_FLUSH_DELAY_SECONDS = 5.0
+
+ALERT_ITEM_PREFIX = 'alert-window#'
+
+ALERT_FLUSHED_SUFFIX = '#flushed'
+
+# window item attributes counting the failures of each signature
+SIGNATURE_ATTRIBUTE_PREFIX = 'signature_'
+
+# alert windows are removed by the status table TTL (`expires_at` attribute) after a day
+ALERT_ITEM_TTL_SECONDS = 24 * 60 * 60
+
+ALERT_SUBJECT = 'PMI DAG run failures'
+
+# SNS limits (the message limit is in bytes, keep a margin for multi-byte characters)
+SNS_SUBJECT_MAX_LENGTH = 100
+SNS_MESSAGE_MAX_LENGTH = 64 * 1024
+
+_ERROR_VARIABLE_PARTS = re.compile(r'0x[0-9a-fA-F]+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+')
+
+
+def error_signature(error: str) -> str:
+    """Returns the error without variable parts (numbers, ids), used to dedupe similar errors."""
+    first_line = error.strip().splitlines()[0] if error.strip() else ''
+    return _ERROR_VARIABLE_PARTS.sub('#', first_line)[:200]
+
+
+class FailureAlert(NamedTuple):
+    """Single task failure."""
+
+    dag_id: str
+    task_id: str
+    execution_date: str
+    hostname: str
+    error: str
+
+    @property
+    def signature(self) -> Tuple[str, str, str]:
+        """Key used to dedupe failures (DAG, task and exception signature)."""
+        return self.dag_id, self.task_id, error_signature(self.error)
+
+
+def format_alert(alert: FailureAlert, occurrences: int = 1) -> str:
+    """Formats a failure (and the number of its similar failures) as a block of an alert message."""
+    lines = [
+        f'DAG:             {alert.dag_id}',
+        f'Task:            {alert.task_id}',
+        f'Execution Date:  {alert.execution_date}',
+        f'Host:            {alert.hostname}',
+        f'Error:           {alert.error}',
+    ]
+    if occurrences > 1:
+        lines.append(f'Occurrences:     {occurrences}')
+    return '\n'.join(lines)
+
+
+def _truncate(message: str) -> str:
+    if len(message) > SNS_MESSAGE_MAX_LENGTH:
+        message = message[:SNS_MESSAGE_MAX_LENGTH - 20] + '\n... (truncated)'
+    return message
+
+
+def format_digest(failures: Sequence[Tuple[FailureAlert, int]], window_start: float, window: float) -> str:
+    """Formats the failures of a window as a single digest message.
+
+    Parameters
+    ----------
+    failures
+        First failure of each signature and the number of failures of the signature.
+    window_start
+        Start of the window in seconds since the epoch.
+    window
+        Window length in seconds.
+
+    """
+    start = datetime.fromtimestamp(window_start, timezone.utc)
+    end = datetime.fromtimestamp(window_start + window, timezone.utc)
+    lines = [
+        f'{sum(occurrences for _, occurrences in failures)} Airflow task failure(s) '
+        f'of {len(failures)} kind(s) between {start:%Y-%m-%d %H:%M:%S} and {end:%H:%M:%S} UTC',
+    ]
+    for alert, occurrences in failures:
+        lines += ['', format_alert(alert, occurrences)]
+    return _truncate('\n'.join(lines))
+
+
+def alert_item_id(window_start: int, digest: str = None) -> str:
+    """Returns the status table item id of an alert window or of a failure signature (digest) within it."""
+    if digest is None:
+        return f'{ALERT_ITEM_PREFIX}{window_start}'
+    return f'{ALERT_ITEM_PREFIX}{window_start}#{digest}'
+
+
+def signature_digest(signature: Tuple[str, str, str]) -> str:
+    """Returns a short digest of a failure signature."""
+    return hashlib.sha256('\n'.join(signature).encode('utf-8')).hexdigest()[:32]
+
+
+def _start_timer(delay: float, function: Callable[[], Any]):
+    # not a daemon thread, the interpreter waits for the flush before the process exits
+    timer = threading.Timer(delay, function)
+    timer.daemon = False
+    timer.start()
+
+
+class SnsPublisher:
+    """Publishes alerts to an SNS topic using the shared SNS client.
+
+    Parameters
+    ----------
+    target_arn
+        SNS topic ARN.
+    aws_conn_id
+        Airflow AWS connection id.
+    region_name
+        AWS region name.
+    client
+        Optional SNS client (e.g. a local fake), defaults to the shared client.
+
+    """
+
+    def __init__(self, target_arn: str, aws_conn_id: str, region_name: str, client: Any = None):
+        self._target_arn = target_arn
+        self._aws_conn_id = aws_conn_id
+        self._region_name = region_name
+        self._client = client
+
+    def __call__(self, subject: str, message: str):
+        client = self._client or get_client('sns', self._aws_conn_id, self._region_name)
+        client.publish(
+            TargetArn=self._target_arn,
+            Subject=subject[:SNS_SUBJECT_MAX_LENGTH],
+            Message=message,
+        )
+
+
+class AlertAggregator:
+    """Collects the failures of a time window across processes and publishes them as one digest.
+
+    Airflow runs failure callbacks in separate short-lived processes (task runners, DAG file
+    processors), so the failures are collected in the status table. Time is split into windows of
+    the whole environment. The first failure of a signature (DAG, task and exception signature) in
+    a window is stored, later ones only increment its counter. The process adding the first
+    failure of a window opens it and flushes its digest from a background thread when the window
+    closes (the process waits for the flush before exiting). The opener of a window also flushes
+    the previous window, in case its opener died before doing so. Each digest is published once.
+
+    Failures are published directly, without deduplication, when the status table fails.
+
+    Parameters
+    ----------
+    status_table
+        Status table collecting the failures, `None` to publish every failure directly.
+    publish
+        Callable accepting the alert subject and message.
+    window
+        Alert window in seconds.
+    subject
+        Alert subject.
+    clock
+        Time source returning seconds since the epoch.
+    schedule
+        Callable running a function after a delay in seconds, a background timer by default.
+
+    """
+
+    def __init__(
+            self,
+            status_table: Optional[StatusTable],
+            publish: Callable[[str, str], None],
+            window: float = ALERT_WINDOW_SECONDS,
+            subject: str = ALERT_SUBJECT,
+            clock: Callable[[], float] = time.time,
+            schedule: Callable[[float, Callable[[], Any]], None] = _start_timer,
+    ):
+        self._status_table = status_table
+        self._publish = publish
+        self._window = window
+        self._subject = subject
+        self._clock = clock
+        self._schedule = schedule
+
+    def add(self, alert: FailureAlert) -> bool:
+        """Records a failure. Returns `True` if it opened a window (and scheduled the digest)."""
+        now = self._clock()
+        window_start = int(now // self._window * self._window)
+        expires_at = int(now + ALERT_ITEM_TTL_SECONDS)
+        digest = signature_digest(alert.signature)
+        opened = False
+        try:
+            if self._status_table is None:
+                raise RuntimeError('No status table to collect the failures in')
+            opened = self._status_table.put_if_absent({'id': alert_item_id(window_start), 'expires_at': expires_at})
+            self._status_table.put_if_absent({
+                'id': alert_item_id(window_start, digest),
+                'alert': alert._asdict(),
+                'expires_at': expires_at,
+            })
+            self._status_table.increment(alert_item_id(window_start), SIGNATURE_ATTRIBUTE_PREFIX + digest)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception('Failed to collect the failure alert, publishing it directly')
+            self._send(_truncate(f'Airflow task failure\n\n{format_alert(alert)}'))
+
+        if opened:
+            for flushed_window_start in (window_start - int(self._window), window_start):
+                flush_at = flushed_window_start + self._window + ALERT_FLUSH_DELAY_SECONDS
+                self._schedule(max(flush_at - now, 0.0), functools.partial(self.flush, flushed_window_start))
+        return opened
+
+    def flush(self, window_start: int) -> bool:
+        """Publishes the digest of a window unless it has been published. Returns `True` if it was published."""
+        try:
+            window_item = self._status_table.get(alert_item_id(window_start), consistent=True)
+            if window_item is None or not self._status_table.put_if_absent({
+                    'id': alert_item_id(window_start) + ALERT_FLUSHED_SUFFIX,
+                    'expires_at': int(self._clock() + ALERT_ITEM_TTL_SECONDS),
+            }):
+                return False
+
+            occurrences = {
+                attribute[len(SIGNATURE_ATTRIBUTE_PREFIX):]: count
+                for attribute, count in window_item.items()
+                if attribute.startswith(SIGNATURE_ATTRIBUTE_PREFIX)
+            }
+            items = self._status_table.batch_get(
+                [alert_item_id(window_start, digest) for digest in occurrences], consistent=True,
+            )
+            failures = sorted(
+                (
+                    (FailureAlert(**items[alert_item_id(window_start, digest)]['alert']), count)
+                    for digest, count in occurrences.items()
+                    if alert_item_id(window_start, digest) in items
+                ),
+                key=lambda failure: -failure[1],
+            )
+            message = format_digest(failures, window_start, self._window)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.exception('Failed to read the failure alerts of window %s', window_start)
+            start = datetime.fromtimestamp(window_start, timezone.utc)
+            message = f'Airflow tasks failed after {start:%Y-%m-%d %H:%M:%S} UTC, the failures could not be read: {exc}'
+        return self._send(message)
+
+    def _send(self, message: str) -> bool:
+        try:
+            self._publish(self._subject, message)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception('Failed to publish failure alert:\n%s', message)
+            return False
+        return True
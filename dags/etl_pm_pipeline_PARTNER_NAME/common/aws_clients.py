@@ -0,0 +1,52 @@
+"""Shared AWS clients module."""
+
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+from botocore.config import Config
+from airflow.contrib.hooks.aws_hook import AwsHook
+
+MAX_POOL_CONNECTIONS = 50
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[int, str, str, str], Any] = {}
+
+
+def get_client(service_name: str, aws_conn_id: str, region_name: str = None) -> Any:
+    """Returns a boto3 client shared by the whole process.
+
+    Clients are created once per service, Airflow AWS connection and region and keep their HTTP
+    connection pool between calls. boto3 clients are thread safe, but not fork safe, so forked
+    processes get their own clients.
+
+    Parameters
+    ----------
+    service_name
+        AWS service name (e.g. "ecs", "sns").
+    aws_conn_id
+        Airflow AWS connection id.
+    region_name
+        Optional AWS region name, defaults to the region of the connection.
+
+    """
+    key = (os.getpid(), service_name, aws_conn_id, region_name)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            session = AwsHook(aws_conn_id).get_session(region_name=region_name)
+            client = session.client(
+                service_name,
+                region_name=region_name,
+                config=Config(max_pool_connections=MAX_POOL_CONNECTIONS, retries={'max_attempts': 10}),
+            )
+            _clients[key] = client
+        return client
+
+
+class SharedClientAwsHook(AwsHook):
+    """AWS hook handing out the shared clients instead of creating a new client for every call."""
+
+    def get_client_type(self, client_type, region_name=None, config=None):
+        # pylint: disable=unused-argument
+        return get_client(client_type, self.aws_conn_id, region_name)
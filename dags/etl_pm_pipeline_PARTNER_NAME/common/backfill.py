@@ -0,0 +1,72 @@
+"""Backfill planning module."""
+
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+BACKFILL_GRANULARITIES = {
+    'day': timedelta(days=1),
+    'hour': timedelta(hours=1),
+}
+
+MAX_BACKFILL_CHUNKS = 24 * 92
+
+
+def plan_backfill(
+        start_date: datetime,
+        end_date: datetime,
+        granularity: str = 'day',
+) -> List[Tuple[datetime, datetime]]:
+    """Splits a date range into consecutive chunks.
+
+    Parameters
+    ----------
+    start_date
+        Start of the range (inclusive).
+    end_date
+        End of the range (exclusive).
+    granularity
+        Chunk size, one of `BACKFILL_GRANULARITIES` ("day" or "hour"). The last chunk is shorter
+        if the range is not a multiple of the chunk size.
+
+    Returns
+    -------
+    List[Tuple[datetime, datetime]]
+        List of `(start, end)` chunks covering the range.
+
+    """
+    if granularity not in BACKFILL_GRANULARITIES:
+        raise ValueError(f'Unsupported backfill granularity "{granularity}", use one of {sorted(BACKFILL_GRANULARITIES)}')
+    if end_date <= start_date:
+        raise ValueError(f'Backfill end date {end_date} must be after start date {start_date}')
+
+    step = BACKFILL_GRANULARITIES[granularity]
+    chunk_count = -(-(end_date - start_date) // step)
+    if chunk_count > MAX_BACKFILL_CHUNKS:
+        raise ValueError(
+            f'Backfill from {start_date} to {end_date} by {granularity} has {chunk_count} chunks, '
+            f'the maximum is {MAX_BACKFILL_CHUNKS}'
+        )
+
+    return [
+        (start_date + index * step, min(start_date + (index + 1) * step, end_date))
+        for index in range(chunk_count)
+    ]
+
+
+def backfill_parallelism(max_active_runs: int, concurrency: int, max_parallelism: int = None) -> int:
+    """Returns the number of chunks one DAG run may process in parallel.
+
+    The DAG `concurrency` (running task instances across all runs) is shared evenly by
+    `max_active_runs` runs.
+    """
+    parallelism = max(concurrency // max(max_active_runs, 1), 1)
+    if max_parallelism is not None:
+        parallelism = min(parallelism, max_parallelism)
+    return parallelism
+
+
+def assign_chunks(chunks: Sequence[T], slots: int) -> List[List[T]]:
+    """Distributes chunks round-robin over a fixed number of parallel slots."""
+    return [list(chunks[slot::slots]) for slot in range(slots)]
@@ -0,0 +1,54 @@
+"""Deployment environment state shared by PMI DAGs."""
+
+from typing import Any, Mapping
+
+from .instance_identity import get_instance_identity
+
+# team owning the DAGs and AWS resources of the project
+TEAM = 'weedwackers'
+
+
+class DagEnvironment:
+    """Deployment environment state derived once and shared by all DAGs of the environment.
+
+    Parameters
+    ----------
+    app_name
+        Project's AWS app (stack) name.
+    env_config
+        Deployment environment configuration (see `PMIDAG`).
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, app_name: str, env_config: Mapping[str, Any]):
+        self.app_name = app_name
+        self.env_config = env_config
+        self.env_id = env_config['env_id']
+
+        # get AWS environment configuration from the Airflow instance
+        if '_aws_env' in env_config:  # local deployment
+            self.aws_env = env_config['_aws_env']
+        else:
+            self.aws_env = get_instance_identity()
+
+        self.region_designator = ''.join(part[0] for part in self.aws_env['region'].split('-'))
+        self.assets_location = env_config['assets_location']
+        self.deployment_version_major = env_config['deployment_version'].split('.')[0]
+
+        # AWS Cloudformation stacks
+        self.aws_stack_shared = f'etl-pm-shared-{self.env_id}'
+        self.aws_stack_prereqs = f'{app_name}-{self.env_id}-prereqs'
+
+        # default operator arguments
+        self.default_args = {
+            'owner': TEAM,
+            'queue': f"{env_config['airflow_cluster_id']}.{self.env_id}",
+            'depends_on_past': False,
+            'retries': 0,
+            'email_on_failure': False,
+            'email_on_retry': False,
+        }
+
+    def aws_stack_main(self, pipeline_name: str) -> str:
+        """Name of the main AWS Cloudformation stack of a pipeline."""
+        return f'{self.app_name}-{self.env_id}-{pipeline_name}'
@@ -0,0 +1,79 @@
+"""Config-driven DAG factory module."""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Type
+
+from .dag_environment import DagEnvironment
+from .pmi_dag import PMIDAG
+
+_DAG_CLASSES: Dict[str, Type[PMIDAG]] = {}
+
+
+def register_dag(name: str) -> Callable[[Type[PMIDAG]], Type[PMIDAG]]:
+    """Class decorator registering a DAG class with the factory.
+
+    Pipelines use the DAG class registered under their own name, unless the pipeline's `dag`
+    configuration selects another class with the `dag_class` property.
+
+    DAG classes must accept `(app_name, env_config, pipeline_name=..., environment=...)`.
+    """
+
+    def decorator(dag_class: Type[PMIDAG]) -> Type[PMIDAG]:
+        registered = _DAG_CLASSES.get(name)
+        # re-registering the same class (e.g. when its module is reloaded) is allowed
+        if registered is not None and _qualified_name(registered) != _qualified_name(dag_class):
+            raise ValueError(f'DAG class "{name}" is already registered: {_qualified_name(registered)}')
+        _DAG_CLASSES[name] = dag_class
+        return dag_class
+
+    return decorator
+
+
+def _qualified_name(dag_class: Type[PMIDAG]) -> str:
+    return f'{dag_class.__module__}.{dag_class.__qualname__}'
+
+
+def registered_dag_classes() -> Mapping[str, Type[PMIDAG]]:
+    """Returns all registered DAG classes by their registration name."""
+    return dict(_DAG_CLASSES)
+
+
+def create_dags(app_name: str, env_config: Mapping[str, Any]) -> 'OrderedDict[str, PMIDAG]':
+    """Creates DAGs for all pipelines in the deployment environment configuration.
+
+    Environment state is derived once and shared by all created DAGs.
+
+    Parameters
+    ----------
+    app_name
+        Project's AWS app (stack) name.
+    env_config
+        Deployment environment configuration (see `PMIDAG`).
+
+    Returns
+    -------
+    OrderedDict[str, PMIDAG]
+        Created DAGs by pipeline name.
+
+    """
+    environment = DagEnvironment(app_name, env_config)
+
+    dags = OrderedDict()
+    for pipeline_name, pipeline_config in env_config['pipelines'].items():
+        dag_class_name = pipeline_config['dag'].get('dag_class', pipeline_name)
+        try:
+            dag_class = _DAG_CLASSES[dag_class_name]
+        except KeyError:
+            raise ValueError(
+                f'No DAG class registered as "{dag_class_name}" for pipeline "{pipeline_name}", '
+                f'registered classes: {sorted(_DAG_CLASSES)}'
+            ) from None
+
+        dags[pipeline_name] = dag_class(
+            app_name,
+            env_config,
+            pipeline_name=pipeline_name,
+            environment=environment,
+        )
+
+    return dags
@@ -0,0 +1,239 @@
+"""Deployment environment configuration loading module.
+
+The configuration is loaded with `importlib.resources` and validated against the
+`envs-config.schema.json` schema, shipped as data of the DAGs package, only when the
+configuration file changes. Validated configurations are kept as snapshots keyed by the file's
+modification time and content hash, both in memory and on disk, so that repeated DAG file parsing
+does not pay for reading, parsing and validating an unchanged configuration. On-disk snapshots are
+kept in a directory private to the Airflow user and are ignored when anyone else could have
+written them (see `local_cache`), as a trusted snapshot skips the validation.
+
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import threading
+from collections.abc import Mapping as AbcMapping
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from .local_cache import cache_file_path, read_json_cache, write_json_cache
+
+try:
+    from importlib.resources import files as resource_files
+except ImportError:  # Python < 3.9
+    from importlib_resources import files as resource_files
+
+ENV_CONFIG_RESOURCE = 'env-config.json'
+
+ENV_CONFIG_SCHEMA_RESOURCE = 'envs-config.schema.json'
+
+# the DAGs package (etl_pm_pipeline_PARTNER_NAME) containing the schema
+ENV_CONFIG_SCHEMA_ANCHOR = __package__.rsplit('.', 1)[0]
+
+
+class FrozenMapping(AbcMapping):
+    """Immutable mapping.
+
+    Copying a frozen mapping returns the mapping itself, so it can be shared by any number of
+    DAGs (Airflow deep-copies DAGs, e.g. when clearing tasks).
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = dict(data)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._data!r})'
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (self._data,)
+
+
+def freeze(value: Any) -> Any:
+    """Recursively converts dictionaries to frozen mappings and lists to tuples."""
+    if isinstance(value, AbcMapping):
+        return FrozenMapping({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class _Snapshot:
+    """Validated configuration snapshot."""
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, mtime_ns: Optional[int], size: int, sha256: str, config: Dict[str, Any]):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+        self.config = config
+        self._frozen = None
+
+    @property
+    def frozen(self) -> FrozenMapping:
+        if self._frozen is None:
+            self._frozen = freeze(self.config)
+        return self._frozen
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'mtime_ns': self.mtime_ns, 'size': self.size, 'sha256': self.sha256, 'config': self.config}
+
+    @classmethod
+    def from_json(cls, data: Any) -> Optional['_Snapshot']:
+        try:
+            return cls(data['mtime_ns'], data['size'], data['sha256'], data['config'])
+        except (KeyError, TypeError):
+            return None
+
+
+_lock = threading.Lock()
+_snapshots: Dict[str, _Snapshot] = {}
+
+
+def _resource(anchor: str, resource: str):
+    """Returns a traversable resource located next to the anchor module (or in the anchor package)."""
+    try:
+        return resource_files(anchor).joinpath(resource)
+    except TypeError:
+        # plain modules (e.g. DAG files loaded by Airflow) are only accepted as anchors
+        # since Python 3.12, use the directory of the module instead
+        return pathlib.Path(os.path.dirname(os.path.abspath(sys.modules[anchor].__file__)), resource)
+
+
+def _stat(traversable) -> Optional[os.stat_result]:
+    """Returns file system stats of a resource or `None` if it is not a regular file (e.g. zipped)."""
+    if not isinstance(traversable, pathlib.Path):
+        return None
+    try:
+        return traversable.stat()
+    except OSError:
+        return None
+
+
+def _schema(anchor: str, schema_resource: str) -> Dict[str, Any]:
+    """Returns the single environment schema derived from the all environments schema."""
+    traversable = _resource(anchor, schema_resource)
+    if not traversable.is_file():
+        raise FileNotFoundError(f'Environment configuration schema {schema_resource} not found in {anchor}')
+
+    schema = json.loads(traversable.read_bytes())
+    env_schema = dict(next(iter(schema['patternProperties'].values())))
+    # the deployment adds environment specific properties (env_id, aws_resources, etc.)
+    env_schema.pop('additionalProperties', None)
+    env_schema['definitions'] = schema.get('definitions', {})
+    return env_schema
+
+
+def _validate(anchor: str, schema_resource: str, config: Mapping[str, Any]):
+    env_schema = _schema(anchor, schema_resource)
+
+    import jsonschema  # pylint: disable=import-outside-toplevel
+    jsonschema.validate(config, env_schema)
+
+
+def _snapshot_path(resource_key: str) -> str:
+    return cache_file_path(f"env-config-{hashlib.sha1(resource_key.encode('utf-8')).hexdigest()[:16]}")
+
+
+def _load_snapshot(
+        anchor: str,
+        resource: str,
+        schema_anchor: str,
+        schema_resource: str,
+        snapshot_path: Optional[str],
+) -> _Snapshot:
+    traversable = _resource(anchor, resource)
+    resource_key = str(traversable)
+    snapshot_path = snapshot_path or _snapshot_path(resource_key)
+    stat = _stat(traversable)
+
+    # unchanged modification time - reuse the in-memory or the on-disk snapshot
+    snapshot = _snapshots.get(resource_key)
+    if snapshot is None and stat is not None:
+        snapshot = _Snapshot.from_json(read_json_cache(snapshot_path))
+    if (
+            snapshot is not None
+            and stat is not None
+            and (snapshot.mtime_ns, snapshot.size) == (stat.st_mtime_ns, stat.st_size)
+    ):
+        _snapshots[resource_key] = snapshot
+        return snapshot
+
+    # changed modification time - validate only if the content changed as well
+    content = traversable.read_bytes()
+    sha256 = hashlib.sha256(content).hexdigest()
+    mtime_ns = stat.st_mtime_ns if stat is not None else None
+    if snapshot is not None and snapshot.sha256 == sha256:
+        snapshot.mtime_ns = mtime_ns
+    else:
+        config = json.loads(content)
+        _validate(schema_anchor, schema_resource, config)
+        snapshot = _Snapshot(mtime_ns, len(content), sha256, config)
+
+    if stat is not None:
+        write_json_cache(snapshot_path, snapshot.to_json())
+    _snapshots[resource_key] = snapshot
+    return snapshot
+
+
+def load_env_config(
+        anchor: str,
+        resource: str = ENV_CONFIG_RESOURCE,
+        *,
+        schema_anchor: str = ENV_CONFIG_SCHEMA_ANCHOR,
+        schema_resource: str = ENV_CONFIG_SCHEMA_RESOURCE,
+        frozen: bool = False,
+        snapshot_path: str = None,
+) -> Mapping[str, Any]:
+    """Loads the deployment environment configuration.
+
+    Parameters
+    ----------
+    anchor
+        Name of the package containing the configuration, or of a module located next to it
+        (typically `__name__` of the DAG file).
+    resource
+        Name of the configuration resource.
+    schema_anchor
+        Name of the package containing the schema, the DAGs package by default.
+    schema_resource
+        Name of the schema resource. A missing schema raises `FileNotFoundError`, the
+        configuration is never used unvalidated.
+    frozen
+        Return the configuration as an immutable mapping. The same mapping instance is returned
+        for as long as the configuration does not change, so all DAGs share it.
+    snapshot_path
+        Optional location of the on-disk snapshot (defaults to a file in the per-user cache
+        directory). Snapshots writable by other users are ignored.
+
+    Returns
+    -------
+    Mapping[str, Any]
+        A copy of the configuration, or the shared immutable configuration if `frozen` is set.
+
+    """
+    with _lock:
+        snapshot = _load_snapshot(anchor, resource, schema_anchor, schema_resource, snapshot_path)
+        if frozen:
+            return snapshot.frozen
+        return copy.deepcopy(snapshot.config)
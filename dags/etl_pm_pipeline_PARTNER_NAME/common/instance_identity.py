@@ -0,0 +1,154 @@
+"""AWS instance identity lookup module.
+
+See https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/instance-identity-documents.html for details.
+
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+import requests
+
+from .local_cache import cache_file_path, read_json_cache, remove_json_cache, write_json_cache
+
+IMDS_URL = 'http://169.254.169.254/latest'
+
+
+class InstanceIdentityProvider:
+    """Instance identity document lookup backed by an in-memory and an on-disk cache.
+
+    The instance metadata service (IMDS) is only queried when both caches are cold or expired.
+    IMDSv2 session tokens are reused until they expire and all requests are bounded by a hard
+    timeout. If IMDS cannot be reached, an expired on-disk document is used as a fallback.
+
+    Parameters
+    ----------
+    timeout
+        Timeout (in seconds) of each IMDS request.
+    cache_path
+        Location of the on-disk cache shared by all processes of the user on the host. The cache
+        is ignored unless the file and its directory are writable only by the current user.
+    cache_ttl
+        Maximum age (in seconds) of a cached identity document.
+    token_ttl
+        Requested IMDSv2 session token lifetime (in seconds).
+
+    """
+
+    DOCUMENT_URL = f'{IMDS_URL}/dynamic/instance-identity/document'
+
+    TOKEN_URL = f'{IMDS_URL}/api/token'
+
+    TOKEN_REFRESH_MARGIN = 60
+
+    def __init__(
+            self,
+            timeout: float = 1.0,
+            cache_path: str = None,
+            cache_ttl: float = 3600,
+            token_ttl: int = 21600,
+    ):
+        self._timeout = timeout
+        self._cache_path = cache_path or cache_file_path('instance-identity')
+        self._cache_ttl = cache_ttl
+        self._token_ttl = token_ttl
+
+        self._lock = threading.Lock()
+        self._document = None
+        self._document_expires_at = 0.0
+        self._token = None
+        self._token_expires_at = 0.0
+
+    def get_document(self) -> Mapping[str, Any]:
+        """Returns the instance identity document."""
+        with self._lock:
+            if self._document is None or time.monotonic() >= self._document_expires_at:
+                self._document = self._load_document()
+                self._document_expires_at = time.monotonic() + self._cache_ttl
+            return self._document
+
+    def invalidate(self):
+        """Drops all cached data (including the on-disk cache)."""
+        with self._lock:
+            self._document = None
+            self._token = None
+            remove_json_cache(self._cache_path)
+
+    def _load_document(self) -> Mapping[str, Any]:
+        document = read_json_cache(self._cache_path, max_age=self._cache_ttl)
+        if document is not None:
+            return document
+
+        try:
+            document = self._fetch_document()
+        except (requests.RequestException, ValueError) as exc:
+            document = read_json_cache(self._cache_path)
+            if document is None:
+                raise
+            logging.warning('Instance identity lookup failed (%s), using an expired cached document', exc)
+            return document
+
+        write_json_cache(self._cache_path, document)
+        return document
+
+    def _fetch_document(self) -> Mapping[str, Any]:
+        response = requests.get(self.DOCUMENT_URL, headers=self._token_headers(), timeout=self._timeout)
+        if response.status_code == 401 and self._token is not None:
+            # the session token has been revoked, request a new one and try again
+            self._token = None
+            response = requests.get(self.DOCUMENT_URL, headers=self._token_headers(), timeout=self._timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _token_headers(self) -> Mapping[str, str]:
+        token = self._get_token()
+        return {'X-aws-ec2-metadata-token': token} if token else {}
+
+    def _get_token(self) -> Optional[str]:
+        """Returns an IMDSv2 session token or `None` if only IMDSv1 is available."""
+        now = time.monotonic()
+        if self._token is not None and now < self._token_expires_at:
+            return self._token
+
+        try:
+            response = requests.put(
+                self.TOKEN_URL,
+                headers={'X-aws-ec2-metadata-token-ttl-seconds': str(self._token_ttl)},
+                timeout=self._timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            logging.warning('IMDSv2 token request failed (%s), falling back to IMDSv1', exc)
+            self._token = None
+            return None
+
+        self._token = response.text
+        self._token_expires_at = now + self._token_ttl - self.TOKEN_REFRESH_MARGIN
+        return self._token
+
+
+_provider_lock = threading.Lock()
+_provider: Optional[InstanceIdentityProvider] = None
+
+
+def get_instance_identity_provider() -> InstanceIdentityProvider:
+    """Returns the process-wide instance identity provider.
+
+    The on-disk cache location can be changed with the `PMI_INSTANCE_IDENTITY_CACHE_PATH`
+    environment variable, it must be in a directory writable only by the Airflow user.
+    """
+    global _provider  # pylint: disable=global-statement
+    with _provider_lock:
+        if _provider is None:
+            _provider = InstanceIdentityProvider(
+                cache_path=os.environ.get('PMI_INSTANCE_IDENTITY_CACHE_PATH'),
+            )
+        return _provider
+
+
+def get_instance_identity() -> Mapping[str, Any]:
+    """Returns the instance identity document of the current host."""
+    return get_instance_identity_provider().get_document()
@@ -0,0 +1,95 @@
+"""Small on-disk JSON cache shared by Airflow processes running on the same host.
+
+Cache files are kept in a directory private to the current user (mode 0700). Files of
+directories or owners that other users could have written to are ignored, so a file planted in
+the shared temp directory is never trusted.
+"""
+
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+from typing import Any, Optional
+
+
+def cache_directory() -> str:
+    """Returns the cache directory of the current user (in the temp directory)."""
+    return os.path.join(tempfile.gettempdir(), f'etl-pm-pipeline-PARTNER_NAME-{os.getuid()}')
+
+
+def cache_file_path(name: str) -> str:
+    """Returns the default location of a named cache file."""
+    return os.path.join(cache_directory(), f'{name}.json')
+
+
+def _is_private(file_stat: os.stat_result) -> bool:
+    """Whether the file is owned by the current user and not writable by anyone else."""
+    return file_stat.st_uid == os.getuid() and not file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def read_json_cache(path: str, max_age: float = None) -> Optional[Any]:
+    """Reads a cached value.
+
+    Parameters
+    ----------
+    path
+        Cache file location.
+    max_age
+        Optional maximum age of the cached value in seconds. Older values are ignored.
+
+    Returns
+    -------
+    Any
+        The cached value or `None` if there is no (valid) cached value.
+
+    """
+    try:
+        if not _is_private(os.stat(os.path.dirname(path) or '.')):
+            logging.warning('Ignoring cache file %s, its directory is writable by other users', path)
+            return None
+        file_descriptor = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        with os.fdopen(file_descriptor, 'r') as cache_file:
+            if not _is_private(os.fstat(cache_file.fileno())):
+                logging.warning('Ignoring cache file %s, it is writable by other users', path)
+                return None
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(entry, dict) or 'value' not in entry:
+        return None
+    if max_age is not None and time.time() - entry.get('created_at', 0) >= max_age:
+        return None
+    return entry['value']
+
+
+def write_json_cache(path: str, value: Any):
+    """Atomically writes a value to the cache.
+
+    Failures are logged and otherwise ignored, the cache is an optimization only.
+    """
+    directory = os.path.dirname(path) or '.'
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    except OSError as exc:
+        logging.warning('Unable to write cache file %s: %s', path, exc)
+        return
+
+    try:
+        with os.fdopen(file_descriptor, 'w') as cache_file:
+            json.dump({'created_at': time.time(), 'value': value}, cache_file)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        logging.warning('Unable to write cache file %s: %s', path, exc)
+        remove_json_cache(tmp_path)
+
+
+def remove_json_cache(path: str):
+    """Removes a cache file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
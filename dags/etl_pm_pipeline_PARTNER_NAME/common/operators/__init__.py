@@ -1 +1,3 @@
-from .pmi_ecs_operator import PmiEcsFargateOperator, get_ecs_container_override
+from .pmi_ecs_operator import ECS_TASK_ARN_XCOM_KEY, PmiEcsFargateOperator, get_ecs_container_override
+from .pmi_ecs_sharded_operator import PmiEcsShardedFargateOperator, get_shard_container_overrides
+from .pmi_ecs_task_sensor import PmiEcsTaskSensor
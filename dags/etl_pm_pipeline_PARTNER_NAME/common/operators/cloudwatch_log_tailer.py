@@ -0,0 +1,120 @@
+"""CloudWatch log tailing module."""
+
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, List, Mapping
+
+# events kept in memory for inspection after the task ends (e.g. for error messages)
+MAX_BUFFERED_EVENTS = 1000
+
+# GetLogEvents is limited to 25 requests per second per account and region
+MIN_POLL_INTERVAL_SECONDS = 5.0
+
+# pages fetched per poll, the remaining events are fetched by the next poll
+MAX_PAGES_PER_POLL = 10
+
+
+def format_log_event(event: Mapping[str, Any]) -> str:
+    """Formats a CloudWatch log event the same way as `ECSOperator`."""
+    timestamp = datetime.fromtimestamp(event['timestamp'] / 1000.0)
+    return f"[{timestamp.isoformat()}] {event['message']}"
+
+
+class CloudWatchLogTailer:
+    """Incrementally reads a CloudWatch log stream.
+
+    Every poll continues from the `nextForwardToken` of the previous one, so each event is
+    downloaded once, and polls are rate-limited. Only the most recent events are buffered in memory.
+
+    Parameters
+    ----------
+    client
+        CloudWatch Logs client (use the shared client, see `aws_clients.get_client`).
+    log_group
+        Log group name.
+    log_stream
+        Log stream name.
+    emit
+        Callable receiving every new event, defaults to logging the formatted event.
+    max_buffered_events
+        Number of most recent events kept in `events`.
+    min_poll_interval
+        Minimum interval between polls in seconds.
+
+    """
+
+    def __init__(
+            self,
+            client: Any,
+            log_group: str,
+            log_stream: str,
+            emit: Callable[[Mapping[str, Any]], None] = None,
+            max_buffered_events: int = MAX_BUFFERED_EVENTS,
+            min_poll_interval: float = MIN_POLL_INTERVAL_SECONDS,
+    ):
+        self._client = client
+        self._log_group = log_group
+        self._log_stream = log_stream
+        self._emit = emit or (lambda event: logging.info(format_log_event(event)))
+        self._min_poll_interval = min_poll_interval
+        self._next_token = None
+        self._last_poll = None
+        self._at_end = False
+        self.events: Deque[Mapping[str, Any]] = deque(maxlen=max_buffered_events)
+
+    def poll(self, force: bool = False) -> int:
+        """Reads new events, unless the previous poll was less than `min_poll_interval` ago.
+
+        Parameters
+        ----------
+        force
+            Ignore the rate limit.
+
+        Returns
+        -------
+        int
+            Number of new events.
+
+        """
+        now = time.monotonic()
+        if not force and self._last_poll is not None and now - self._last_poll < self._min_poll_interval:
+            return 0
+        self._last_poll = now
+
+        count = 0
+        self._at_end = False
+        for _ in range(MAX_PAGES_PER_POLL):
+            events = self._get_page()
+            if events is None:
+                self._at_end = True
+                break
+            for event in events:
+                self.events.append(event)
+                self._emit(event)
+            count += len(events)
+        return count
+
+    def drain(self) -> int:
+        """Reads all remaining events (call once the task stopped)."""
+        count = self.poll(force=True)
+        while not self._at_end:
+            count += self.poll(force=True)
+        return count
+
+    def _get_page(self) -> List[Mapping[str, Any]]:
+        """Returns the next page of events, or `None` at the end of the stream."""
+        kwargs = {'nextToken': self._next_token} if self._next_token else {'startFromHead': True}
+        try:
+            response = self._client.get_log_events(logGroupName=self._log_group, logStreamName=self._log_stream, **kwargs)
+        except self._client.exceptions.ResourceNotFoundException:
+            # the stream is created when the container starts
+            return None
+
+        next_token = response.get('nextForwardToken')
+        # the token does not change at the end of the stream
+        if next_token == self._next_token:
+            return None
+        self._next_token = next_token
+        return response.get('events', [])
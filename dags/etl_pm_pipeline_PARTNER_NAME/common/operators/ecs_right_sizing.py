@@ -0,0 +1,179 @@
+"""ECS task right-sizing module."""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from ..status_table import StatusTable
+
+# log line prefix of the metrics reported by the services (see the service `report_metrics`)
+METRICS_LOG_MARKER = 'PMI_METRICS '
+
+# valid Fargate task sizes, CPU units and memory MiB
+FARGATE_SIZES: List[Tuple[int, int]] = sorted(
+    [(256, memory) for memory in (512, 1024, 2048)]
+    + [(512, memory) for memory in range(1024, 4096 + 1, 1024)]
+    + [(1024, memory) for memory in range(2048, 8192 + 1, 1024)]
+    + [(2048, memory) for memory in range(4096, 16384 + 1, 1024)]
+    + [(4096, memory) for memory in range(8192, 30720 + 1, 1024)],
+    key=lambda size: (size[1], size[0]),
+)
+
+# memory added on top of the peak memory of previous runs
+MEMORY_HEADROOM = 1.25
+
+# number of recent runs the recommendation is based on
+HISTORY_RUNS = 10
+
+
+class TaskRun(NamedTuple):
+    """Resource usage of a single ECS task run."""
+
+    execution_date: str
+    duration_seconds: float
+    cpu: int
+    memory_mib: int
+    peak_memory_mib: Optional[float] = None
+    input_bytes: Optional[int] = None
+    out_of_memory: bool = False
+
+    def to_item(self) -> Mapping[str, Any]:
+        """Returns the run as a status table item attribute."""
+        return self._asdict()
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> 'TaskRun':
+        """Creates the run from a mapping created by `to_item`."""
+        return cls(**{field: item.get(field) for field in cls._fields if field in item})
+
+
+def fargate_size(memory_mib: float, cpu: int = 0) -> Tuple[int, int]:
+    """Returns the cheapest valid Fargate `(cpu, memory)` size with at least the given resources."""
+    for size_cpu, size_memory in FARGATE_SIZES:
+        if size_memory >= memory_mib and size_cpu >= cpu:
+            return size_cpu, size_memory
+    return max(FARGATE_SIZES, key=lambda size: (size[1], size[0]))
+
+
+def required_memory(run: TaskRun) -> Optional[float]:
+    """Returns the memory a run needed, an out of memory run needed at least twice its limit."""
+    if run.out_of_memory:
+        return run.memory_mib * 2
+    return run.peak_memory_mib
+
+
+def recommend_size(
+        history: Iterable[TaskRun],
+        input_bytes: int = None,
+        min_cpu: int = 0,
+) -> Optional[Tuple[int, int]]:
+    """Recommends a Fargate task size based on previous runs.
+
+    If the input size of the current run and of previous runs is known, the memory is scaled by the
+    largest memory per input byte seen recently. Otherwise the largest recent peak memory is used.
+
+    Parameters
+    ----------
+    history
+        Previous runs, oldest first.
+    input_bytes
+        Optional input size of the current run.
+    min_cpu
+        Minimum number of CPU units.
+
+    Returns
+    -------
+    Optional[Tuple[int, int]]
+        Recommended `(cpu, memory)` or `None` if the history has no memory measurements.
+
+    """
+    runs = [run for run in list(history)[-HISTORY_RUNS:] if required_memory(run)]
+    if not runs:
+        return None
+
+    memory = max(required_memory(run) for run in runs)
+    scalable_runs = [run for run in runs if run.input_bytes]
+    if input_bytes and scalable_runs:
+        memory_per_byte = max(required_memory(run) / run.input_bytes for run in scalable_runs)
+        memory = memory_per_byte * input_bytes
+
+    return fargate_size(memory * MEMORY_HEADROOM, min_cpu)
+
+
+def parse_metrics(messages: Iterable[str]) -> Mapping[str, Any]:
+    """Returns the metrics reported in task log messages (the last value of every metric wins)."""
+    metrics = {}
+    for message in messages:
+        if not message.startswith(METRICS_LOG_MARKER):
+            continue
+        try:
+            metrics.update(json.loads(message[len(METRICS_LOG_MARKER):]))
+        except ValueError:
+            logging.warning('Invalid metrics log message: %s', message)
+    return metrics
+
+
+def is_out_of_memory(task: Mapping[str, Any]) -> bool:
+    """Returns `True` if a container of a stopped ECS task was killed for exceeding its memory."""
+    return any('OutOfMemory' in container.get('reason', '') for container in task.get('containers', []))
+
+
+def task_run(
+        task: Mapping[str, Any],
+        execution_date: str,
+        metrics: Mapping[str, Any],
+        input_bytes: int = None,
+) -> TaskRun:
+    """Creates the run record of a stopped ECS task."""
+    started_at = task.get('startedAt') or task.get('createdAt')
+    stopped_at = task.get('stoppedAt') or datetime.now(timezone.utc)
+    duration = (stopped_at - started_at).total_seconds() if started_at else 0.0
+    return TaskRun(
+        execution_date=execution_date,
+        duration_seconds=duration,
+        cpu=int(task.get('cpu', 0)),
+        memory_mib=int(task.get('memory', 0)),
+        peak_memory_mib=metrics.get('peak_memory_mib'),
+        input_bytes=metrics.get('input_bytes', input_bytes),
+        out_of_memory=is_out_of_memory(task),
+    )
+
+
+def s3_prefix_size(client: Any, location: str) -> int:
+    """Returns the total size of the objects under an S3 location ("s3://bucket/prefix")."""
+    bucket, _, prefix = location[len('s3://'):].partition('/')
+    size = 0
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        size += sum(content['Size'] for content in page.get('Contents', []))
+    return size
+
+
+class TaskHistory:
+    """Recent runs of an ECS task stored in a single status table item.
+
+    Parameters
+    ----------
+    table
+        Status table.
+    key
+        Task key (e.g. DAG and task id).
+    max_runs
+        Number of runs kept.
+
+    """
+
+    def __init__(self, table: StatusTable, key: str, max_runs: int = 3 * HISTORY_RUNS):
+        self._table = table
+        self._id = f'ecs-task-history#{key}'
+        self._max_runs = max_runs
+
+    def load(self) -> List[TaskRun]:
+        """Returns the stored runs, oldest first."""
+        item = self._table.get(self._id, consistent=True) or {}
+        return [TaskRun.from_item(run) for run in item.get('runs', [])]
+
+    def record(self, run: TaskRun):
+        """Appends a run, dropping the oldest runs over `max_runs`."""
+        runs = (self.load() + [run])[-self._max_runs:]
+        self._table.put({'id': self._id, 'runs': [item.to_item() for item in runs]})
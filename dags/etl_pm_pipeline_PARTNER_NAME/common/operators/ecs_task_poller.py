@@ -0,0 +1,136 @@
+"""ECS task polling module."""
+
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from airflow.exceptions import AirflowException
+
+# maximum number of tasks accepted by a single DescribeTasks call
+DESCRIBE_TASKS_BATCH_SIZE = 100
+
+
+def describe_tasks(client: Any, cluster: str, task_arns: Iterable[str]) -> Dict[str, Mapping[str, Any]]:
+    """Describes ECS tasks using as few DescribeTasks calls as possible.
+
+    Returns
+    -------
+    Dict[str, Mapping[str, Any]]
+        Task descriptions by task ARN. Tasks ECS reports as failures (e.g. missing tasks) are
+        returned as `{'lastStatus': 'STOPPED', 'failure': {...}}`.
+
+    """
+    task_arns = list(task_arns)
+    tasks = {}
+    for offset in range(0, len(task_arns), DESCRIBE_TASKS_BATCH_SIZE):
+        response = client.describe_tasks(cluster=cluster, tasks=task_arns[offset:offset + DESCRIBE_TASKS_BATCH_SIZE])
+        for task in response.get('tasks', []):
+            tasks[task['taskArn']] = task
+        for failure in response.get('failures', []):
+            tasks[failure['arn']] = {'taskArn': failure['arn'], 'lastStatus': 'STOPPED', 'failure': failure}
+    return tasks
+
+
+def task_failure_reason(task: Mapping[str, Any]) -> Optional[str]:
+    """Returns the reason a stopped ECS task failed, or `None` if it succeeded.
+
+    Applies the same checks as `ECSOperator`.
+    """
+    if 'failure' in task:
+        return f"ECS failure: {task['failure']}"
+    if re.match(r'Host EC2 \(instance .+?\) (stopped|terminated)\.', task.get('stoppedReason', '')):
+        return f"The task was stopped because the host instance terminated: {task.get('stoppedReason')}"
+    for container in task.get('containers', []):
+        if container.get('lastStatus') == 'STOPPED' and container.get('exitCode') != 0:
+            return (
+                f"Container {container.get('name')} exited with code {container.get('exitCode')}: "
+                f"{container.get('reason', '')}"
+            )
+        if container.get('lastStatus') == 'PENDING':
+            return f"Container {container.get('name')} is still pending"
+        if 'error' in container.get('reason', '').lower():
+            return f"Container {container.get('name')} failed: {container.get('reason')}"
+    return None
+
+
+class EcsTaskPoller:
+    """Waits for ECS tasks to stop, polling all in-flight tasks together with exponential backoff.
+
+    Parameters
+    ----------
+    client
+        ECS client (use the shared client, see `aws_clients.get_client`).
+    cluster
+        ECS cluster name.
+    initial_interval
+        Initial polling interval in seconds.
+    max_interval
+        Maximum polling interval in seconds.
+    backoff
+        Polling interval multiplier applied after every poll.
+
+    """
+
+    def __init__(
+            self,
+            client: Any,
+            cluster: str,
+            initial_interval: float = 6.0,
+            max_interval: float = 60.0,
+            backoff: float = 1.5,
+    ):
+        self._client = client
+        self._cluster = cluster
+        self._initial_interval = initial_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+
+    def describe(self, task_arns: Iterable[str]) -> Dict[str, Mapping[str, Any]]:
+        """Describes tasks in batches."""
+        return describe_tasks(self._client, self._cluster, task_arns)
+
+    def wait(
+            self,
+            task_arns: Iterable[str],
+            timeout: float = None,
+            on_poll: Callable[[Dict[str, Mapping[str, Any]]], None] = None,
+    ) -> Dict[str, Mapping[str, Any]]:
+        """Blocks until all tasks are stopped.
+
+        Parameters
+        ----------
+        task_arns
+            ARNs of the tasks to wait for.
+        timeout
+            Optional timeout in seconds.
+        on_poll
+            Optional callback receiving the descriptions of all polled tasks after every poll.
+
+        Returns
+        -------
+        Dict[str, Mapping[str, Any]]
+            Descriptions of the stopped tasks by task ARN.
+
+        """
+        pending: List[str] = list(task_arns)
+        stopped = {}
+        interval = self._initial_interval
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        while pending:
+            tasks = self.describe(pending)
+            if on_poll is not None:
+                on_poll(tasks)
+            for task_arn, task in tasks.items():
+                if task.get('lastStatus') == 'STOPPED':
+                    stopped[task_arn] = task
+            pending = [task_arn for task_arn in pending if task_arn not in stopped]
+            if not pending:
+                break
+
+            if deadline is not None and time.monotonic() + interval > deadline:
+                raise AirflowException(f'Timed out waiting for ECS tasks: {pending}')
+            time.sleep(interval)
+            interval = min(interval * self._backoff, self._max_interval)
+
+        return stopped
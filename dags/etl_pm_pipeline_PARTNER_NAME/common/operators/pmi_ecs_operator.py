@@ -1,11 +1,22 @@
 """Custom ECS operator module."""
 
-from typing import Dict, List
+from typing import Any, Dict, List, Mapping, Optional
 
 from airflow.contrib.operators.ecs_operator import ECSOperator
 from airflow.utils.decorators import apply_defaults
 
+from ..aws_clients import SharedClientAwsHook, get_client
 from ..pmi_dag import PMIDAG
+from ..status_table import StatusTable
+from .cloudwatch_log_tailer import CloudWatchLogTailer, format_log_event
+from .ecs_right_sizing import TaskHistory, parse_metrics, recommend_size, s3_prefix_size, task_run
+from .ecs_task_poller import EcsTaskPoller
+
+# xcom key of the ARN of a task started without waiting for completion
+ECS_TASK_ARN_XCOM_KEY = 'ecs_task_arn'
+
+# environment variable with the status table name, the services keep their state in the table
+STATUS_TABLE_NAME_ENV = 'STATUS_TABLE_NAME'
 
 
 def get_ecs_container_override(container_name: str, command_list: List[str]) -> Dict:
@@ -30,6 +41,20 @@ def get_ecs_container_override(container_name: str, command_list: List[str]) ->
     }
 
 
+def get_status_table_container_overrides(container_overrides: List[Dict], status_table_name: str) -> List[Dict]:
+    """Returns copies of the container overrides with the `STATUS_TABLE_NAME` environment variable."""
+    return [
+        {
+            **container_override,
+            'environment': [
+                *container_override.get('environment', []),
+                {'name': STATUS_TABLE_NAME_ENV, 'value': status_table_name},
+            ],
+        }
+        for container_override in container_overrides
+    ]
+
+
 class PmiEcsFargateOperator(ECSOperator):
     """ECS operator customized for PMI Fargate workloads.
 
@@ -41,18 +66,36 @@ class PmiEcsFargateOperator(ECSOperator):
         EC2 security group ID used to run the task in.
     container_overrides
         List of dictionaries with commands to pass to task container(s).
-        Use the `get_ecs_container_override()` helper method.
+        Use the `get_ecs_container_override()` helper method. The containers get the status
+        table name in the `STATUS_TABLE_NAME` environment variable, if the prerequisites stack
+        has the `StatusTableName` output.
     log_group_name
         Optional name of a CloudWatch log group. If provided, logs from this group
-        will be available in the Airflow UI after the task executes.
+        are streamed to the Airflow task log while the task runs.
     log_stream_prefix
         Optional name of a CloudWatch log stream prefix. Should be provided if
         `log_group_name` is provided.
+    wait_for_completion
+        Wait for the ECS task to finish (default). If disabled, the operator only starts the task,
+        pushes its ARN to the `ecs_task_arn` xcom and releases the worker slot. Use
+        `PmiEcsTaskSensor` (in "reschedule" mode) to wait for such tasks.
+    right_sizing
+        Choose the task CPU and memory from the history of previous runs stored in the status
+        table, instead of the task definition size. The history records the duration, size, peak
+        memory (reported by the service in the task log, see `ecs_right_sizing.METRICS_LOG_MARKER`)
+        and input size of every run. Requires `wait_for_completion` and the status table.
+    right_sizing_key
+        Key of the run history, defaults to the DAG and task id. Set it for dynamically named tasks.
+    input_location
+        Optional S3 location ("s3://bucket/prefix") of the task input (templated). The memory of
+        the task is scaled by the input size.
     args, kwargs
         Standard Airflow operator arguments.
 
     """
 
+    template_fields = ('overrides', 'input_location')
+
     @apply_defaults
     def __init__(
             self,
@@ -62,9 +105,24 @@ class PmiEcsFargateOperator(ECSOperator):
             container_overrides: List[Dict],
             log_group_name: str = None,
             log_stream_prefix: str = None,
+            wait_for_completion: bool = True,
+            right_sizing: bool = False,
+            right_sizing_key: str = None,
+            input_location: str = None,
             **kwargs,
     ):
+        # pylint: disable=too-many-locals
         dag = PMIDAG.get_dag(**kwargs)
+        self.wait_for_completion = wait_for_completion
+        self.right_sizing = right_sizing and wait_for_completion
+        self.right_sizing_key = right_sizing_key
+        self.input_location = input_location
+        # optional, the operators without right sizing run without the status table
+        self.status_table_name = dag.env_config['aws_resources'][dag.aws_stack_prereqs].get('StatusTableName')
+        if self.right_sizing and self.status_table_name is None:
+            raise ValueError('right_sizing requires the StatusTableName output of the prerequisites stack')
+        self._log_tailer = None
+        self._run_context = None
 
         ecs_cluster_name = dag.aws_resource_prereqs('ECSClusterName')
         network_configuration = {
@@ -78,6 +136,8 @@ class PmiEcsFargateOperator(ECSOperator):
             'project': dag.pipeline_name,
             'repository': dag.app_name,
         }
+        if self.status_table_name is not None:
+            container_overrides = get_status_table_container_overrides(container_overrides, self.status_table_name)
 
         super().__init__(
             task_definition=task_definition,
@@ -94,3 +154,87 @@ class PmiEcsFargateOperator(ECSOperator):
             *args,
             **kwargs,
         )
+
+    def get_hook(self) -> SharedClientAwsHook:
+        """Returns a hook handing out the shared (pooled) ECS client."""
+        return SharedClientAwsHook(aws_conn_id=self.aws_conn_id)
+
+    def execute(self, context: Mapping[str, Any]) -> str:
+        if self.right_sizing:
+            self._apply_right_sizing(context)
+        super().execute(context)
+        if not self.wait_for_completion:
+            context['ti'].xcom_push(key=ECS_TASK_ARN_XCOM_KEY, value=self.arn)
+        return self.arn
+
+    def _wait_for_task_ended(self):
+        if not self.wait_for_completion:
+            self.log.info('ECS task %s started, not waiting for completion', self.arn)
+            return
+
+        log_tailer = self._log_tailer = self._get_log_tailer()
+        on_poll = (lambda tasks: log_tailer.poll()) if log_tailer else None
+
+        # polls with backoff instead of the fixed rate boto3 waiter, see `EcsTaskPoller`
+        tasks = EcsTaskPoller(self.client, self.cluster).wait([self.arn], on_poll=on_poll)
+
+        if log_tailer:
+            log_tailer.drain()
+        if self.right_sizing:
+            self._record_run(tasks[self.arn])
+
+    def _check_success_task(self):
+        if not self.wait_for_completion:
+            return
+
+        # logs were already streamed by `_wait_for_task_ended`, skip the bulk download of `ECSOperator`
+        awslogs_group, self.awslogs_group = self.awslogs_group, None
+        try:
+            super()._check_success_task()
+        finally:
+            self.awslogs_group = awslogs_group
+
+    def _get_log_tailer(self) -> Optional[CloudWatchLogTailer]:
+        """Returns a tailer of the CloudWatch log stream of the task, if logging is configured."""
+        if not (self.awslogs_group and self.awslogs_stream_prefix):
+            return None
+
+        log_stream = f"{self.awslogs_stream_prefix}/{self.arn.split('/')[-1]}"
+        self.log.info('Streaming ECS task logs from %s/%s', self.awslogs_group, log_stream)
+        return CloudWatchLogTailer(
+            get_client('logs', self.aws_conn_id, self.awslogs_region),
+            self.awslogs_group,
+            log_stream,
+            emit=lambda event: self.log.info(format_log_event(event)),
+        )
+
+    def _task_history(self) -> TaskHistory:
+        key = self.right_sizing_key or f'{self.dag_id}#{self.task_id}'
+        table = StatusTable(self.status_table_name, get_client('dynamodb', self.aws_conn_id, self.region_name))
+        return TaskHistory(table, key)
+
+    def _apply_right_sizing(self, context: Mapping[str, Any]):
+        """Overrides the task CPU and memory with the size recommended by the run history."""
+        input_bytes = None
+        if self.input_location:
+            input_bytes = s3_prefix_size(get_client('s3', self.aws_conn_id, self.region_name), self.input_location)
+        self._run_context = {'execution_date': context['ts'], 'input_bytes': input_bytes}
+
+        size = recommend_size(self._task_history().load(), input_bytes)
+        if size is None:
+            self.log.info('No run history, using the task definition size')
+            return
+
+        cpu, memory = size
+        self.log.info('Right-sized the task to %s CPU units and %s MiB (input size: %s bytes)', cpu, memory, input_bytes)
+        self.overrides = {**self.overrides, 'cpu': str(cpu), 'memory': str(memory)}
+
+    def _record_run(self, task: Mapping[str, Any]):
+        """Stores the resource usage of the finished task in the run history."""
+        messages = [event['message'] for event in self._log_tailer.events] if self._log_tailer else []
+        run = task_run(task, metrics=parse_metrics(messages), **self._run_context)
+        self.log.info('Recording ECS task run: %s', run)
+        try:
+            self._task_history().record(run)
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception('Failed to record the ECS task run')
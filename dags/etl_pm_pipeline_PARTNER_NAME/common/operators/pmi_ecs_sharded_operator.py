@@ -0,0 +1,154 @@
+"""Sharded ECS operator module."""
+
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping
+
+from airflow.exceptions import AirflowException
+from airflow.utils.decorators import apply_defaults
+from botocore.exceptions import ClientError
+
+from .ecs_task_poller import EcsTaskPoller, task_failure_reason
+from .pmi_ecs_operator import PmiEcsFargateOperator
+
+# RunTask calls sent concurrently, stays well below the ECS RunTask rate limit
+RUN_TASK_BATCH_SIZE = 10
+
+SHARD_INDEX_ENV = 'SHARD_INDEX'
+SHARD_COUNT_ENV = 'SHARD_COUNT'
+
+
+def get_shard_container_overrides(
+        container_overrides: List[Dict],
+        shard_index: int,
+        shard_count: int,
+) -> List[Dict]:
+    """Returns container overrides of a single shard.
+
+    The shard index and count are appended to the container command as `--shard-index` and
+    `--shard-count` arguments and are set as the `SHARD_INDEX` and `SHARD_COUNT` environment variables.
+    """
+    shard_overrides = copy.deepcopy(container_overrides)
+    for container_override in shard_overrides:
+        if 'command' in container_override:
+            container_override['command'] += ['--shard-index', str(shard_index), '--shard-count', str(shard_count)]
+        container_override.setdefault('environment', []).extend([
+            {'name': SHARD_INDEX_ENV, 'value': str(shard_index)},
+            {'name': SHARD_COUNT_ENV, 'value': str(shard_count)},
+        ])
+    return shard_overrides
+
+
+class PmiEcsShardedFargateOperator(PmiEcsFargateOperator):
+    """Runs one logical job as `shard_count` ECS Fargate tasks.
+
+    Every shard gets its shard index and count (see `get_shard_container_overrides`) and is
+    expected to process its own part of the data. The shards are started with concurrent RunTask
+    calls and polled together. Failed shards are restarted up to `shard_retries` times without
+    rerunning the successful ones.
+
+    Parameters
+    ----------
+    shard_count
+        Number of shards (ECS tasks).
+    shard_retries
+        Number of times a failed shard is restarted before the operator fails.
+    args, kwargs
+        `PmiEcsFargateOperator` arguments (`wait_for_completion=False` and `right_sizing` raise `ValueError`).
+
+    """
+
+    @apply_defaults
+    def __init__(
+            self,
+            *args,
+            shard_count: int,
+            shard_retries: int = 2,
+            **kwargs,
+    ):
+        if shard_count < 1:
+            raise ValueError(f'shard_count must be positive, got {shard_count}')
+        if not kwargs.get('wait_for_completion', True):
+            raise ValueError('wait_for_completion=False is not supported, shards are always awaited')
+        if kwargs.get('right_sizing', False):
+            raise ValueError('right_sizing is not supported by sharded tasks')
+
+        super().__init__(*args, **kwargs)
+
+        self.shard_count = shard_count
+        self.shard_retries = shard_retries
+        self.shard_arns: Dict[int, str] = {}
+
+    def execute(self, context: Mapping[str, Any]) -> List[str]:
+        self.log.info('Running task definition %s in %s shards', self.task_definition, self.shard_count)
+        self.client = self.get_hook().get_client_type('ecs', region_name=self.region_name)
+        poller = EcsTaskPoller(self.client, self.cluster)
+
+        failures: Dict[int, str] = {}
+        pending = list(range(self.shard_count))
+        for attempt in range(self.shard_retries + 1):
+            if attempt:
+                self.log.warning('Restarting failed shards %s (retry %s of %s)', pending, attempt, self.shard_retries)
+
+            failures = self._start_shards(pending)
+            started = [shard for shard in pending if shard not in failures]
+            tasks = poller.wait([self.shard_arns[shard] for shard in started])
+            for shard in started:
+                reason = task_failure_reason(tasks[self.shard_arns[shard]])
+                if reason:
+                    failures[shard] = reason
+
+            if not failures:
+                break
+            for shard, reason in sorted(failures.items()):
+                self.log.warning('Shard %s failed: %s', shard, reason)
+            pending = sorted(failures)
+
+        if failures:
+            raise AirflowException(f'{len(failures)} of {self.shard_count} shards failed: {failures}')
+
+        self.log.info('All %s shards finished successfully', self.shard_count)
+        return [self.shard_arns[shard] for shard in range(self.shard_count)]
+
+    def on_kill(self):
+        if self.client is None:
+            return
+        for task_arn in self.shard_arns.values():
+            self.client.stop_task(cluster=self.cluster, task=task_arn, reason='Task killed by the user')
+
+    def _start_shards(self, shards: List[int]) -> Dict[int, str]:
+        """Starts shards with concurrent RunTask calls, returns the reasons of failed starts by shard."""
+        with ThreadPoolExecutor(max_workers=RUN_TASK_BATCH_SIZE) as executor:
+            responses = list(executor.map(self._run_shard, shards))
+
+        failures = {}
+        for shard, response in zip(shards, responses):
+            if response.get('failures') or not response.get('tasks'):
+                failures[shard] = f"RunTask failed: {response.get('failures')}"
+                continue
+            self.shard_arns[shard] = response['tasks'][0]['taskArn']
+            self.log.info('Shard %s started as ECS task %s', shard, self.shard_arns[shard])
+        return failures
+
+    def _run_shard(self, shard: int) -> Mapping[str, Any]:
+        overrides = dict(self.overrides)
+        overrides['containerOverrides'] = get_shard_container_overrides(
+            self.overrides.get('containerOverrides', []),
+            shard,
+            self.shard_count,
+        )
+        run_options = {
+            'cluster': self.cluster,
+            'taskDefinition': self.task_definition,
+            'overrides': overrides,
+            'startedBy': self.owner,
+            'launchType': self.launch_type,
+            'platformVersion': self.platform_version,
+            'networkConfiguration': self.network_configuration,
+            'tags': [{'key': key, 'value': value} for key, value in self.tags.items()],
+        }
+        try:
+            return self.client.run_task(**run_options)
+        except ClientError as error:
+            # e.g. throttling after all retries, the shard is retried with the failed shards
+            return {'failures': [str(error)]}
@@ -0,0 +1,101 @@
+"""ECS task sensor module."""
+
+from typing import Any, List, Mapping
+
+from airflow.exceptions import AirflowException
+from airflow.models.taskreschedule import TaskReschedule
+from airflow.sensors.base_sensor_operator import BaseSensorOperator
+from airflow.utils.decorators import apply_defaults
+
+from ..aws_clients import get_client
+from ..pmi_dag import PMIDAG
+from .ecs_task_poller import describe_tasks, task_failure_reason
+from .pmi_ecs_operator import ECS_TASK_ARN_XCOM_KEY
+
+
+class PmiEcsTaskSensor(BaseSensorOperator):
+    """Waits for ECS tasks started by `PmiEcsFargateOperator` with `wait_for_completion=False`.
+
+    All watched tasks are checked with a single batched DescribeTasks call per poke. In the
+    default "reschedule" mode the sensor releases its worker slot between pokes, so a few workers
+    can supervise many concurrent ECS tasks. The interval between pokes grows exponentially.
+
+    Parameters
+    ----------
+    ecs_task_ids
+        Ids of the Airflow tasks that started the ECS tasks.
+    poke_interval
+        Initial interval between pokes in seconds.
+    max_poke_interval
+        Maximum interval between pokes in seconds.
+    backoff
+        Poke interval multiplier applied after every poke.
+    args, kwargs
+        Standard Airflow sensor arguments.
+
+    """
+
+    @apply_defaults
+    def __init__(
+            self,
+            *args,
+            ecs_task_ids: List[str],
+            mode: str = 'reschedule',
+            poke_interval: float = 30,
+            max_poke_interval: float = 300,
+            backoff: float = 2.0,
+            **kwargs,
+    ):
+        dag = PMIDAG.get_dag(**kwargs)
+
+        super().__init__(*args, mode=mode, poke_interval=poke_interval, **kwargs)
+
+        self.ecs_task_ids = ecs_task_ids
+        self.cluster = dag.aws_resource_prereqs('ECSClusterName')
+        self.aws_conn_id = dag.aws_conn_id
+        self.initial_poke_interval = poke_interval
+        self.max_poke_interval = max_poke_interval
+        self.backoff = backoff
+        self._pokes = 0
+
+    def poke(self, context: Mapping[str, Any]) -> bool:
+        task_instance = context['ti']
+        task_arns = {
+            task_id: task_instance.xcom_pull(task_ids=task_id, key=ECS_TASK_ARN_XCOM_KEY)
+            for task_id in self.ecs_task_ids
+        }
+        missing = [task_id for task_id, task_arn in task_arns.items() if not task_arn]
+        if missing:
+            raise AirflowException(f'No ECS task ARN found for tasks: {missing}')
+
+        tasks = describe_tasks(get_client('ecs', self.aws_conn_id), self.cluster, task_arns.values())
+
+        failures = {}
+        running = []
+        for task_id, task_arn in task_arns.items():
+            task = tasks.get(task_arn, {'lastStatus': 'UNKNOWN'})
+            if task.get('lastStatus') != 'STOPPED':
+                running.append(task_id)
+                continue
+            reason = task_failure_reason(task)
+            if reason:
+                failures[task_id] = reason
+
+        if failures:
+            raise AirflowException(f'ECS tasks failed: {failures}')
+        if running:
+            self.log.info('%s of %s ECS tasks still running: %s', len(running), len(task_arns), running)
+            self._increase_poke_interval(task_instance)
+            return False
+
+        self.log.info('All %s ECS tasks finished successfully', len(task_arns))
+        return True
+
+    def _increase_poke_interval(self, task_instance):
+        """Exponential backoff, the number of pokes survives reschedules in the reschedule table."""
+        if self.reschedule:
+            pokes = len(TaskReschedule.find_for_task_instance(task_instance))
+        else:
+            self._pokes += 1
+            pokes = self._pokes
+        self.poke_interval = min(self.initial_poke_interval * self.backoff ** pokes, self.max_poke_interval)
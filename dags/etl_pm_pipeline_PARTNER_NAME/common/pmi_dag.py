@@ -1,45 +1,58 @@
 """Base PMI DAG module."""
 
-from typing import Any, Callable, Mapping
+from typing import Any, Callable, List, Mapping, Tuple
 from abc import ABC
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import logging
-import requests
 from dateutil import parser, tz
 
 from airflow.models.dagrun import DagRun
 from airflow import settings
 from airflow.models import DAG, TaskInstance, BaseOperator
-from airflow.contrib.operators.sns_publish_operator import SnsPublishOperator
+from airflow.exceptions import AirflowException, AirflowSkipException
+
+from .alerting import AlertAggregator, FailureAlert, SnsPublisher
+from .aws_clients import get_client
+from .backfill import assign_chunks, backfill_parallelism, plan_backfill
+from .dag_environment import TEAM, DagEnvironment
+from .status_table import StatusTable
+from .watermark import Watermark, incremental_window, to_naive_utc
 
 
 def _failure_callback(context: Mapping[str, Any]):
-    """Callback for when a task fails."""
+    """Callback for when a task fails.
+
+    Failures of all Airflow processes are collected in the status table and published as one
+    digest per time window, see `AlertAggregator`. Without a status table, they are published directly.
+    """
 
     dag: PMIDAG = context['dag']
     task_instance: TaskInstance = context['ti']
+    exception = context.get('exception')
 
-    return SnsPublishOperator(
-        task_id='task_failure_callback',
-        aws_conn_id=dag.aws_conn_id,
+    publish = SnsPublisher(
         target_arn=':'.join([
             "arn:aws:sns",
             dag.aws_env['region'],
             dag.aws_env['accountId'],
             dag.aws_resource_shared('AlarmsTopicName'),
         ]),
-        subject='PMI DAG run failure',
-        message=(
-            f"Airflow task failure:\n"
-            f"\n"
-            f"\nDAG:             {task_instance.dag_id}"
-            f"\nTask:            {task_instance.task_id}"
-            f"\nExecution Date:  {task_instance.execution_date}"
-            f"\nHost:            {task_instance.hostname}"
-            f"\nError:           {context['exception']}"
-        )
-    ).execute(context)
+        aws_conn_id=dag.aws_conn_id,
+        region_name=dag.aws_env['region'],
+    )
+    try:
+        status_table = dag.status_table
+    except Exception:  # pylint: disable=broad-except
+        logging.exception('Status table unavailable, failure alerts are not aggregated')
+        status_table = None
+    AlertAggregator(status_table, publish).add(FailureAlert(
+        dag_id=task_instance.dag_id,
+        task_id=task_instance.task_id,
+        execution_date=str(task_instance.execution_date),
+        hostname=task_instance.hostname,
+        error=f'{type(exception).__name__}: {exception}' if exception else str(context.get('reason')),
+    ))
 
 
 def _data_date_tz_offset_filter(data_date: str) -> int:
@@ -71,18 +84,25 @@ class PMIDAG(ABC, DAG):
         * `deployment_version` - DAG deployment version (e.g. "1.2.3").
         * `airflow_cluster_id` - Airflow cluster id.
         * `airflow_aws_conn_id` - Airflow AWS connection id (e.g. "aws_default").
+    environment
+        Optional precomputed deployment environment state. DAG factories pass a single instance
+        to all DAGs they create so that it is derived only once per environment.
     """
 
     PRODUCT_DOMAIN = 'etl'
 
     PRODUCT_NAME = 'pm'
 
-    TEAM = 'weedwackers'
+    TEAM = TEAM
 
     DATA_DATE_TZ = tz.gettz('America/New_York')
 
     DATE_PARAMETER_FORMAT = '%Y-%m-%dT%H:%M:%S'
 
+    MAX_BACKFILL_PARALLELISM = 10
+
+    MAX_WATERMARK_CATCH_UP = timedelta(days=7)
+
     @staticmethod
     def get_xcom_param(param_name, task: BaseOperator) -> str:
         """Returns a string formatted to pull a parameter from the 'set_parameters' xcom."""
@@ -140,6 +160,111 @@ class PMIDAG(ABC, DAG):
         )
         self.set_param(dag_run, task_instance, "default_date", default_date)
 
+    def set_backfill_chunks(
+            self,
+            dag_run: DagRun,
+            task_instance: TaskInstance,
+            start_date: str,
+            end_date: str,
+    ) -> List[List[str]]:
+        """Splits the processed window into chunks and assigns them to the backfill slots.
+
+        Backfill mode is enabled by the `backfill` run parameter ("day" or "hour"), which splits
+        the window into per-day or per-hour chunks. Otherwise the whole window is a single chunk.
+        Chunks of each slot are pushed to the `backfill_slot_<slot>` xcom.
+        """
+        granularity = dag_run.conf.get('backfill') if dag_run.conf else None
+        start = datetime.strptime(start_date, PMIDAG.DATE_PARAMETER_FORMAT)
+        end = datetime.strptime(end_date, PMIDAG.DATE_PARAMETER_FORMAT)
+
+        chunks = [
+            [chunk_start.strftime(PMIDAG.DATE_PARAMETER_FORMAT), chunk_end.strftime(PMIDAG.DATE_PARAMETER_FORMAT)]
+            for chunk_start, chunk_end in (plan_backfill(start, end, granularity) if granularity else [(start, end)])
+        ]
+        logging.info('Processing %s chunk(s) in up to %s parallel slot(s)', len(chunks), self.backfill_slots)
+
+        for slot, slot_chunks in enumerate(assign_chunks(chunks, self.backfill_slots)):
+            task_instance.xcom_push(key=f'backfill_slot_{slot}', value=slot_chunks)
+        return chunks
+
+    def run_backfill_slot(
+            self,
+            slot: int,
+            process_chunk: Callable[..., Any],
+            parameters_task_id: str = 'set_parameters',
+            **context,
+    ):
+        """Processes all chunks assigned to a backfill slot by `set_backfill_chunks`.
+
+        A failed chunk does not stop the processing of the remaining chunks of the slot,
+        the slot fails after all its chunks have been attempted.
+        """
+        chunks = context['task_instance'].xcom_pull(task_ids=parameters_task_id, key=f'backfill_slot_{slot}')
+        if not chunks:
+            raise AirflowSkipException(f'No chunks assigned to backfill slot {slot}')
+
+        failed_chunks = []
+        for start_date, end_date in chunks:
+            logging.info('Processing chunk %s - %s', start_date, end_date)
+            try:
+                process_chunk(start_date, end_date, **context)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Processing of chunk %s - %s failed', start_date, end_date)
+                failed_chunks.append((start_date, end_date))
+
+        if failed_chunks:
+            raise AirflowException(f'{len(failed_chunks)} of {len(chunks)} chunk(s) failed: {failed_chunks}')
+
+    def get_processing_window(
+            self,
+            dag_run: DagRun,
+            end_date: datetime,
+            lookback: timedelta,
+    ) -> Tuple[datetime, datetime]:
+        """Returns the window not processed yet, from the DAG watermark to `end_date`.
+
+        Without a watermark the window is `lookback` long. The window is at most
+        `MAX_WATERMARK_CATCH_UP` long (the following runs process the rest) and empty if the
+        watermark is already past `end_date`.
+        The `force` run parameter (see `set_force_parameter`) ignores the watermark.
+        """
+        end_date = to_naive_utc(end_date)
+        default_start_date = end_date - lookback
+
+        force_param = dag_run.conf.get('force', False) if dag_run.conf else False
+        if force_param is True:
+            logging.info('Force parameter is set, ignoring the watermark')
+            return default_start_date, end_date
+
+        watermark = self.watermark.get()
+        start_date, window_end = incremental_window(watermark, end_date, default_start_date, PMIDAG.MAX_WATERMARK_CATCH_UP)
+        if window_end < end_date:
+            logging.warning(
+                'Data from %s to %s exceed the maximum catch up of %s, processing up to %s, the next runs process the rest',
+                watermark, end_date, PMIDAG.MAX_WATERMARK_CATCH_UP, window_end,
+            )
+        logging.info('Watermark: %s, processing window: %s - %s', watermark, start_date, window_end)
+        return start_date, window_end
+
+    def update_watermark(self, parameters_task_id: str = 'set_parameters', **context):
+        """Advances the DAG watermark to the end of the processed window (the `end_date` parameter).
+
+        The watermark is only advanced if the window (the `start_date` parameter) starts at or
+        before it, windows of manual runs starting later leave the watermark alone (see `Watermark.extend`).
+        """
+        task_instance = context['task_instance']
+        start_date, end_date = (
+            datetime.strptime(task_instance.xcom_pull(task_ids=parameters_task_id, key=key), PMIDAG.DATE_PARAMETER_FORMAT)
+            for key in ('start_date', 'end_date')
+        )
+        if self.watermark.extend(start_date, end_date, run_id=context['run_id']):
+            logging.info('Watermark advanced to %s', end_date)
+        else:
+            logging.warning(
+                'Watermark not advanced to %s: it is already past it, or the processed window starts after it at %s',
+                end_date, start_date,
+            )
+
     @staticmethod
     def format_input_date_parameter(
             date_str: str,
@@ -158,68 +283,53 @@ class PMIDAG(ABC, DAG):
             description: str,
             app_name: str,
             env_config: Mapping[str, Any],
+            environment: DagEnvironment = None,
     ):
         ABC.__init__(self)
 
+        if environment is None:
+            environment = DagEnvironment(app_name, env_config)
+
         self._pipeline_name = pipeline_name
         self._partner = 'PARTNER_NAME'
         self._app_name = app_name
         self._env_config = env_config
+        self._environment = environment
         self._pipeline_config = env_config['pipelines'][pipeline_name]
-        env_id = env_config['env_id']
-
-        # get AWS environment configuration from the Airflow instance
-        if '_aws_env' in env_config:  # local deployment
-            self._aws_env = env_config['_aws_env']
-        else:
-            self._aws_env = requests.get(
-                'http://169.254.169.254/latest/dynamic/instance-identity/document'
-            ).json()
 
-        self._region_designator = ''.join(part[0] for part in self._aws_env['region'].split('-'))
-
-        self._assets_location = env_config['assets_location']
+        self._aws_env = environment.aws_env
+        self._region_designator = environment.region_designator
+        self._assets_location = environment.assets_location
 
         # AWS Cloudformation stacks
-        self._aws_stack_shared = f'etl-pm-shared-{env_id}'
-        self._aws_stack_prereqs = f'{app_name}-{env_id}-prereqs'
+        self._aws_stack_shared = environment.aws_stack_shared
+        self._aws_stack_prereqs = environment.aws_stack_prereqs
 
         self._aws_stack_main = None
         if self._pipeline_config['dag']['use_cloudformation_stack'] is True:
             # Main stack is optional, not all pipelines need dedicated AWS resources.
-            self._aws_stack_main = f'{app_name}-{env_id}-{pipeline_name}'
-
-        # default operator arguments
-        default_args = {
-            'owner': PMIDAG.TEAM,
-            'queue': f"{env_config['airflow_cluster_id']}.{env_id}",
-            'depends_on_past': False,
-            'retries': 0,
-            'email_on_failure': False,
-            'email_on_retry': False,
-        }
+            self._aws_stack_main = environment.aws_stack_main(pipeline_name)
 
         # initialize the DAG
         schedule = self._pipeline_config['dag']['schedule']
         start_date = datetime.strptime(self._pipeline_config['dag']['start_date'], '%Y-%m-%d')
         catchup = self._pipeline_config['dag']['catchup']
         max_active_runs = self._pipeline_config['dag']['max_active_runs']
-        deployment_version_major = env_config['deployment_version'].split('.')[0]
 
         dag_id = '-'.join([
             PMIDAG.PRODUCT_DOMAIN,
             PMIDAG.PRODUCT_NAME,
             self.partner,
             self.pipeline_name,
-            f'v{deployment_version_major}',
-            env_id,
+            f'v{environment.deployment_version_major}',
+            environment.env_id,
         ])
 
         DAG.__init__(
             self,
             dag_id=dag_id,
             description=description,
-            default_args=default_args,
+            default_args=environment.default_args,
             schedule_interval=schedule,
             start_date=start_date,
             catchup=catchup,
@@ -273,6 +383,21 @@ class PMIDAG(ABC, DAG):
         """Pipeline environment configuration."""
         return self._pipeline_config
 
+    @property
+    def environment(self) -> DagEnvironment:
+        """Deployment environment state shared with the other DAGs of the environment."""
+        return self._environment
+
+    @property
+    def backfill_slots(self) -> int:
+        """Number of chunks a single DAG run processes in parallel.
+
+        The DAG `concurrency` shared by `max_active_runs` runs (at most `MAX_BACKFILL_PARALLELISM`),
+        a pipeline can lower it with `dag.backfill_slots` of the environment configuration.
+        """
+        parallelism = backfill_parallelism(self.max_active_runs, self.concurrency, PMIDAG.MAX_BACKFILL_PARALLELISM)
+        return min(self._pipeline_config['dag'].get('backfill_slots', parallelism), parallelism)
+
     @property
     def env_id(self) -> str:
         """Deployment environment id (shortcut for `env_config['env_id']`)."""
@@ -283,6 +408,19 @@ class PMIDAG(ABC, DAG):
         """Short deployment region designator ("ue1", "uw2", etc.)."""
         return self._region_designator
 
+    @property
+    def status_table(self) -> StatusTable:
+        """Client of the prerequisites stack status table."""
+        return StatusTable(
+            self.aws_resource_prereqs('StatusTableName'),
+            get_client('dynamodb', self.aws_conn_id, self.aws_env['region']),
+        )
+
+    @property
+    def watermark(self) -> Watermark:
+        """High-water mark of the data processed by the DAG, stored in the status table."""
+        return Watermark(self.status_table, self.dag_id)
+
     @property
     def aws_conn_id(self) -> str:
         """Airflow AWS connection id (shortcut for `env_config['airflow_aws_conn_id']`)."""
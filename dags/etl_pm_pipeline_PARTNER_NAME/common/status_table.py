@@ -0,0 +1,342 @@
+"""Status table client module.
+
+Client of the prerequisites stack `StatusTable` (DynamoDB table keyed on the string `id`).
+"""
+
+import logging
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+# DynamoDB request limits
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+
+# attempts to process the items DynamoDB returns as unprocessed (throttling)
+MAX_BATCH_ATTEMPTS = 8
+
+CHECKPOINT_ATTRIBUTE = 'checkpoint'
+
+Item = Dict[str, Any]
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _to_dynamodb(value: Any) -> Any:
+    """Converts floats (not supported by boto3) to decimals."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, Mapping):
+        return {key: _to_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_dynamodb(item) for item in value]
+    return value
+
+
+def _from_dynamodb(value: Any) -> Any:
+    """Converts decimals returned by boto3 to ints and floats."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Mapping):
+        return {key: _from_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_dynamodb(item) for item in value]
+    return value
+
+
+def serialize_item(item: Mapping[str, Any]) -> Dict[str, Any]:
+    """Converts an item to the DynamoDB attribute value format."""
+    return {key: _serializer.serialize(_to_dynamodb(value)) for key, value in item.items()}
+
+
+def deserialize_item(item: Mapping[str, Any]) -> Item:
+    """Converts an item from the DynamoDB attribute value format."""
+    return {key: _from_dynamodb(_deserializer.deserialize(value)) for key, value in item.items()}
+
+
+def _chunks(values: List[Any], size: int) -> Iterable[List[Any]]:
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _backoff(attempt: int):
+    time.sleep(min(0.05 * 2 ** attempt, 5.0) * random.uniform(0.5, 1.0))
+
+
+class StatusTable:
+    """Status table client with batched requests, conditional writes and a read-through cache.
+
+    Parameters
+    ----------
+    table_name
+        Table name (the `StatusTableName` output of the prerequisites stack).
+    client
+        Optional DynamoDB client, e.g. the shared client of the DAGs (`aws_clients.get_client`).
+    cache_ttl
+        Seconds read items are cached for, `0` disables the cache. Items written through the
+        client are always cached.
+
+    """
+
+    def __init__(self, table_name: str, client: Any = None, cache_ttl: float = 60.0):
+        self.table_name = table_name
+        self._client = client
+        self._cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, Optional[Item]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        """DynamoDB client, created on first use."""
+        if self._client is None:
+            self._client = boto3.client('dynamodb')
+        return self._client
+
+    def get(self, item_id: str, consistent: bool = False) -> Optional[Item]:
+        """Returns an item or `None` if it does not exist.
+
+        Parameters
+        ----------
+        item_id
+            Item id.
+        consistent
+            Bypass the cache and use a strongly consistent read.
+
+        """
+        return self.batch_get([item_id], consistent=consistent).get(item_id)
+
+    def batch_get(self, item_ids: Iterable[str], consistent: bool = False) -> Dict[str, Item]:
+        """Returns existing items by id, fetching items missing in the cache with BatchGetItem."""
+        item_ids = list(dict.fromkeys(item_ids))
+        items = {} if consistent else self._cached(item_ids)
+        missing = [item_id for item_id in item_ids if item_id not in items]
+        if missing:
+            fetched = self._fetch(missing, consistent)
+            for item_id in missing:
+                items[item_id] = fetched.get(item_id)
+                self._cache_item(item_id, items[item_id])
+        return {item_id: item for item_id, item in items.items() if item is not None}
+
+    def put(self, item: Mapping[str, Any]):
+        """Writes an item (it must have an `id`)."""
+        self.batch_put([item])
+
+    def batch_put(self, items: Iterable[Mapping[str, Any]]):
+        """Writes items with BatchWriteItem. The last item wins if an id repeats."""
+        items = {item['id']: dict(item) for item in items}
+        self._write(list(items.values()), [])
+        for item_id, item in items.items():
+            self._cache_item(item_id, item, always=True)
+
+    def batch_delete(self, item_ids: Iterable[str]):
+        """Deletes items with BatchWriteItem."""
+        item_ids = list(dict.fromkeys(item_ids))
+        self._write([], item_ids)
+        for item_id in item_ids:
+            self._cache_item(item_id, None, always=True)
+
+    def put_if_absent(self, item: Mapping[str, Any]) -> bool:
+        """Writes an item only if no item with its id exists. Returns `True` if it was written."""
+        written = self._put_if_absent(dict(item))
+        self.invalidate([item['id']])
+        return written
+
+    def increment(self, item_id: str, attribute: str, amount: int = 1) -> int:
+        """Atomically adds `amount` to a numeric attribute (missing attributes count from 0).
+
+        Returns
+        -------
+        int
+            The new attribute value.
+
+        """
+        value = self._increment(item_id, attribute, amount)
+        self.invalidate([item_id])
+        return value
+
+    def checkpoint(
+            self,
+            item_id: str,
+            value: Any,
+            attribute: str = CHECKPOINT_ATTRIBUTE,
+            **attributes: Any,
+    ) -> bool:
+        """Idempotent, monotonic checkpoint write.
+
+        Sets the checkpoint attribute (and the other given attributes) unless the stored checkpoint
+        is greater than `value`, so retried or late writers never move a checkpoint backwards.
+
+        Parameters
+        ----------
+        item_id
+            Item id.
+        value
+            New checkpoint value (a number or a sortable string, e.g. an ISO timestamp).
+        attribute
+            Checkpoint attribute name.
+        attributes
+            Other attributes written with the checkpoint.
+
+        Returns
+        -------
+        bool
+            `True` if the checkpoint was written, `False` if the stored checkpoint is greater.
+
+        """
+        written = self._checkpoint(item_id, attribute, value, attributes)
+        self.invalidate([item_id])
+        return written
+
+    def invalidate(self, item_ids: Iterable[str] = None):
+        """Removes items (or all items) from the cache."""
+        with self._lock:
+            if item_ids is None:
+                self._cache.clear()
+            for item_id in item_ids or []:
+                self._cache.pop(item_id, None)
+
+    def _cached(self, item_ids: List[str]) -> Dict[str, Optional[Item]]:
+        now = time.monotonic()
+        with self._lock:
+            cached = {item_id: self._cache.get(item_id) for item_id in item_ids}
+        return {item_id: entry[1] for item_id, entry in cached.items() if entry and entry[0] > now}
+
+    def _cache_item(self, item_id: str, item: Optional[Item], always: bool = False):
+        if self._cache_ttl > 0 or always:
+            with self._lock:
+                self._cache[item_id] = (time.monotonic() + self._cache_ttl, item)
+
+    def _fetch(self, item_ids: List[str], consistent: bool) -> Dict[str, Item]:
+        items = {}
+        for chunk in _chunks(item_ids, BATCH_GET_SIZE):
+            request = {
+                self.table_name: {
+                    'Keys': [{'id': {'S': item_id}} for item_id in chunk],
+                    'ConsistentRead': consistent,
+                },
+            }
+            for attempt in range(MAX_BATCH_ATTEMPTS):
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    item = deserialize_item(item)
+                    items[item['id']] = item
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    break
+                _backoff(attempt)
+            else:
+                raise RuntimeError(f'Failed to read {len(request[self.table_name]["Keys"])} items from {self.table_name}')
+        return items
+
+    def _write(self, puts: List[Item], deletes: List[str]):
+        requests = [{'PutRequest': {'Item': serialize_item(item)}} for item in puts]
+        requests += [{'DeleteRequest': {'Key': {'id': {'S': item_id}}}} for item_id in deletes]
+        for chunk in _chunks(requests, BATCH_WRITE_SIZE):
+            request = {self.table_name: chunk}
+            for attempt in range(MAX_BATCH_ATTEMPTS):
+                response = self.client.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems')
+                if not request:
+                    break
+                _backoff(attempt)
+            else:
+                raise RuntimeError(f'Failed to write {len(request[self.table_name])} items to {self.table_name}')
+
+    def _put_if_absent(self, item: Item) -> bool:
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item=serialize_item(item),
+                ConditionExpression='attribute_not_exists(id)',
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def _increment(self, item_id: str, attribute: str, amount: int) -> int:
+        response = self.client.update_item(
+            TableName=self.table_name,
+            Key={'id': {'S': item_id}},
+            UpdateExpression='ADD #a :v',
+            ExpressionAttributeNames={'#a': attribute},
+            ExpressionAttributeValues=serialize_item({':v': amount}),
+            ReturnValues='UPDATED_NEW',
+        )
+        return deserialize_item(response['Attributes'])[attribute]
+
+    def _checkpoint(self, item_id: str, attribute: str, value: Any, attributes: Mapping[str, Any]) -> bool:
+        values = {attribute: value, **attributes}
+        names = {f'#a{index}': name for index, name in enumerate(values)}
+        placeholders = {name: f':v{index}' for index, name in enumerate(values)}
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={'id': {'S': item_id}},
+                UpdateExpression='SET ' + ', '.join(f'#a{index} = :v{index}' for index in range(len(values))),
+                ConditionExpression='attribute_not_exists(#a0) OR #a0 <= :v0',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=serialize_item({placeholders[name]: value for name, value in values.items()}),
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logging.info('Checkpoint %s of %s is already past %s', attribute, item_id, value)
+                return False
+            raise
+        return True
+
+
+class InMemoryStatusTable(StatusTable):
+    """Local in-memory stand-in of `StatusTable` for tests and local runs.
+
+    Stored items are kept in the `items` dictionary.
+    """
+
+    def __init__(self, table_name: str = 'status-table', items: Mapping[str, Item] = None):
+        super().__init__(table_name, client=None, cache_ttl=0)
+        self.items: Dict[str, Item] = {item_id: dict(item) for item_id, item in (items or {}).items()}
+        self._items_lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        raise RuntimeError('InMemoryStatusTable has no DynamoDB client')
+
+    def _fetch(self, item_ids: List[str], consistent: bool) -> Dict[str, Item]:
+        with self._items_lock:
+            return {item_id: dict(self.items[item_id]) for item_id in item_ids if item_id in self.items}
+
+    def _write(self, puts: List[Item], deletes: List[str]):
+        with self._items_lock:
+            for item in puts:
+                self.items[item['id']] = dict(item)
+            for item_id in deletes:
+                self.items.pop(item_id, None)
+
+    def _put_if_absent(self, item: Item) -> bool:
+        with self._items_lock:
+            if item['id'] in self.items:
+                return False
+            self.items[item['id']] = item
+            return True
+
+    def _increment(self, item_id: str, attribute: str, amount: int) -> int:
+        with self._items_lock:
+            item = self.items.setdefault(item_id, {'id': item_id})
+            item[attribute] = item.get(attribute, 0) + amount
+            return item[attribute]
+
+    def _checkpoint(self, item_id: str, attribute: str, value: Any, attributes: Mapping[str, Any]) -> bool:
+        with self._items_lock:
+            item = self.items.setdefault(item_id, {'id': item_id})
+            if attribute in item and item[attribute] > value:
+                return False
+            item.update({attribute: value, **attributes})
+            return True
@@ -0,0 +1,99 @@
+"""Processing watermark module."""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple
+
+from .status_table import StatusTable
+
+WATERMARK_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def to_naive_utc(date: datetime) -> datetime:
+    """Converts a (timezone aware) datetime to a naive UTC datetime."""
+    if date.tzinfo is None:
+        return date
+    return datetime(*date.astimezone(timezone.utc).timetuple()[:6])
+
+
+def incremental_window(
+        watermark: Optional[datetime],
+        end_date: datetime,
+        default_start_date: datetime,
+        max_catch_up: timedelta,
+) -> Tuple[datetime, datetime]:
+    """Returns the window between the watermark and the end date.
+
+    A window longer than `max_catch_up` is cut at its end, so the oldest missing data are
+    processed first and the watermark catches up without gaps over the following runs.
+
+    Parameters
+    ----------
+    watermark
+        End of the last successfully processed window, `None` if nothing was processed yet.
+    end_date
+        End of the window.
+    default_start_date
+        Start of the window if there is no watermark.
+    max_catch_up
+        Maximum window length.
+
+    Returns
+    -------
+    Tuple[datetime, datetime]
+        Window `(start, end)`, empty (`start == end`) if the watermark is past the end date.
+
+    """
+    if watermark is None:
+        return default_start_date, end_date
+    if watermark >= end_date:
+        return end_date, end_date
+    return watermark, min(end_date, watermark + max_catch_up)
+
+
+class Watermark:
+    """High-water mark of the processed data stored in the status table.
+
+    The watermark only moves forward (see `StatusTable.checkpoint`), so retried, manual and
+    concurrent runs never move it backwards. It is only moved by windows continuing it (see
+    `extend`), so data between the watermark and a later window are never skipped.
+
+    Parameters
+    ----------
+    table
+        Status table.
+    key
+        Watermark key (e.g. DAG id).
+
+    """
+
+    def __init__(self, table: StatusTable, key: str):
+        self._table = table
+        self._id = f'watermark#{key}'
+
+    def get(self) -> Optional[datetime]:
+        """Returns the watermark or `None` if it was not set yet."""
+        item = self._table.get(self._id, consistent=True)
+        if not item or 'checkpoint' not in item:
+            return None
+        return datetime.strptime(item['checkpoint'], WATERMARK_FORMAT)
+
+    def advance(self, watermark: datetime, **attributes: Any) -> bool:
+        """Moves the watermark forward. Returns `False` if the stored watermark is already later."""
+        return self._table.checkpoint(
+            self._id,
+            to_naive_utc(watermark).strftime(WATERMARK_FORMAT),
+            updated_at=datetime.utcnow().strftime(WATERMARK_FORMAT),
+            **attributes,
+        )
+
+    def extend(self, start_date: datetime, end_date: datetime, **attributes: Any) -> bool:
+        """Moves the watermark to the end of a processed window starting at or before the watermark.
+
+        Returns `False` (the watermark is left alone) if the window starts after the watermark, as
+        the data between the watermark and the window start were not processed, or if the stored
+        watermark is already past the window end.
+        """
+        watermark = self.get()
+        if watermark is not None and to_naive_utc(start_date) > watermark:
+            return False
+        return self.advance(end_date, **attributes)
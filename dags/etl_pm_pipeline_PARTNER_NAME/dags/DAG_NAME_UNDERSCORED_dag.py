@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime, timedelta
 from typing import Any, Mapping
 
@@ -5,9 +6,13 @@ from airflow.utils.helpers import chain
 from airflow.operators.python_operator import PythonOperator
 from airflow.models.taskinstance import TaskInstance
 from airflow.models.dagrun import DagRun
+from airflow.exceptions import AirflowSkipException
+from airflow.utils.trigger_rule import TriggerRule
 
 from ..common import PMIDAG
 from ..common.config_provider import ConfigProvider
+from ..common.dag_environment import DagEnvironment
+from ..common.dag_factory import register_dag
 
 # from ..common.operators import (
 #     PmiEcsFargateOperator,
@@ -19,6 +24,7 @@ PIPELINE_NAME = "DAG_NAME"
 TASK_TIMEOUT = timedelta(hours=1)
 
 
+@register_dag(PIPELINE_NAME)
 class DAG_NAME_CAMEL_CASEDag(PMIDAG):
 
     def set_parameters(
@@ -26,40 +32,81 @@ class DAG_NAME_CAMEL_CASEDag(PMIDAG):
             dag_run: DagRun,
             execution_date: datetime,
             task_instance: TaskInstance,
+            lookback_hours: int = 24,
             **kwargs,
     ):
-        """Sets all accepted input parameters"""
+        """Sets all accepted input parameters
 
-        default_end_date = execution_date
-        default_start_date = default_end_date - timedelta(hours=24)
-        self.set_param(
+        Accepts the `start_date` and `end_date` range parameters and the optional `backfill`
+        parameter ("day" or "hour") to process the range in parallel per-day or per-hour chunks.
+        By default the range starts at the DAG watermark (the end of the last successfully
+        processed range), see `get_processing_window`.
+        """
+
+        default_start_date, default_end_date = self.get_processing_window(
+            dag_run,
+            execution_date,
+            timedelta(hours=lookback_hours),
+        )
+        start_date = self.set_param(
             dag_run,
             task_instance,
             'start_date',
             default_start_date.strftime(PMIDAG.DATE_PARAMETER_FORMAT),
             user_param_handler=self.format_input_date_parameter,
         )
-        self.set_param(
+        end_date = self.set_param(
             dag_run,
             task_instance,
             'end_date',
             default_end_date.strftime(PMIDAG.DATE_PARAMETER_FORMAT),
             user_param_handler=self.format_input_date_parameter,
         )
+        if start_date >= end_date:
+            # both dates have the same format, so they compare as strings
+            raise AirflowSkipException(f'Data up to {end_date} were already processed')
+        self.set_backfill_chunks(dag_run, task_instance, start_date, end_date)
+
+    def process_chunk(self, start_date: str, end_date: str, **context):
+        """Processes a single chunk of the processed window"""
+        # pylint: disable=unused-argument
+        logging.info('Processing data from %s to %s', start_date, end_date)
+
+        # PmiEcsFargateOperator(
+        #     task_id=f"SERVICE_NAME_UNDERSCORED_{start_date[:13]}",
+        #     dag=self,
+        #     task_definition=self._config.get_DAG_NAME_UNDERSCORED("SERVICE_NAME_CAMEL_CASEDefinitionArn"),
+        #     security_group_id=self._config.get_DAG_NAME_UNDERSCORED("SecurityGroupId"),
+        #     container_overrides=[
+        #         get_ecs_container_override(
+        #             "SERVICE_NAME_UNDERSCORED",
+        #             [
+        #                 "SERVICE_NAME_UNDERSCORED.py",
+        #                 "--date", start_date[:10].replace("-", ""),
+        #             ]
+        #         ),
+        #     ],
+        #     log_group_name=self._config.get_DAG_NAME_UNDERSCORED("LogGroupName"),
+        #     log_stream_prefix="ecs/SERVICE_NAME_UNDERSCORED",
+        # ).execute(context)
 
     def __init__(
             self,
             app_name: str,
             env_config: Mapping[str, Any],
+            pipeline_name: str = PIPELINE_NAME,
+            environment: DagEnvironment = None,
     ):
         super().__init__(
-            PIPELINE_NAME,
-            description=f"PARTNER_NAME - DAG_NAME ",
+            pipeline_name,
+            description=f"PARTNER_NAME - {pipeline_name} ",
             app_name=app_name,
             env_config=env_config,
+            environment=environment,
         )
         with self:
             config = ConfigProvider()
+            self._config = config
 
             set_parameters_task = PythonOperator(
                 task_id='set_parameters',
@@ -86,7 +133,26 @@ class DAG_NAME_CAMEL_CASEDag(PMIDAG):
             #     log_stream_prefix="ecs/SERVICE_NAME_UNDERSCORED",
             # )
             #
+            process_chunks_tasks = [
+                PythonOperator(
+                    task_id=f'process_chunks_{slot}',
+                    provide_context=True,
+                    python_callable=self.run_backfill_slot,
+                    op_kwargs={'slot': slot, 'process_chunk': self.process_chunk},
+                )
+                for slot in range(self.backfill_slots)
+            ]
+
+            update_watermark_task = PythonOperator(
+                task_id='update_watermark',
+                provide_context=True,
+                python_callable=self.update_watermark,
+                # slots without chunks are skipped
+                trigger_rule=TriggerRule.NONE_FAILED,
+            )
+
             chain(
-                set_parameters_task
-                # , task
+                set_parameters_task,
+                process_chunks_tasks,
+                update_watermark_task,
             )
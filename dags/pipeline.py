@@ -5,18 +5,18 @@ See https://airflow.apache.org/docs/stable/ for details.
 """
 
 # keywords to make Airflow pick up DAGs in this file: airflow DAG
-import json
 
-import pkg_resources
-
-from etl_pm_pipeline_PARTNER_NAME.dags import DAG_NAME_CAMEL_CASEDag
+# importing the DAG modules registers their DAG classes with the factory
+import etl_pm_pipeline_PARTNER_NAME.dags  # pylint: disable=unused-import
+from etl_pm_pipeline_PARTNER_NAME.common.dag_factory import create_dags
+from etl_pm_pipeline_PARTNER_NAME.common.env_config import load_env_config
 
 APP_NAME = 'etl-pm-pipeline-PARTNER_NAME'
 
-# load environment configuration
-env_config = json.loads(pkg_resources.resource_string(
-    __name__, 'env-config.json'
-))
+# load environment configuration (immutable, shared by all DAGs)
+env_config = load_env_config(__name__, 'env-config.json', frozen=True)
 
-# create DAGs
-DAG_NAME_UNDERSCORED_dag = DAG_NAME_CAMEL_CASEDag(APP_NAME, env_config)
+# create DAGs for all configured pipelines, Airflow picks them up from the module globals
+globals().update(
+    (f'{pipeline_name}_dag', dag) for pipeline_name, dag in create_dags(APP_NAME, env_config).items()
+)
@@ -1,24 +1,52 @@
+import os
+
 import pytest
 import requests
 
 
+class MockImdsResponse:
+    def __init__(self, payload=None, text='', status_code=200):
+        self._payload = payload
+        self.text = text
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} error', response=self)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def instance_identity_cache(tmp_path_factory):
+    """Keeps the on-disk instance identity cache out of the host's temp directory."""
+    cache_path = tmp_path_factory.mktemp('instance-identity') / 'instance-identity.json'
+    os.environ['PMI_INSTANCE_IDENTITY_CACHE_PATH'] = str(cache_path)
+    yield cache_path
+    os.environ.pop('PMI_INSTANCE_IDENTITY_CACHE_PATH', None)
+
+
 @pytest.fixture
 def mock_requests(monkeypatch):
-    class MockInstanceIdentityDocumentResponse:
-        def json(self):
-            return {
-                'region': 'us-east-1',
-                'accountId': '000000000000'
-            }
-
     real_requests_get = requests.get
+    real_requests_put = requests.put
 
-    def mock_requests_get(url):
+    def mock_requests_get(url, **kwargs):
         if url == 'http://169.254.169.254/latest/dynamic/instance-identity/document':
-            return MockInstanceIdentityDocumentResponse()
-        return real_requests_get(url)
+            return MockImdsResponse({
+                'region': 'us-east-1',
+                'accountId': '000000000000'
+            })
+        return real_requests_get(url, **kwargs)
+
+    def mock_requests_put(url, **kwargs):
+        if url == 'http://169.254.169.254/latest/api/token':
+            return MockImdsResponse(text='imds-token')
+        return real_requests_put(url, **kwargs)
 
     monkeypatch.setattr(requests, 'get', mock_requests_get)
+    monkeypatch.setattr(requests, 'put', mock_requests_put)
 
 
 @pytest.fixture
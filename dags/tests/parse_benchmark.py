@@ -0,0 +1,192 @@
+"""DAG parse-time benchmark.
+
+Measures how long it takes to import `pipeline.py` and to load it into a `DagBag`, broken down
+into the following phases:
+
+* `airflow_import` - importing Airflow itself.
+* `config_load` - loading the deployment environment configuration.
+* `dag_modules_import` - importing the DAG modules of this project.
+* `pipeline_import` - importing `pipeline.py` (includes config load and DAG construction).
+* `dagbag_load` - loading `pipeline.py` into a `DagBag` the way the scheduler does.
+* `dag_init` - `DAG.__init__` (per DAG).
+* `operators` - operator construction (per DAG).
+* `other` - remaining DAG construction time, e.g. `PMIDAG` setup (per DAG).
+
+The benchmark is meant to run in a fresh interpreter so that import costs are included. Run it
+from the `dags` directory (an `env-config.json` file must exist there)::
+
+    python tests/parse_benchmark.py [--format json|table]
+
+"""
+
+import argparse
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+DAGS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINE_MODULE = 'pipeline'
+
+
+class ParseTimer:
+    """Collects global and per-DAG phase timings (in milliseconds)."""
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.dags = defaultdict(lambda: defaultdict(float))
+        self._local = threading.local()
+
+    def add(self, phase: str, elapsed: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started_at) * 1000)
+
+    def wrap(self, func: Callable, on_done: Callable[[tuple, dict, float], None]) -> Callable:
+        """Wraps a function so that `on_done` receives the duration of its outermost invocations."""
+        depth_attribute = f'depth_{id(func)}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            depth = getattr(self._local, depth_attribute, 0)
+            setattr(self._local, depth_attribute, depth + 1)
+            started_at = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                setattr(self._local, depth_attribute, depth)
+                if depth == 0:
+                    on_done(args, kwargs, (time.perf_counter() - started_at) * 1000)
+
+        return wrapper
+
+    def report(self) -> Dict[str, Any]:
+        dags = OrderedDict()
+        for dag_id, phases in self.dags.items():
+            total = phases.get('total', 0.0)
+            dags[dag_id] = OrderedDict([
+                ('total', total),
+                ('dag_init', phases.get('dag_init', 0.0)),
+                ('operators', phases.get('operators', 0.0)),
+                ('other', max(total - phases.get('dag_init', 0.0) - phases.get('operators', 0.0), 0.0)),
+            ])
+        return OrderedDict([('phases', OrderedDict(self.phases)), ('dags', dags)])
+
+
+def _instrument_config_load(timer: ParseTimer):
+    # pylint: disable=import-outside-toplevel
+    with timer.phase('config_load'):
+        from etl_pm_pipeline_PARTNER_NAME.common import env_config
+
+    env_config.load_env_config = timer.wrap(
+        env_config.load_env_config,
+        lambda args, kwargs, elapsed: timer.add('config_load', elapsed),
+    )
+
+
+def _instrument_airflow(timer: ParseTimer):
+    # pylint: disable=import-outside-toplevel
+    from airflow import settings
+    from airflow.models import DAG, BaseOperator
+
+    def on_dag_init(args, kwargs, elapsed):
+        dag_id = kwargs.get('dag_id') or args[1]
+        timer.dags[dag_id]['dag_init'] += elapsed
+
+    def on_operator_init(args, kwargs, elapsed):
+        dag = kwargs.get('dag') or settings.CONTEXT_MANAGER_DAG
+        if dag is not None:
+            timer.dags[dag.dag_id]['operators'] += elapsed
+
+    DAG.__init__ = timer.wrap(DAG.__init__, on_dag_init)
+    BaseOperator.__init__ = timer.wrap(BaseOperator.__init__, on_operator_init)
+
+
+def _instrument_pmi_dags(timer: ParseTimer):
+    # pylint: disable=import-outside-toplevel
+    with timer.phase('dag_modules_import'):
+        import etl_pm_pipeline_PARTNER_NAME.dags  # pylint: disable=unused-import
+        from etl_pm_pipeline_PARTNER_NAME.common import PMIDAG
+
+    def on_dag_constructed(args, kwargs, elapsed):
+        dag_id = getattr(args[0], 'dag_id', None)
+        if dag_id is not None:
+            timer.dags[dag_id]['total'] += elapsed
+
+    pending = list(PMIDAG.__subclasses__())
+    while pending:
+        dag_class = pending.pop()
+        pending.extend(dag_class.__subclasses__())
+        if '__init__' in dag_class.__dict__:
+            dag_class.__init__ = timer.wrap(dag_class.__dict__['__init__'], on_dag_constructed)
+
+
+def run_benchmark() -> Dict[str, Any]:
+    """Runs the benchmark and returns a report with all timings in milliseconds."""
+    if DAGS_DIR not in sys.path:
+        sys.path.insert(0, DAGS_DIR)
+
+    timer = ParseTimer()
+
+    with timer.phase('airflow_import'):
+        import airflow  # pylint: disable=import-outside-toplevel,unused-import
+        from airflow.models import DagBag  # pylint: disable=import-outside-toplevel
+
+    _instrument_config_load(timer)
+    _instrument_airflow(timer)
+    _instrument_pmi_dags(timer)
+
+    with timer.phase('pipeline_import'):
+        importlib.import_module(PIPELINE_MODULE)
+
+    # only the first (cold) import is attributed to individual DAGs and to the config load
+    report = timer.report()
+    timer.dags.clear()
+
+    with timer.phase('dagbag_load'):
+        dag_bag = DagBag(dag_folder=os.path.join(DAGS_DIR, f'{PIPELINE_MODULE}.py'), include_examples=False)
+
+    report['phases']['dagbag_load'] = timer.phases['dagbag_load']
+    report['dag_count'] = len(dag_bag.dags)
+    report['import_errors'] = {path: str(error) for path, error in dag_bag.import_errors.items()}
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats a benchmark report as a plain text table."""
+    lines = [f"{'Phase':<28} {'ms':>8}"]
+    lines.extend(f'{name:<28} {elapsed:>8.1f}' for name, elapsed in report['phases'].items())
+    lines.append('')
+    lines.append(f"{'DAG':<60} {'total':>8} {'dag_init':>8} {'ops':>8} {'other':>8}")
+    for dag_id, phases in report['dags'].items():
+        lines.append(
+            f"{dag_id:<60} {phases['total']:>8.1f} {phases['dag_init']:>8.1f} "
+            f"{phases['operators']:>8.1f} {phases['other']:>8.1f}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='DAG parse-time benchmark.')
+    arg_parser.add_argument('--format', choices=['json', 'table'], default='json')
+    args = arg_parser.parse_args()
+
+    report = run_benchmark()
+    print(json.dumps(report) if args.format == 'json' else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
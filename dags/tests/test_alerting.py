@@ -0,0 +1,155 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import multiprocessing
+
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.alerting import (
+    ALERT_FLUSH_DELAY_SECONDS,
+    ALERT_WINDOW_SECONDS,
+    AlertAggregator,
+    FailureAlert,
+    SnsPublisher,
+)
+from ..etl_pm_pipeline_PARTNER_NAME.common.status_table import InMemoryStatusTable
+
+WINDOW_START = 1609459200.0
+
+
+class FakeSns:
+    """Local stand-in for the SNS client."""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, **kwargs):
+        self.messages.append(kwargs)
+
+
+class ProcessSharedStatusTable(InMemoryStatusTable):
+    """In-memory status table shared by processes through a multiprocessing manager."""
+
+    def __init__(self, manager):
+        super().__init__()
+        self.items = manager.dict()
+        self._items_lock = manager.Lock()
+
+    def _increment(self, item_id, attribute, amount):
+        with self._items_lock:
+            item = dict(self.items.get(item_id, {'id': item_id}))
+            item[attribute] = item.get(attribute, 0) + amount
+            self.items[item_id] = item
+            return item[attribute]
+
+
+def failure(task_id="process_chunks_0", execution_date="2021-01-01T00:00:00", error="AirflowException: Task 123 failed"):
+    return FailureAlert("etl-pm-PARTNER_NAME-DAG_NAME-v0-test", task_id, execution_date, "worker-1", error)
+
+
+def add_failures(status_table, messages, clock, failures, schedule=lambda delay, function: None):
+    aggregator = AlertAggregator(
+        status_table, lambda subject, message: messages.append(message), clock=clock, schedule=schedule,
+    )
+    return [aggregator.add(alert) for alert in failures]
+
+
+def test_failures_of_a_window_are_published_as_one_digest():
+    context = multiprocessing.get_context('fork')
+    with context.Manager() as manager:
+        status_table = ProcessSharedStatusTable(manager)
+        messages = manager.list()
+
+        # failure callbacks of separate task processes within a single window
+        processes = []
+        for process in range(1, 3):
+            failures = [
+                failure(execution_date=f"2021-01-{day:02d}T00:00:00", error=f"AirflowException: Task {day} failed")
+                for day in range(1, 6)
+            ] + [failure(task_id=f"process_chunks_{process}")]
+            clock = lambda offset=10 * process: WINDOW_START + offset  # pylint: disable=unnecessary-lambda-assignment
+            processes.append(context.Process(target=add_failures, args=(status_table, messages, clock, failures)))
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=30)
+            assert process.exitcode == 0
+
+        assert not messages
+        aggregator = AlertAggregator(status_table, lambda subject, message: messages.append(message))
+        assert aggregator.flush(int(WINDOW_START))
+        assert not aggregator.flush(int(WINDOW_START))
+
+        assert len(messages) == 1
+        digest = messages[0]
+        assert digest.startswith("12 Airflow task failure(s) of 3 kind(s) between 2021-01-01 00:00:00 and 00:01:00 UTC")
+        assert digest.count("Task:            process_chunks_0") == 1
+        assert "Occurrences:     10" in digest
+        assert "Task:            process_chunks_2" in digest
+
+
+def test_window_opener_schedules_the_digests():
+    status_table = InMemoryStatusTable()
+    messages = []
+    scheduled = []
+
+    # the previous window has not been flushed (e.g. its opener was killed)
+    assert add_failures(status_table, messages, lambda: WINDOW_START - 30, [failure()]) == [True]
+
+    schedule = lambda delay, function: scheduled.append((delay, function))  # pylint: disable=unnecessary-lambda-assignment
+    opened = add_failures(status_table, messages, lambda: WINDOW_START + 20, [failure(), failure()], schedule)
+
+    assert opened == [True, False]
+    assert [delay for delay, _ in scheduled] == [0.0, ALERT_WINDOW_SECONDS + ALERT_FLUSH_DELAY_SECONDS - 20]
+    assert not messages
+    for _, flush in scheduled:
+        flush()
+    assert len(messages) == 2
+    assert messages[0].startswith("1 Airflow task failure(s) of 1 kind(s) between 2020-12-31 23:59:00")
+    assert messages[1].startswith("2 Airflow task failure(s) of 1 kind(s) between 2021-01-01 00:00:00")
+
+
+def test_alert_is_published_to_sns():
+    fake_sns = FakeSns()
+    aggregator = AlertAggregator(
+        InMemoryStatusTable(),
+        SnsPublisher("arn:aws:sns:us-east-1:000000000000:alarms", "aws_default", "us-east-1", fake_sns),
+        clock=lambda: WINDOW_START,
+        schedule=lambda delay, function: None,
+    )
+
+    assert aggregator.add(failure())
+    assert not aggregator.add(failure(error="AirflowException: Task 456 failed"))
+    assert aggregator.flush(int(WINDOW_START))
+
+    assert len(fake_sns.messages) == 1
+    message = fake_sns.messages[0]
+    assert message["TargetArn"] == "arn:aws:sns:us-east-1:000000000000:alarms"
+    assert message["Subject"] == "PMI DAG run failures"
+    assert "Error:           AirflowException: Task 123 failed" in message["Message"]
+    assert "Occurrences:     2" in message["Message"]
+
+
+class FailingStatusTable(InMemoryStatusTable):
+
+    def _increment(self, item_id, attribute, amount):
+        raise RuntimeError("DynamoDB unavailable")
+
+
+@pytest.mark.parametrize("status_table", [FailingStatusTable(), None])
+def test_failure_is_published_directly_without_status_table(status_table):
+    messages = []
+
+    add_failures(status_table, messages, lambda: WINDOW_START, [failure()])
+
+    assert len(messages) == 1
+    assert "Error:           AirflowException: Task 123 failed" in messages[0]
+
+
+def test_publish_failure_does_not_raise():
+    def failing_publish(subject, message):
+        raise RuntimeError("SNS unavailable")
+
+    aggregator = AlertAggregator(InMemoryStatusTable(), failing_publish, schedule=lambda delay, function: function())
+
+    assert aggregator.add(failure())
@@ -0,0 +1,46 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+
+from datetime import datetime
+
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.backfill import assign_chunks, backfill_parallelism, plan_backfill
+
+
+def test_plan_backfill_by_day():
+    chunks = plan_backfill(datetime(2021, 1, 1, 23, 45), datetime(2021, 1, 31, 23, 45))
+
+    assert len(chunks) == 30
+    assert chunks[0] == (datetime(2021, 1, 1, 23, 45), datetime(2021, 1, 2, 23, 45))
+    assert chunks[-1] == (datetime(2021, 1, 30, 23, 45), datetime(2021, 1, 31, 23, 45))
+
+
+def test_plan_backfill_by_hour_clips_last_chunk():
+    chunks = plan_backfill(datetime(2021, 1, 1), datetime(2021, 1, 1, 2, 30), 'hour')
+
+    assert chunks == [
+        (datetime(2021, 1, 1, 0), datetime(2021, 1, 1, 1)),
+        (datetime(2021, 1, 1, 1), datetime(2021, 1, 1, 2)),
+        (datetime(2021, 1, 1, 2), datetime(2021, 1, 1, 2, 30)),
+    ]
+
+
+@pytest.mark.parametrize('start_date, end_date, granularity', [
+    (datetime(2021, 1, 2), datetime(2021, 1, 1), 'day'),
+    (datetime(2021, 1, 1), datetime(2021, 1, 2), 'week'),
+    (datetime(2020, 1, 1), datetime(2021, 1, 1), 'hour'),
+])
+def test_plan_backfill_rejects_invalid_ranges(start_date, end_date, granularity):
+    with pytest.raises(ValueError):
+        plan_backfill(start_date, end_date, granularity)
+
+
+def test_backfill_parallelism():
+    assert backfill_parallelism(max_active_runs=1, concurrency=10) == 10
+    assert backfill_parallelism(max_active_runs=3, concurrency=30, max_parallelism=4) == 4
+    assert backfill_parallelism(max_active_runs=4, concurrency=2) == 1
+
+
+def test_assign_chunks_round_robin():
+    assert assign_chunks(list(range(7)), 3) == [[0, 3, 6], [1, 4], [2, 5]]
+    assert assign_chunks([0], 3) == [[0], [], []]
@@ -0,0 +1,55 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.operators.cloudwatch_log_tailer import CloudWatchLogTailer
+
+
+class FakeLogs:
+    """Local stand-in for the CloudWatch Logs client returning pages of two events."""
+
+    class exceptions:  # pylint: disable=invalid-name
+        class ResourceNotFoundException(Exception):
+            pass
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+
+    # pylint: disable=invalid-name, unused-argument
+    def get_log_events(self, logGroupName, logStreamName, nextToken=None, startFromHead=None):
+        self.calls.append(nextToken)
+        offset = int(nextToken or 0)
+        events = [{'timestamp': 0, 'message': message} for message in self.messages[offset:offset + 2]]
+        return {'events': events, 'nextForwardToken': str(offset + len(events))}
+
+
+def test_poll_reads_each_event_once():
+    client = FakeLogs(['a', 'b', 'c'])
+    emitted = []
+    tailer = CloudWatchLogTailer(client, 'group', 'stream', emit=emitted.append, min_poll_interval=0)
+
+    assert tailer.poll() == 3
+    client.messages.append('d')
+    assert tailer.poll() == 1
+
+    assert [event['message'] for event in emitted] == ['a', 'b', 'c', 'd']
+    assert client.calls == [None, '2', '3', '3', '4']
+
+
+def test_poll_is_rate_limited_and_buffer_bounded():
+    client = FakeLogs(['a', 'b', 'c'])
+    tailer = CloudWatchLogTailer(client, 'group', 'stream', emit=lambda event: None, max_buffered_events=2)
+
+    assert tailer.poll() == 3
+    client.messages.append('d')
+    assert tailer.poll() == 0
+    assert tailer.drain() == 1
+
+    assert [event['message'] for event in tailer.events] == ['c', 'd']
+
+
+def test_missing_stream_is_not_an_error():
+    class MissingLogs(FakeLogs):
+        def get_log_events(self, *args, **kwargs):
+            raise self.exceptions.ResourceNotFoundException()
+
+    assert CloudWatchLogTailer(MissingLogs([]), 'group', 'stream', emit=lambda event: None).drain() == 0
@@ -0,0 +1,64 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME import dags  # pylint: disable=unused-import
+from ..etl_pm_pipeline_PARTNER_NAME.common import PMIDAG
+from ..etl_pm_pipeline_PARTNER_NAME.common.backfill import backfill_parallelism
+from ..etl_pm_pipeline_PARTNER_NAME.common.dag_factory import create_dags
+
+
+@pytest.fixture
+def factory_env_config(env_config):
+    pipeline_config = env_config['pipelines']['test_pipeline']
+    env_config['_aws_env'] = {'region': 'us-east-1', 'accountId': '000000000000'}
+    env_config['pipelines'] = {
+        f'partner_pipeline_{index}': {'dag': dict(pipeline_config['dag'], dag_class='DAG_NAME')}
+        for index in range(3)
+    }
+    return env_config
+
+
+def test_create_dags_for_all_pipelines(factory_env_config):
+    created_dags = create_dags('test_app', factory_env_config)
+
+    assert list(created_dags) == ['partner_pipeline_0', 'partner_pipeline_1', 'partner_pipeline_2']
+    assert len({dag.dag_id for dag in created_dags.values()}) == 3
+    assert len({id(dag.environment) for dag in created_dags.values()}) == 1
+
+    dag = created_dags['partner_pipeline_1']
+    assert dag.pipeline_name == 'partner_pipeline_1'
+    assert dag.region_designator == 'ue1'
+    assert dag.aws_stack_main == 'test_app-test-partner_pipeline_1'
+    assert dag.default_args['queue'] == 'ariflow.test.cluster.test'
+
+
+def test_create_dags_with_unknown_dag_class(factory_env_config):
+    factory_env_config['pipelines']['partner_pipeline_0']['dag']['dag_class'] = 'unknown'
+
+    with pytest.raises(ValueError, match='unknown'):
+        create_dags('test_app', factory_env_config)
+
+
+def test_backfill_slots_are_lowered_per_pipeline(factory_env_config):
+    factory_env_config['pipelines']['partner_pipeline_1']['dag']['backfill_slots'] = 4
+    factory_env_config['pipelines']['partner_pipeline_2']['dag']['backfill_slots'] = 10
+
+    created_dags = create_dags('test_app', factory_env_config)
+
+    def backfill_tasks(dag):
+        return sorted(task_id for task_id in dag.task_ids if task_id.startswith('process_chunks_'))
+
+    def slots(count):
+        return sorted(f'process_chunks_{slot}' for slot in range(count))
+
+    dag = created_dags['partner_pipeline_0']
+    parallelism = backfill_parallelism(dag.max_active_runs, dag.concurrency, PMIDAG.MAX_BACKFILL_PARALLELISM)
+    assert parallelism > 4
+    assert backfill_tasks(dag) == slots(parallelism)
+    assert backfill_tasks(created_dags['partner_pipeline_1']) == slots(4)
+
+    # the concurrency shared by the active runs is never exceeded
+    created_dags['partner_pipeline_2'].max_active_runs *= 2
+    assert created_dags['partner_pipeline_2'].backfill_slots == parallelism // 2
@@ -17,18 +17,33 @@ EXPECTED_NUMBER_OF_DAGS = 1
 
 @pytest.fixture(autouse=True)
 def mock_requests(monkeypatch):
-    class MockInstanceIdentityDocumentResponse:
+    class MockImdsResponse:
+        def __init__(self, payload=None, text=""):
+            self._payload = payload
+            self.text = text
+            self.status_code = 200
+
         def json(self):
-            return {"region": "us-east-1", "accountId": "000000000000"}
+            return self._payload
+
+        def raise_for_status(self):
+            pass
 
     real_requests_get = requests.get
+    real_requests_put = requests.put
 
-    def mock_requests_get(url):
+    def mock_requests_get(url, **kwargs):
         if url == "http://169.254.169.254/latest/dynamic/instance-identity/document":
-            return MockInstanceIdentityDocumentResponse()
-        return real_requests_get(url)
+            return MockImdsResponse({"region": "us-east-1", "accountId": "000000000000"})
+        return real_requests_get(url, **kwargs)
+
+    def mock_requests_put(url, **kwargs):
+        if url == "http://169.254.169.254/latest/api/token":
+            return MockImdsResponse(text="imds-token")
+        return real_requests_put(url, **kwargs)
 
     monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr(requests, "put", mock_requests_put)
 
 
 def updated_config(env):
@@ -0,0 +1,54 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+
+from datetime import datetime, timedelta
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.operators.ecs_right_sizing import (
+    TaskRun,
+    fargate_size,
+    parse_metrics,
+    recommend_size,
+    task_run,
+)
+
+
+def run(peak_memory_mib=None, input_bytes=None, out_of_memory=False, memory_mib=2048):
+    return TaskRun('2022-01-01T00:00:00', 60.0, 1024, memory_mib, peak_memory_mib, input_bytes, out_of_memory)
+
+
+def test_fargate_size_is_the_cheapest_valid_size():
+    assert fargate_size(100) == (256, 512)
+    assert fargate_size(3000) == (512, 3072)
+    assert fargate_size(3000, cpu=1024) == (1024, 3072)
+    assert fargate_size(100000) == (4096, 30720)
+
+
+def test_recommend_size_without_history():
+    assert recommend_size([]) is None
+    assert recommend_size([run()]) is None
+
+
+def test_recommend_size_scales_memory_by_input_size():
+    history = [run(peak_memory_mib=1000, input_bytes=10 ** 9), run(peak_memory_mib=1500, input_bytes=2 * 10 ** 9)]
+
+    assert recommend_size(history) == (256, 2048)
+    assert recommend_size(history, input_bytes=8 * 10 ** 9) == (2048, 10240)
+
+
+def test_recommend_size_doubles_memory_after_out_of_memory():
+    assert recommend_size([run(peak_memory_mib=1000), run(out_of_memory=True, memory_mib=2048)]) == (1024, 5120)
+
+
+def test_task_run_from_stopped_task():
+    started_at = datetime(2022, 1, 1)
+    task = {
+        'startedAt': started_at,
+        'stoppedAt': started_at + timedelta(minutes=2),
+        'cpu': '512',
+        'memory': '1024',
+        'containers': [{'name': 'app', 'reason': 'OutOfMemoryError: Container killed due to memory usage'}],
+    }
+    metrics = parse_metrics(['starting', 'PMI_METRICS {"peak_memory_mib": 1000.5}', 'PMI_METRICS invalid'])
+
+    assert task_run(task, '2022-01-01T00:00:00', metrics, input_bytes=10) == TaskRun(
+        '2022-01-01T00:00:00', 120.0, 512, 1024, 1000.5, 10, True,
+    )
@@ -0,0 +1,143 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import pytest
+from airflow.exceptions import AirflowException
+
+from ..etl_pm_pipeline_PARTNER_NAME import dags  # pylint: disable=unused-import
+from ..etl_pm_pipeline_PARTNER_NAME.common.dag_factory import create_dags
+from ..etl_pm_pipeline_PARTNER_NAME.common.operators import (
+    PmiEcsShardedFargateOperator,
+    get_ecs_container_override,
+    get_shard_container_overrides,
+)
+
+
+class FakeEcs:
+    """Local stand-in for the ECS client, shards fail the given number of times before succeeding."""
+
+    def __init__(self, failed_runs=None, failed_starts=None):
+        self.started = []
+        self.environments = []
+        self.failed_runs = dict(failed_runs or {})
+        self.failed_starts = dict(failed_starts or {})
+        self.exit_codes = {}
+
+    def run_task(self, **kwargs):
+        environment = kwargs['overrides']['containerOverrides'][0]['environment']
+        self.environments.append(environment)
+        shard = int(next(variable['value'] for variable in environment if variable['name'] == 'SHARD_INDEX'))
+        self.started.append(shard)
+        if self.failed_starts.get(shard):
+            self.failed_starts[shard] -= 1
+            return {'tasks': [], 'failures': [{'reason': 'RESOURCE:MEMORY'}]}
+
+        task_arn = f'arn:aws:ecs:us-east-1:000000000000:task/{shard}-{len(self.started)}'
+        self.exit_codes[task_arn] = 1 if self.failed_runs.get(shard) else 0
+        if self.failed_runs.get(shard):
+            self.failed_runs[shard] -= 1
+        return {'tasks': [{'taskArn': task_arn}], 'failures': []}
+
+    def describe_tasks(self, cluster, tasks):
+        return {
+            'tasks': [
+                {
+                    'taskArn': arn,
+                    'lastStatus': 'STOPPED',
+                    'containers': [{'name': 'app', 'lastStatus': 'STOPPED', 'exitCode': self.exit_codes[arn]}],
+                }
+                for arn in tasks
+            ],
+            'failures': [],
+        }
+
+
+class FakeHook:
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_client_type(self, client_type, region_name=None):
+        return self.client
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr('time.sleep', lambda seconds: None)
+
+
+@pytest.fixture
+def dag(env_config):
+    env_config['_aws_env'] = {'region': 'us-east-1', 'accountId': '000000000000'}
+    env_config['pipelines']['test_pipeline']['dag']['dag_class'] = 'DAG_NAME'
+    env_config['aws_resources']['test_app-test-prereqs'] = {
+        'ECSClusterName': 'ecs.test.cluster',
+        'VPCPrivateSubnetIds': 'subnet-a,subnet-b',
+        'StatusTableName': 'status-table',
+    }
+    return create_dags('test_app', env_config)['test_pipeline']
+
+
+def sharded_operator(dag, **kwargs):
+    return PmiEcsShardedFargateOperator(
+        task_id='sharded_task',
+        dag=dag,
+        task_definition='task-definition',
+        security_group_id='security-group',
+        container_overrides=[get_ecs_container_override('app', ['python', 'app.py'])],
+        **{'shard_count': 4, 'shard_retries': 1, **kwargs},
+    )
+
+
+def run(operator, client):
+    operator.get_hook = lambda: FakeHook(client)
+    return operator.execute({})
+
+
+def test_shard_container_overrides():
+    container_overrides = [get_ecs_container_override('app', ['python', 'app.py']), {'name': 'sidecar'}]
+
+    overrides = get_shard_container_overrides(container_overrides, 2, 4)
+
+    assert overrides[0]['command'] == ['python', 'app.py', '--shard-index', '2', '--shard-count', '4']
+    assert 'command' not in overrides[1]
+    for override in overrides:
+        assert override['environment'] == [{'name': 'SHARD_INDEX', 'value': '2'}, {'name': 'SHARD_COUNT', 'value': '4'}]
+    assert container_overrides[0]['command'] == ['python', 'app.py']
+    assert 'environment' not in container_overrides[0]
+
+
+def test_only_failed_shards_are_restarted(dag):
+    client = FakeEcs(failed_runs={1: 1}, failed_starts={3: 1})
+
+    task_arns = run(sharded_operator(dag), client)
+
+    assert sorted(client.started[:4]) == [0, 1, 2, 3]
+    assert sorted(client.started[4:]) == [1, 3]
+    assert [task_arn.split('/')[-1].split('-')[0] for task_arn in task_arns] == ['0', '1', '2', '3']
+    assert all({'name': 'STATUS_TABLE_NAME', 'value': 'status-table'} in env for env in client.environments)
+
+
+def test_status_table_is_optional(dag):
+    del dag.env_config['aws_resources'][dag.aws_stack_prereqs]['StatusTableName']
+    client = FakeEcs()
+
+    run(sharded_operator(dag), client)
+
+    assert not any(variable['name'] == 'STATUS_TABLE_NAME' for env in client.environments for variable in env)
+
+
+def test_operator_fails_after_shard_retries(dag):
+    client = FakeEcs(failed_runs={2: 2})
+
+    with pytest.raises(AirflowException, match='1 of 4 shards failed'):
+        run(sharded_operator(dag), client)
+
+    assert client.started.count(2) == 2
+    assert len(client.started) == 5
+
+
+@pytest.mark.parametrize('kwargs', [{'shard_count': 0}, {'wait_for_completion': False}, {'right_sizing': True}])
+def test_unsupported_arguments(dag, kwargs):
+    with pytest.raises(ValueError):
+        sharded_operator(dag, **kwargs)
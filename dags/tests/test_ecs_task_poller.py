@@ -0,0 +1,70 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.operators.ecs_task_poller import (
+    DESCRIBE_TASKS_BATCH_SIZE,
+    EcsTaskPoller,
+    describe_tasks,
+    task_failure_reason,
+)
+
+
+class FakeEcs:
+    """Local stand-in for the ECS client, tasks stop after a given number of polls."""
+
+    def __init__(self, polls_until_stopped=1, exit_code=0):
+        self.calls = []
+        self.polls_until_stopped = polls_until_stopped
+        self.exit_code = exit_code
+
+    def describe_tasks(self, cluster, tasks):
+        self.calls.append(list(tasks))
+        stopped = len(self.calls) >= self.polls_until_stopped
+        status = 'STOPPED' if stopped else 'RUNNING'
+        return {
+            'tasks': [
+                {
+                    'taskArn': arn,
+                    'lastStatus': status,
+                    'containers': [{'name': 'app', 'lastStatus': status, 'exitCode': self.exit_code if stopped else None}],
+                }
+                for arn in tasks if arn != 'missing'
+            ],
+            'failures': [{'arn': 'missing', 'reason': 'MISSING'}] if 'missing' in tasks else [],
+        }
+
+
+@pytest.fixture
+def task_arns():
+    return [f'arn:aws:ecs:us-east-1:000000000000:task/{index}' for index in range(DESCRIBE_TASKS_BATCH_SIZE + 1)]
+
+
+def test_describe_tasks_batches_calls(task_arns):
+    client = FakeEcs()
+
+    tasks = describe_tasks(client, 'cluster', task_arns + ['missing'])
+
+    assert [len(call) for call in client.calls] == [DESCRIBE_TASKS_BATCH_SIZE, 2]
+    assert len(tasks) == len(task_arns) + 1
+    assert task_failure_reason(tasks['missing']).startswith('ECS failure')
+    assert task_failure_reason(tasks[task_arns[0]]) is None
+
+
+def test_task_failure_reason_reports_exit_code():
+    client = FakeEcs(exit_code=1)
+
+    task = describe_tasks(client, 'cluster', ['arn'])['arn']
+
+    assert task_failure_reason(task) == 'Container app exited with code 1: '
+
+
+def test_poller_polls_in_flight_tasks_together(task_arns):
+    client = FakeEcs(polls_until_stopped=3)
+    polls = []
+
+    stopped = EcsTaskPoller(client, 'cluster', initial_interval=0, max_interval=0).wait(task_arns[:5], on_poll=polls.append)
+
+    assert len(client.calls) == len(polls) == 3
+    assert set(stopped) == set(task_arns[:5])
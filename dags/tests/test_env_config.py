@@ -0,0 +1,112 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import copy
+import json
+import os
+import shutil
+import uuid
+
+import jsonschema
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME.common import env_config as env_config_module
+from ..etl_pm_pipeline_PARTNER_NAME.common.env_config import load_env_config
+from .test_dags import updated_config
+
+SCHEMA_PATH = "etl_pm_pipeline_PARTNER_NAME/envs-config.schema.json"
+
+
+@pytest.fixture
+def config_package(tmp_path, monkeypatch):
+    """Creates an importable package containing env-config.json and the environments schema."""
+    package_name = f"env_config_package_{uuid.uuid4().hex}"
+    package_dir = tmp_path / package_name
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    shutil.copy(SCHEMA_PATH, str(package_dir))
+    with open(str(package_dir / "env-config.json"), "w") as env_config_file:
+        json.dump(updated_config("dev"), env_config_file)
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return package_name, package_dir
+
+
+@pytest.fixture
+def validations(monkeypatch):
+    calls = []
+    validate = env_config_module._validate  # pylint: disable=protected-access
+
+    def counting_validate(*args):
+        calls.append(args)
+        validate(*args)
+
+    monkeypatch.setattr(env_config_module, "_validate", counting_validate)
+    return calls
+
+
+def test_config_is_validated_only_when_changed(config_package, validations, tmp_path):
+    package_name, package_dir = config_package
+    snapshot_path = str(tmp_path / "snapshot.json")
+
+    env_config = load_env_config(package_name, schema_anchor=package_name, snapshot_path=snapshot_path)
+    assert env_config["env_id"] == "test"
+    assert load_env_config(package_name, snapshot_path=snapshot_path) == env_config
+
+    # touching the file changes the modification time but not the content
+    os.utime(str(package_dir / "env-config.json"))
+    load_env_config(package_name, snapshot_path=snapshot_path)
+    assert len(validations) == 1
+
+    with open(str(package_dir / "env-config.json"), "w") as env_config_file:
+        json.dump(dict(env_config, region="us-west-2"), env_config_file)
+    assert load_env_config(package_name, snapshot_path=snapshot_path)["region"] == "us-west-2"
+    assert len(validations) == 2
+
+
+def test_invalid_config_is_rejected(config_package, tmp_path):
+    package_name, package_dir = config_package
+    with open(str(package_dir / "env-config.json"), "w") as env_config_file:
+        json.dump(dict(updated_config("dev"), region="mars-central-1"), env_config_file)
+
+    with pytest.raises(jsonschema.ValidationError):
+        load_env_config(package_name, snapshot_path=str(tmp_path / "snapshot.json"))
+
+
+def test_frozen_config_is_shared_and_immutable(config_package, tmp_path):
+    package_name, _ = config_package
+    snapshot_path = str(tmp_path / "snapshot.json")
+
+    env_config = load_env_config(package_name, frozen=True, snapshot_path=snapshot_path)
+
+    assert load_env_config(package_name, frozen=True, snapshot_path=snapshot_path) is env_config
+    assert copy.deepcopy(env_config) is env_config
+    with pytest.raises(TypeError):
+        env_config["pipelines"]["DAG_NAME"]["dag"]["catchup"] = True
+
+
+def test_snapshot_writable_by_other_users_is_not_trusted(config_package, validations, tmp_path):
+    package_name, package_dir = config_package
+    snapshot_dir = tmp_path / "shared"
+    snapshot_dir.mkdir()
+    snapshot_dir.chmod(0o777)
+    stat = os.stat(str(package_dir / "env-config.json"))
+    forged_snapshot = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": "", "config": {"env_id": "forged"}}
+    with open(str(snapshot_dir / "snapshot.json"), "w") as snapshot_file:
+        json.dump({"created_at": 0, "value": forged_snapshot}, snapshot_file)
+
+    env_config = load_env_config(package_name, schema_anchor=package_name, snapshot_path=str(snapshot_dir / "snapshot.json"))
+
+    assert env_config["env_id"] == "test"
+    assert len(validations) == 1
+
+
+def test_config_is_validated_against_the_packaged_schema(config_package, tmp_path):
+    package_name, package_dir = config_package
+    os.remove(str(package_dir / "envs-config.schema.json"))
+
+    with pytest.raises(FileNotFoundError):
+        load_env_config(package_name, schema_anchor=package_name, snapshot_path=str(tmp_path / "snapshot.json"))
+
+    # the default schema is the one shipped with the DAGs package
+    assert load_env_config(package_name, snapshot_path=str(tmp_path / "snapshot.json"))["env_id"] == "test"
@@ -0,0 +1,100 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import json
+import os
+import stat
+import tempfile
+import time
+
+import pytest
+import requests
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.instance_identity import InstanceIdentityProvider
+from ..etl_pm_pipeline_PARTNER_NAME.common.local_cache import cache_file_path
+from .conftest import MockImdsResponse
+
+DOCUMENT = {"region": "us-east-1", "accountId": "000000000000"}
+
+
+@pytest.fixture
+def imds_calls(monkeypatch):
+    calls = []
+
+    def mock_requests_get(url, **kwargs):
+        calls.append(("GET", url, kwargs))
+        return MockImdsResponse(DOCUMENT)
+
+    def mock_requests_put(url, **kwargs):
+        calls.append(("PUT", url, kwargs))
+        return MockImdsResponse(text="imds-token")
+
+    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr(requests, "put", mock_requests_put)
+    return calls
+
+
+def test_document_is_fetched_once_with_token_and_timeout(tmp_path, imds_calls):
+    provider = InstanceIdentityProvider(timeout=0.5, cache_path=str(tmp_path / "identity.json"))
+
+    for _ in range(10):
+        assert provider.get_document() == DOCUMENT
+
+    assert [method for method, _, _ in imds_calls] == ["PUT", "GET"]
+    _, _, get_kwargs = imds_calls[1]
+    assert get_kwargs["timeout"] == 0.5
+    assert get_kwargs["headers"] == {"X-aws-ec2-metadata-token": "imds-token"}
+
+
+def test_document_is_shared_through_disk_cache(tmp_path, imds_calls):
+    cache_path = str(tmp_path / "identity.json")
+    InstanceIdentityProvider(cache_path=cache_path).get_document()
+    imds_calls.clear()
+
+    assert InstanceIdentityProvider(cache_path=cache_path).get_document() == DOCUMENT
+    assert not imds_calls
+
+
+@pytest.mark.parametrize("writable_path", ["file", "directory"])
+def test_disk_cache_writable_by_other_users_is_ignored(tmp_path, imds_calls, writable_path):
+    cache_dir = tmp_path / "shared"
+    cache_path = cache_dir / "identity.json"
+    InstanceIdentityProvider(cache_path=str(cache_path)).get_document()
+    cache_path.write_text(json.dumps({"created_at": time.time(), "value": {"region": "forged", "accountId": "1"}}))
+    (cache_path if writable_path == "file" else cache_dir).chmod(0o777)
+    imds_calls.clear()
+
+    assert InstanceIdentityProvider(cache_path=str(cache_path)).get_document() == DOCUMENT
+    assert imds_calls
+
+
+def test_default_disk_cache_is_private(monkeypatch, tmp_path, imds_calls):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    InstanceIdentityProvider().get_document()
+
+    cache_dir = os.path.dirname(cache_file_path("instance-identity"))
+    assert os.path.dirname(cache_dir) == str(tmp_path)
+    assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+    assert os.path.isfile(cache_file_path("instance-identity"))
+
+
+def test_token_is_reused_after_cache_expiry(tmp_path, imds_calls):
+    provider = InstanceIdentityProvider(cache_path=str(tmp_path / "identity.json"), cache_ttl=0)
+
+    provider.get_document()
+    provider.get_document()
+
+    assert [method for method, _, _ in imds_calls] == ["PUT", "GET", "GET"]
+
+
+def test_expired_document_is_used_when_imds_is_unavailable(tmp_path, imds_calls, monkeypatch):
+    cache_path = str(tmp_path / "identity.json")
+    InstanceIdentityProvider(cache_path=cache_path).get_document()
+
+    def unavailable(url, **kwargs):
+        raise requests.Timeout()
+
+    monkeypatch.setattr(requests, "get", unavailable)
+    monkeypatch.setattr(requests, "put", unavailable)
+
+    assert InstanceIdentityProvider(cache_path=cache_path, cache_ttl=0).get_document() == DOCUMENT
@@ -0,0 +1,67 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name, unused-argument
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from .parse_benchmark import DAGS_DIR, format_report
+from .test_dags import EXPECTED_NUMBER_OF_DAGS, updated_config
+
+# Parse time budgets in milliseconds, can be overridden with environment variables
+DAG_PARSE_BUDGET_MS = float(os.environ.get("DAG_PARSE_BUDGET_MS", "500"))
+DAGBAG_LOAD_BUDGET_MS = float(os.environ.get("DAGBAG_LOAD_BUDGET_MS", "5000"))
+
+
+@pytest.fixture(scope="module")
+def benchmark_env_config():
+    """Writes benchmark config to env-config.json file. File is deleted after tests finish."""
+    env_config = updated_config("dev")
+    # skip the instance metadata service, it is not part of the DAG file parsing cost
+    env_config["_aws_env"] = {"region": "us-east-1", "accountId": "000000000000"}
+    env_config_path = os.path.join(DAGS_DIR, "env-config.json")
+    with open(env_config_path, "w") as env_config_file:
+        json.dump(env_config, env_config_file, indent=2)
+
+    yield env_config
+    os.remove(env_config_path)
+
+
+@pytest.fixture(scope="module")
+def parse_report(benchmark_env_config):
+    """Runs the parse benchmark in a fresh interpreter so that import costs are included."""
+    result = subprocess.run(
+        [sys.executable, os.path.join(DAGS_DIR, "tests", "parse_benchmark.py"), "--format", "json"],
+        cwd=DAGS_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    print(format_report(report))
+    return report
+
+
+def test_dag_parse_time_within_budget(parse_report):
+    assert not parse_report["import_errors"]
+    assert parse_report["dag_count"] == EXPECTED_NUMBER_OF_DAGS
+    assert len(parse_report["dags"]) == EXPECTED_NUMBER_OF_DAGS
+
+    over_budget = {
+        dag_id: round(phases["total"], 1)
+        for dag_id, phases in parse_report["dags"].items()
+        if phases["total"] > DAG_PARSE_BUDGET_MS
+    }
+    assert not over_budget, f"DAGs over the {DAG_PARSE_BUDGET_MS} ms parse budget: {over_budget}"
+
+
+def test_dagbag_load_time_within_budget(parse_report):
+    dagbag_load = parse_report["phases"]["dagbag_load"]
+    assert dagbag_load <= DAGBAG_LOAD_BUDGET_MS, (
+        f"DagBag load took {dagbag_load:.1f} ms, budget is {DAGBAG_LOAD_BUDGET_MS} ms"
+    )
@@ -0,0 +1,101 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.status_table import (
+    BATCH_GET_SIZE,
+    BATCH_WRITE_SIZE,
+    InMemoryStatusTable,
+    StatusTable,
+    deserialize_item,
+    serialize_item,
+)
+
+
+class FakeDynamoDb:
+    """Local stand-in for the DynamoDB client, the first write request is throttled once."""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = []
+        self.throttled = False
+
+    def batch_write_item(self, RequestItems):  # pylint: disable=invalid-name
+        (table_name, requests), = RequestItems.items()
+        self.calls.append(('write', len(requests)))
+        unprocessed = [] if self.throttled else requests[:1]
+        self.throttled = True
+        for request in requests[len(unprocessed):]:
+            item = deserialize_item(request['PutRequest']['Item'])
+            self.items[item['id']] = item
+        return {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+
+    def batch_get_item(self, RequestItems):  # pylint: disable=invalid-name
+        (table_name, request), = RequestItems.items()
+        self.calls.append(('get', len(request['Keys'])))
+        ids = [key['id']['S'] for key in request['Keys']]
+        return {
+            'Responses': {table_name: [{'id': {'S': item_id}} for item_id in ids if item_id in self.items]},
+        }
+
+    def update_item(self, TableName, Key, UpdateExpression, **kwargs):  # pylint: disable=invalid-name
+        assert UpdateExpression == 'ADD #a :v'
+        item = self.items.setdefault(Key['id']['S'], {'id': Key['id']['S']})
+        attribute = kwargs['ExpressionAttributeNames']['#a']
+        item[attribute] = item.get(attribute, 0) + deserialize_item(kwargs['ExpressionAttributeValues'])[':v']
+        return {'Attributes': serialize_item({attribute: item[attribute]})}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr('time.sleep', lambda seconds: None)
+
+
+def test_batch_requests_retry_unprocessed_items():
+    client = FakeDynamoDb()
+    table = StatusTable('status-table', client, cache_ttl=0)
+
+    table.batch_put({'id': str(index), 'value': 1.5} for index in range(BATCH_WRITE_SIZE + 1))
+    items = table.batch_get([str(index) for index in range(BATCH_GET_SIZE + 1)] + ['0'])
+
+    assert len(client.items) == BATCH_WRITE_SIZE + 1
+    assert client.items['0'] == {'id': '0', 'value': 1.5}
+    assert len(items) == BATCH_WRITE_SIZE + 1
+    assert client.calls == [
+        ('write', BATCH_WRITE_SIZE), ('write', 1), ('write', 1), ('get', BATCH_GET_SIZE), ('get', 1),
+    ]
+
+
+def test_read_through_cache():
+    client = FakeDynamoDb()
+    table = StatusTable('status-table', client)
+
+    assert table.get('missing') is None
+    assert table.get('missing') is None
+    table.put({'id': 'written'})
+    assert table.get('written') == {'id': 'written'}
+
+    assert [call for call in client.calls if call[0] == 'get'] == [('get', 1)]
+
+
+def test_in_memory_checkpoints_are_monotonic_and_idempotent():
+    table = InMemoryStatusTable()
+
+    assert table.checkpoint('watermark', '2022-01-02', run_id='a')
+    assert table.checkpoint('watermark', '2022-01-02', run_id='b')
+    assert not table.checkpoint('watermark', '2022-01-01', run_id='c')
+    assert table.get('watermark') == {'id': 'watermark', 'checkpoint': '2022-01-02', 'run_id': 'b'}
+
+    assert table.put_if_absent({'id': 'marker'})
+    assert not table.put_if_absent({'id': 'marker', 'value': 1})
+
+
+def test_increment_is_atomic_counter():
+    table = StatusTable('status-table', FakeDynamoDb())
+    in_memory_table = InMemoryStatusTable()
+
+    for status_table in (table, in_memory_table):
+        assert status_table.increment('counter', 'occurrences') == 1
+        assert status_table.increment('counter', 'occurrences', 2) == 3
+    assert in_memory_table.get('counter') == {'id': 'counter', 'occurrences': 3}
@@ -0,0 +1,59 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, missing-class-docstring
+
+from datetime import datetime, timedelta, timezone
+
+from ..etl_pm_pipeline_PARTNER_NAME.common.status_table import InMemoryStatusTable
+from ..etl_pm_pipeline_PARTNER_NAME.common.watermark import Watermark, incremental_window
+
+END_DATE = datetime(2022, 1, 10)
+DEFAULT_START_DATE = END_DATE - timedelta(hours=24)
+
+
+def window(watermark):
+    return incremental_window(watermark, END_DATE, DEFAULT_START_DATE, timedelta(days=7))
+
+
+def test_incremental_window():
+    assert window(None) == (DEFAULT_START_DATE, END_DATE)
+    assert window(datetime(2022, 1, 7)) == (datetime(2022, 1, 7), END_DATE)
+    assert window(datetime(2021, 12, 1)) == (datetime(2021, 12, 1), datetime(2021, 12, 8))
+    assert window(datetime(2022, 1, 11)) == (END_DATE, END_DATE)
+
+
+def test_watermark_only_moves_forward():
+    watermark = Watermark(InMemoryStatusTable(), 'dag-id')
+    assert watermark.get() is None
+
+    assert watermark.advance(datetime(2022, 1, 10, tzinfo=timezone.utc), run_id='scheduled')
+    assert not watermark.advance(datetime(2022, 1, 9), run_id='manual')
+
+    assert watermark.get() == datetime(2022, 1, 10)
+
+
+def test_capped_windows_catch_up_without_gaps():
+    watermark = Watermark(InMemoryStatusTable(), 'dag-id')
+    watermark.advance(datetime(2021, 12, 20))
+
+    windows = []
+    for _ in range(4):
+        start_date, end_date = incremental_window(watermark.get(), END_DATE, DEFAULT_START_DATE, timedelta(days=7))
+        windows.append((start_date, end_date))
+        assert watermark.extend(start_date, end_date, run_id='scheduled')
+
+    assert windows == [
+        (datetime(2021, 12, 20), datetime(2021, 12, 27)),
+        (datetime(2021, 12, 27), datetime(2022, 1, 3)),
+        (datetime(2022, 1, 3), END_DATE),
+        (END_DATE, END_DATE),
+    ]
+
+
+def test_windows_after_the_watermark_do_not_advance_it():
+    watermark = Watermark(InMemoryStatusTable(), 'dag-id')
+    watermark.advance(datetime(2022, 1, 1))
+
+    assert not watermark.extend(datetime(2022, 1, 20), datetime(2022, 1, 21), run_id='manual')
+    assert watermark.get() == datetime(2022, 1, 1)
+
+    assert watermark.extend(datetime(2021, 12, 31), datetime(2022, 1, 2), run_id='manual')
+    assert watermark.get() == datetime(2022, 1, 2)
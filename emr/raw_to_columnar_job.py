@@ -0,0 +1,343 @@
+"""Converts raw partner drops (CSV, JSON, Avro) to date partitioned Parquet.
+
+Every day of the range is read separately, the day schemas are merged (new columns are added,
+conflicting types widened) and the days are written as ZSTD compressed Parquet partitions of the
+processed location. Only the converted days are overwritten. The converted days are cast to the
+column types of the existing output, a type change the existing type cannot hold fails the
+conversion (see `conform_to_existing_schema`). The schema of the output is kept in its
+`_schema.json` file, so the existing partitions are not read (see `read_output_schema`). Column
+statistics of every converted day are computed from the written data and stored in its partition
+as `_column_stats.json`.
+
+ZSTD needs Hadoop 2.9+ with the native `libzstd` on the cluster (see
+`parquet_compression_available`), use `--compression snappy` elsewhere.
+
+Partitions converted on different days may have different columns, read the output with the
+`mergeSchema` option::
+
+    spark.read.option('mergeSchema', 'true').parquet(output_path)
+
+"""
+
+import json
+from argparse import Namespace
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from etl_pm_pipeline_common.aws.emr.pmi_spark_job import PMISparkJob  # pylint: disable=import-error
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+
+try:  # submitted as a script, with spark_job.py in --py-files
+    from spark_job import (  # pylint: disable=import-error
+        DATE_FORMAT, DEFAULT_PARTITION_TEMPLATE, TARGET_FILE_SIZE_MB, date_partition_paths, list_directories,
+        path_exists, read_json, valid_date, write_json, write_output,
+    )
+except ImportError:
+    from .spark_job import (
+        DATE_FORMAT, DEFAULT_PARTITION_TEMPLATE, TARGET_FILE_SIZE_MB, date_partition_paths, list_directories,
+        path_exists, read_json, valid_date, write_json, write_output,
+    )
+
+COLUMN_STATS_FILE_NAME = '_column_stats.json'
+
+# schema of the whole output (all partitions), written by every conversion
+SCHEMA_FILE_NAME = '_schema.json'
+
+# latest partitions the schema of an output without the schema file is read from
+SCHEMA_SAMPLE_PARTITIONS = 3
+
+DEFAULT_READER_OPTIONS = {
+    'csv': {'header': 'true', 'inferSchema': 'true'},
+    'json': {},
+    'avro': {},
+}
+
+_INTEGRAL_TYPES = (T.ByteType, T.ShortType, T.IntegerType, T.LongType)
+_NUMERIC_TYPES = _INTEGRAL_TYPES + (T.FloatType, T.DoubleType, T.DecimalType)
+
+# types whose min/max values are collected to the column statistics
+_ORDERED_TYPES = _NUMERIC_TYPES + (T.StringType, T.DateType, T.TimestampType, T.BooleanType)
+
+
+def merge_types(left: T.DataType, right: T.DataType) -> T.DataType:
+    """Returns a type both types can be cast to without losing values."""
+    if left == right or isinstance(right, T.NullType):
+        return left
+    if isinstance(left, T.NullType):
+        return right
+    if isinstance(left, T.StructType) and isinstance(right, T.StructType):
+        return merge_schemas([left, right])
+    if isinstance(left, T.ArrayType) and isinstance(right, T.ArrayType):
+        return T.ArrayType(merge_types(left.elementType, right.elementType))
+    if isinstance(left, _INTEGRAL_TYPES) and isinstance(right, _INTEGRAL_TYPES):
+        return T.LongType()
+    if isinstance(left, _NUMERIC_TYPES) and isinstance(right, _NUMERIC_TYPES):
+        return T.DoubleType()
+    return T.StringType()
+
+
+def merge_schemas(schemas: Sequence[T.StructType]) -> T.StructType:
+    """Merges the schemas, the columns are ordered by their first occurrence and all are nullable."""
+    fields: Dict[str, T.DataType] = {}
+    for schema in schemas:
+        for field in schema.fields:
+            fields[field.name] = merge_types(fields[field.name], field.dataType) if field.name in fields else field.dataType
+    return T.StructType([T.StructField(name, data_type, True) for name, data_type in fields.items()])
+
+
+def _conform(column: Column, source: T.DataType, target: T.DataType) -> Column:
+    if source == target:
+        return column
+    if isinstance(target, T.StringType) and isinstance(source, (T.StructType, T.ArrayType, T.MapType)):
+        return F.to_json(column)
+    if isinstance(target, T.StructType) and isinstance(source, T.StructType):
+        source_fields = {field.name: field.dataType for field in source.fields}
+        return F.struct(*[
+            _conform(column[field.name], source_fields[field.name], field.dataType).alias(field.name)
+            if field.name in source_fields else F.lit(None).cast(field.dataType).alias(field.name)
+            for field in target.fields
+        ])
+    return column.cast(target)
+
+
+def conform_to_schema(df: DataFrame, schema: T.StructType) -> DataFrame:
+    """Selects the columns of the schema, casting the existing ones and adding the missing ones as nulls."""
+    source_fields = {field.name: field.dataType for field in df.schema.fields}
+    return df.select(*[
+        _conform(F.col(f'`{field.name}`'), source_fields[field.name], field.dataType).alias(field.name)
+        if field.name in source_fields else F.lit(None).cast(field.dataType).alias(field.name)
+        for field in schema.fields
+    ])
+
+
+def _keeps_type(existing: T.DataType, merged: T.DataType) -> bool:
+    """Checks that the merged type only adds struct fields to the existing type (Parquet merges such schemas)."""
+    if existing == merged:
+        return True
+    if isinstance(existing, T.StructType) and isinstance(merged, T.StructType):
+        merged_fields = {field.name: field.dataType for field in merged.fields}
+        return all(
+            field.name in merged_fields and _keeps_type(field.dataType, merged_fields[field.name])
+            for field in existing.fields
+        )
+    if isinstance(existing, T.ArrayType) and isinstance(merged, T.ArrayType):
+        return _keeps_type(existing.elementType, merged.elementType)
+    return False
+
+
+def conform_to_existing_schema(df: DataFrame, existing_schema: T.StructType) -> DataFrame:
+    """Casts the columns of the data frame to their types in the existing output, new columns are added.
+
+    Partitions written before keep their types on disk, a column whose type changed would make
+    the output unreadable with `mergeSchema`. The converted days are therefore cast to the types of
+    the existing output (e.g. integer values of a double column), columns whose existing type
+    cannot hold the new values (e.g. an integer column receiving doubles or strings) fail the
+    conversion, the existing partitions must be rewritten to change the type.
+    """
+    schema = merge_schemas([existing_schema, df.schema])
+    existing_types = {field.name: field.dataType for field in existing_schema.fields}
+    changed = [
+        f'{field.name} ({existing_types[field.name].simpleString()} -> {field.dataType.simpleString()})'
+        for field in schema.fields
+        if field.name in existing_types and not _keeps_type(existing_types[field.name], field.dataType)
+    ]
+    if changed:
+        raise ValueError(f'Column types changed incompatibly with the existing output: {", ".join(changed)}')
+
+    return conform_to_schema(df, schema)
+
+
+def parquet_compression_available(spark: SparkSession, compression: str) -> bool:
+    """Checks that the cluster can write Parquet with the compression codec.
+
+    ZSTD Parquet compression of Spark 2.4 goes through the Hadoop `ZStandardCodec`, which needs
+    Hadoop 2.9 or newer with the native `libzstd` (EMR 5.x releases with Hadoop 2.8 lack it).
+    """
+    if compression.lower() != 'zstd':
+        return True
+    # pylint: disable=protected-access
+    try:
+        return bool(spark.sparkContext._jvm.org.apache.hadoop.io.compress.ZStandardCodec.isNativeCodeLoaded())
+    except Exception:  # pylint: disable=broad-except
+        # the codec class is missing (py4j returns a package that is not callable)
+        return False
+
+
+def read_raw_days(
+        spark: SparkSession,
+        base_path: str,
+        start_date: datetime,
+        end_date: datetime,
+        input_format: str,
+        partition_template: str = DEFAULT_PARTITION_TEMPLATE,
+        partition_column: str = 'date',
+        reader_options: Dict[str, str] = None,
+) -> DataFrame:
+    """Reads the raw days of the range separately and returns them in a single data frame of the merged schema.
+
+    A day is read with its own schema (the partner may add or change columns any day), the days
+    are conformed to the merged schema and get the `partition_column` with their date.
+    """
+    options = {**DEFAULT_READER_OPTIONS.get(input_format, {}), **(reader_options or {})}
+    days = []
+    day = start_date
+    while day < end_date:
+        paths = [
+            path
+            for path in date_partition_paths(base_path, day, min(day + timedelta(days=1), end_date), partition_template)
+            if path_exists(spark, path)
+        ]
+        if paths:
+            print(f'Reading {len(paths)} {input_format} path(s) of {day.strftime(DATE_FORMAT)}')
+            df = spark.read.format(input_format).options(**options).load(paths)
+            days.append(df.withColumn(partition_column, F.lit(day.strftime(DATE_FORMAT)).cast(T.DateType())))
+        day += timedelta(days=1)
+    if not days:
+        raise ValueError(f'No raw data in {base_path} between {start_date} and {end_date}')
+
+    schema = merge_schemas([df.schema for df in days])
+    conformed = [conform_to_schema(df, schema) for df in days]
+    result = conformed[0]
+    for df in conformed[1:]:
+        result = result.union(df)
+    return result
+
+
+def _statistics_aggregates(fields: Sequence[T.StructField]) -> List[Column]:
+    aggregates = [F.count(F.lit(1)).alias('rows')]
+    for field in fields:
+        column = F.col(f'`{field.name}`')
+        aggregates.append(F.sum(column.isNull().cast('long')).alias(f'{field.name}.null_count'))
+        if isinstance(field.dataType, _ORDERED_TYPES):
+            aggregates.append(F.min(column).alias(f'{field.name}.min'))
+            aggregates.append(F.max(column).alias(f'{field.name}.max'))
+    return aggregates
+
+
+def _statistics(fields: Sequence[T.StructField], row: Dict[str, Any]) -> Dict[str, Any]:
+    statistics = {}
+    for field in fields:
+        statistics[field.name] = {
+            'type': field.dataType.simpleString(),
+            'null_count': row[f'{field.name}.null_count'] or 0,
+        }
+        if isinstance(field.dataType, _ORDERED_TYPES):
+            statistics[field.name]['min'] = _json_value(row[f'{field.name}.min'])
+            statistics[field.name]['max'] = _json_value(row[f'{field.name}.max'])
+    return {'rows': row['rows'], 'columns': statistics}
+
+
+def column_statistics(df: DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Returns the null counts and min/max values (of ordered types) of the columns, computed in a single pass."""
+    return _statistics(df.schema.fields, df.agg(*_statistics_aggregates(df.schema.fields)).first().asDict())
+
+
+def partition_statistics(df: DataFrame, partition_column: str) -> Dict[str, Dict[str, Any]]:
+    """Returns the `column_statistics` of every partition (by the partition value), computed in a single pass."""
+    fields = [field for field in df.schema.fields if field.name != partition_column]
+    rows = df.groupBy(partition_column).agg(*_statistics_aggregates(fields)).collect()
+    return {_json_value(row[partition_column]): _statistics(fields, row.asDict()) for row in rows}
+
+
+def read_output_schema(spark: SparkSession, output_path: str, partition_column: str) -> Optional[T.StructType]:
+    """Returns the schema of the existing output or `None` if there is no output.
+
+    The schema is read from the schema file of the output. Outputs converted before the schema
+    file was introduced get the schema of their latest partitions (`SCHEMA_SAMPLE_PARTITIONS`).
+    """
+    output_path = output_path.rstrip('/')
+    schema = read_json(spark, f'{output_path}/{SCHEMA_FILE_NAME}')
+    if schema is not None:
+        return T.StructType.fromJson(schema)
+
+    partitions = [
+        directory for directory in list_directories(spark, output_path) if directory.startswith(f'{partition_column}=')
+    ][-SCHEMA_SAMPLE_PARTITIONS:]
+    if not partitions:
+        return None
+    print(f'No schema file in {output_path}, reading the schema of partitions {partitions}')
+    return spark.read.option('mergeSchema', 'true').option('basePath', output_path) \
+        .parquet(*[f'{output_path}/{partition}' for partition in partitions]).schema
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def execute(spark: SparkSession, args: Namespace) -> None:
+    if not parquet_compression_available(spark, args.compression):
+        raise ValueError(f'Parquet compression {args.compression} is not available on the cluster, use e.g. --compression snappy')
+
+    end_date = args.end_date or args.start_date + timedelta(days=1)
+    df = read_raw_days(
+        spark, args.input_path, args.start_date, end_date, args.input_format,
+        args.partition_template, args.partition_column, dict(args.reader_options),
+    )
+    output_path = args.output_path.rstrip('/')
+    existing_schema = read_output_schema(spark, output_path, args.partition_column)
+    if existing_schema is not None:
+        # the converted days keep the types of the days converted before
+        df = conform_to_existing_schema(df, existing_schema)
+
+    # the statistics are computed from the cached data frame `write_output` writes (and unpersists)
+    df = df.persist(StorageLevel.MEMORY_AND_DISK)
+    statistics = partition_statistics(df, args.partition_column)
+    # only the converted days are replaced, other partitions of the output are kept
+    write_output(
+        df, output_path,
+        partition_by=[args.partition_column],
+        target_file_size_mb=args.target_file_size_mb,
+        options={'compression': args.compression, 'partitionOverwriteMode': 'dynamic'},
+        sort_by=args.sort_by,
+    )
+    write_json(spark, f'{output_path}/{SCHEMA_FILE_NAME}', json.loads(df.schema.json()))
+    for partition, partition_stats in sorted(statistics.items()):
+        write_json(spark, f'{output_path}/{args.partition_column}={partition}/{COLUMN_STATS_FILE_NAME}', partition_stats)
+    rows = sum(partition_stats['rows'] for partition_stats in statistics.values())
+    print(f"Converted {rows} rows of {len(statistics)} day(s) of {args.input_path} to {output_path}")
+
+
+def _reader_option(option: str) -> List[str]:
+    key, separator, value = option.partition('=')
+    if not separator:
+        raise ValueError(f'Reader option {option} must be in format key=value')
+    return [key, value]
+
+
+class RawToColumnarJob(PMISparkJob):
+
+    def __init__(self):
+        super().__init__()
+
+        self.add_argument('--input-path', required=True, help='raw location, e.g. s3://{DataLakeRawBucket}/partner')
+        self.add_argument('--output-path', required=True, help='processed location')
+        self.add_argument('--input-format', choices=sorted(DEFAULT_READER_OPTIONS), required=True)
+        self.add_argument('--reader-option', dest='reader_options', type=_reader_option, action='append', default=[],
+                          help='option of the raw data reader in format key=value, e.g. delimiter=|')
+        self.add_argument('--start-date', type=valid_date, required=True, help='first converted date, format YYYY-MM-DD')
+        self.add_argument('--end-date', type=valid_date, help='end of the converted range (exclusive), format YYYY-MM-DD')
+        self.add_argument('--partition-template', default=DEFAULT_PARTITION_TEMPLATE,
+                          help='date partition layout of the input path (strftime format)')
+        self.add_argument('--partition-column', default='date', help='date partition column of the output')
+        self.add_argument('--sort-by', nargs='*', default=[],
+                          help='columns the rows are sorted by within the files, for Parquet row group pruning')
+        self.add_argument('--compression', default='zstd',
+                          help='Parquet compression codec, zstd needs Hadoop 2.9+ with native libzstd')
+        self.add_argument('--target-file-size-mb', type=float, default=TARGET_FILE_SIZE_MB)
+
+    def _get_job_name(self, _):
+        return "Raw to columnar conversion"
+
+    def execute(self, spark: SparkSession, args: Namespace):
+        execute(spark, args)
+
+
+if __name__ == '__main__':
+    RawToColumnarJob().run()
@@ -1,28 +1,759 @@
+import argparse
+import hashlib
+import json
+import math
+import re
+import statistics
+import threading
+import time
 from argparse import Namespace
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import reduce
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 
 from etl_pm_pipeline_common.aws.emr.pmi_spark_job import PMISparkJob  # pylint: disable=import-error
-from pyspark.sql import DataFrame, SparkSession
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+from py4j.java_gateway import JavaObject
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# layout of the date partitions of the input path (strftime format), hourly partitions use %H
+DEFAULT_PARTITION_TEMPLATE = 'date=%Y-%m-%d'
+
+TARGET_FILE_SIZE_MB = 256
+
+# job metrics document written to the output path (ignored by Spark, Athena and Glue readers)
+METRICS_FILE_NAME = '_job_metrics.json'
+
+# completion marker of a stage checkpoint, written once the stage output is complete
+CHECKPOINT_MARKER_NAME = '_CHECKPOINT_COMPLETE'
+
+# arguments not affecting the job result, they do not change the run id of the checkpoints
+_RUN_ID_IGNORED_ARGUMENTS = ('force', 'run_id', 'checkpoint_path', 'metrics')
+
+# share of the (sampled) rows above which a key is hot and its rows are salted
+HOT_KEY_THRESHOLD = 0.01
+SKEW_SAMPLE_FRACTION = 0.01
+MAX_HOT_KEYS = 100
+
+# number of partitions the rows of every hot key are spread over
+SALT_BUCKETS = 32
+SALT_COLUMN = '_salt'
+
+# aggregate functions computed per salt, with the functions merging the partial results
+_MERGE_AGGREGATES = {
+    'sum': F.sum,
+    'count': F.sum,
+    'min': F.min,
+    'max': F.max,
+    'collect_list': lambda column: F.flatten(F.collect_list(column)),
+    'collect_set': lambda column: F.array_distinct(F.flatten(F.collect_list(column))),
+    'count_distinct': F.sum,
+}
+
+# size of compressed columnar output relative to the Spark in-memory row size
+COLUMNAR_COMPRESSION_RATIO = 0.3
+
+# estimated sizes of variable length values, the same as Spark `DataType.defaultSize`
+_TYPE_SIZES = {
+    T.BooleanType: 1,
+    T.ByteType: 1,
+    T.ShortType: 2,
+    T.IntegerType: 4,
+    T.LongType: 8,
+    T.FloatType: 4,
+    T.DoubleType: 8,
+    T.DateType: 4,
+    T.TimestampType: 8,
+    T.StringType: 20,
+    T.BinaryType: 100,
+    T.NullType: 1,
+}
+
+
+def valid_date(date_string: str) -> datetime:
+    try:
+        return datetime.strptime(date_string, DATE_FORMAT)
+    except ValueError as val_err:
+        raise argparse.ArgumentTypeError(f"Date {date_string} must be in format {DATE_FORMAT}") from val_err
+
+
+def date_partition_paths(
+        base_path: str,
+        start_date: datetime,
+        end_date: datetime,
+        partition_template: str = DEFAULT_PARTITION_TEMPLATE,
+) -> List[str]:
+    """Returns paths of the date partitions from `start_date` (inclusive) to `end_date` (exclusive).
+
+    Partitions are hourly if the template contains `%H`, daily otherwise.
+    """
+    step = timedelta(hours=1) if '%H' in partition_template else timedelta(days=1)
+    paths = []
+    partition_date = start_date
+    while partition_date < end_date:
+        path = f"{base_path.rstrip('/')}/{partition_date.strftime(partition_template)}"
+        if path not in paths:
+            paths.append(path)
+        partition_date += step
+    return paths
+
+
+def _hadoop_file_system(spark: SparkSession, path: str):
+    # pylint: disable=protected-access
+    jvm_path = spark.sparkContext._jvm.org.apache.hadoop.fs.Path(path)
+    return jvm_path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration()), jvm_path
+
+
+def path_exists(spark: SparkSession, path: str) -> bool:
+    """Checks a path with the Hadoop file system API (a single request, no recursive listing)."""
+    file_system, jvm_path = _hadoop_file_system(spark, path)
+    return file_system.exists(jvm_path)
+
+
+def read_date_range(
+        spark: SparkSession,
+        base_path: str,
+        start_date: datetime,
+        end_date: datetime,
+        input_format: str = 'parquet',
+        partition_template: str = DEFAULT_PARTITION_TEMPLATE,
+) -> DataFrame:
+    """Reads only the date partitions of the input path within the date range.
+
+    Spark lists and reads just the selected partition directories instead of the whole input path.
+    The partition columns (e.g. `date`) are kept, because the partitions are read relative to the
+    `basePath`.
+    """
+    paths = [
+        path
+        for path in date_partition_paths(base_path, start_date, end_date, partition_template)
+        if path_exists(spark, path)
+    ]
+    if not paths:
+        raise ValueError(f'No partitions of {base_path} between {start_date} and {end_date}')
+
+    print(f'Reading {len(paths)} partition(s) of {base_path}')
+    return spark.read.format(input_format).option('basePath', base_path).load(paths)
+
+
+def read_input(spark: SparkSession, args: Namespace) -> DataFrame:
+    """Reads the job input, pruned to the `--start-date`/`--end-date` partitions if provided."""
+    if args.start_date is None:
+        return spark.read.format(args.input_format).load(args.input_path)
+    end_date = args.end_date or args.start_date + timedelta(days=1)
+    return read_date_range(spark, args.input_path, args.start_date, end_date, args.input_format, args.partition_template)
+
+
+def estimate_row_bytes(data_type: T.DataType) -> int:
+    """Estimates the size of a row (or value) of the given type."""
+    if isinstance(data_type, T.StructType):
+        return sum(estimate_row_bytes(field.dataType) for field in data_type.fields)
+    if isinstance(data_type, T.ArrayType):
+        return estimate_row_bytes(data_type.elementType)
+    if isinstance(data_type, T.MapType):
+        return estimate_row_bytes(data_type.keyType) + estimate_row_bytes(data_type.valueType)
+    if isinstance(data_type, T.DecimalType):
+        return 8 if data_type.precision <= 18 else 16
+    return _TYPE_SIZES.get(type(data_type), 8)
+
+
+def output_file_count(
+        row_count: int,
+        schema: T.StructType,
+        target_file_size_mb: float = TARGET_FILE_SIZE_MB,
+        compression_ratio: float = COLUMNAR_COMPRESSION_RATIO,
+) -> int:
+    """Returns the number of files the rows should be written to, to get files of the target size."""
+    output_bytes = row_count * estimate_row_bytes(schema) * compression_ratio
+    return max(1, math.ceil(output_bytes / (target_file_size_mb * 1024 * 1024)))
+
+
+def write_output(
+        df: DataFrame,
+        path: str,
+        output_format: str = 'parquet',
+        partition_by: Sequence[str] = (),
+        mode: str = 'overwrite',
+        target_file_size_mb: float = TARGET_FILE_SIZE_MB,
+        options: Optional[Mapping[str, Any]] = None,
+        sort_by: Sequence[str] = (),
+) -> None:
+    """Writes the data frame in files of about the target size.
+
+    The output size is estimated from the row count and the schema. Unpartitioned output is
+    repartitioned to the estimated file count. Partitioned output is clustered by the partition
+    columns (one task per partition) and split into files by `maxRecordsPerFile`. Rows are sorted
+    by the `sort_by` columns within the files, so the min/max statistics of columnar formats
+    (Parquet row groups) let readers skip most of the data when filtering by these columns.
+    """
+    persisted = df.persist(StorageLevel.MEMORY_AND_DISK)
+    try:
+        row_count = persisted.count()
+        file_count = output_file_count(row_count, persisted.schema, target_file_size_mb)
+        print(f'Writing {row_count} rows to {path} in ~{file_count} file(s)')
+
+        if partition_by:
+            df = persisted.repartition(*partition_by)
+        elif file_count < persisted.rdd.getNumPartitions():
+            df = persisted.coalesce(file_count)
+        else:
+            df = persisted.repartition(file_count)
+        if sort_by:
+            df = df.sortWithinPartitions(*partition_by, *sort_by)
+
+        writer = df.write
+        if partition_by:
+            records_per_file = max(1, math.ceil(row_count / file_count))
+            writer = writer.partitionBy(*partition_by).option('maxRecordsPerFile', records_per_file)
+        writer.format(output_format).options(**(options or {})).mode(mode).save(path)
+    finally:
+        persisted.unpersist()
+
+
+def list_data_files(spark: SparkSession, path: str) -> Dict[str, List[int]]:
+    """Returns sizes of the data files under the path by directory (skips `_SUCCESS` and hidden files)."""
+    file_system, jvm_path = _hadoop_file_system(spark, path)
+    files = defaultdict(list)
+    iterator = file_system.listFiles(jvm_path, True)
+    while iterator.hasNext():
+        status = iterator.next()
+        name = status.getPath().getName()
+        if not name.startswith(('_', '.')):
+            files[status.getPath().getParent().toString()].append(status.getLen())
+    return files
+
+
+def list_directories(spark: SparkSession, path: str) -> List[str]:
+    """Returns the names of the directories directly under the path (a single, non-recursive listing)."""
+    file_system, jvm_path = _hadoop_file_system(spark, path)
+    if not file_system.exists(jvm_path):
+        return []
+    return sorted(status.getPath().getName() for status in file_system.listStatus(jvm_path) if status.isDirectory())
+
+
+def _hidden_sibling(directory: str, suffix: str) -> str:
+    """Returns a hidden path next to the directory (Spark skips paths starting with `.` when reading)."""
+    parent, name = directory.rstrip('/').rsplit('/', 1)
+    return f'{parent}/.{name}.{suffix}'
+
+
+def _rename(file_system, source, destination) -> None:
+    # Hadoop reports most rename failures by the return value
+    if not file_system.rename(source, destination):
+        raise IOError(f'Failed to rename {source.toString()} to {destination.toString()}')
+
+
+def replace_directory(spark: SparkSession, directory: str, replacement: str) -> None:
+    """Replaces a directory with another one without a window in which the data are lost.
+
+    The original directory is renamed aside (`.<name>.old`), the replacement is renamed in and
+    only then the original is deleted. A replacement interrupted between the renames is recovered
+    by `recover_replaced_directory`. Renames are atomic on HDFS, but on S3 they copy and delete
+    the files one by one, so readers of the directory must not run during the replacement there.
+    """
+    file_system, jvm_directory = _hadoop_file_system(spark, directory)
+    jvm_replacement = _hadoop_file_system(spark, replacement)[1]
+    jvm_original = _hadoop_file_system(spark, _hidden_sibling(directory, 'old'))[1]
+
+    _rename(file_system, jvm_directory, jvm_original)
+    try:
+        _rename(file_system, jvm_replacement, jvm_directory)
+    except Exception:
+        _rename(file_system, jvm_original, jvm_directory)
+        raise
+    file_system.delete(jvm_original, True)
+
+
+def recover_replaced_directory(spark: SparkSession, directory: str) -> None:
+    """Restores the original directory of a `replace_directory` interrupted between its renames."""
+    file_system, jvm_directory = _hadoop_file_system(spark, directory)
+    jvm_original = _hadoop_file_system(spark, _hidden_sibling(directory, 'old'))[1]
+    if not file_system.exists(jvm_original):
+        return
+    if file_system.exists(jvm_directory):
+        # the replacement was renamed in, only the original was not deleted
+        file_system.delete(jvm_original, True)
+    else:
+        print(f'Restoring {directory} from an interrupted compaction')
+        _rename(file_system, jvm_original, jvm_directory)
+
+
+def compact_output(
+        spark: SparkSession,
+        path: str,
+        output_format: str = 'parquet',
+        target_file_size_mb: float = TARGET_FILE_SIZE_MB,
+) -> None:
+    """Rewrites output directories (partitions) whose files are much smaller than the target size.
+
+    A directory is rewritten to a hidden temporary directory first and swapped in by
+    `replace_directory` once the rewrite succeeded, see there for the guarantees for readers.
+    """
+    target_bytes = target_file_size_mb * 1024 * 1024
+    directories = list_data_files(spark, path)
+    for directory in sorted(directories):
+        parent, name = directory.rsplit('/', 1)
+        if name.startswith('.'):
+            # temporary directory of an interrupted compaction
+            if name.endswith('.old'):
+                recover_replaced_directory(spark, f"{parent}/{name[1:-len('.old')]}")
+            continue
+
+        sizes = directories[directory]
+        file_count = max(1, math.ceil(sum(sizes) / target_bytes))
+        if len(sizes) <= file_count or sum(sizes) / len(sizes) > target_bytes / 2:
+            continue
+
+        print(f'Compacting {len(sizes)} files of {directory} into {file_count} file(s)')
+        compacted_directory = _hidden_sibling(directory, 'compacted')
+        spark.read.format(output_format).load(directory).coalesce(file_count) \
+            .write.format(output_format).mode('overwrite').save(compacted_directory)
+        replace_directory(spark, directory, compacted_directory)
+
+
+def detect_hot_keys(
+        df: DataFrame,
+        keys: Sequence[str],
+        threshold: float = HOT_KEY_THRESHOLD,
+        sample_fraction: float = SKEW_SAMPLE_FRACTION,
+        max_hot_keys: int = MAX_HOT_KEYS,
+        seed: Optional[int] = None,
+) -> List[Tuple[Any, ...]]:
+    """Returns the keys with more than `threshold` share of the rows, the most frequent first.
+
+    Key frequencies are estimated from a sample of the rows, only the (few) hot keys are collected
+    to the driver.
+    """
+    counts = df.select(*keys).sample(False, sample_fraction, seed).groupBy(*keys).count() \
+        .persist(StorageLevel.MEMORY_AND_DISK)
+    try:
+        sampled_rows = counts.agg(F.sum('count')).first()[0]
+        if not sampled_rows:
+            return []
+        hot_keys = counts.where(F.col('count') > threshold * sampled_rows) \
+            .orderBy(F.col('count').desc()).limit(max_hot_keys).collect()
+    finally:
+        counts.unpersist()
+
+    for row in hot_keys:
+        print(f"Hot key {dict(zip(keys, row[:len(keys)]))}: ~{row['count'] / sampled_rows:.1%} of rows")
+    return [tuple(row[:len(keys)]) for row in hot_keys]
+
+
+def _is_hot_key(keys: Sequence[str], hot_keys: Sequence[Tuple[Any, ...]]) -> Column:
+    """Returns a condition matching the rows of the hot keys (null safe, null is often the hottest key)."""
+    return reduce(
+        lambda condition, hot_key: condition | reduce(
+            lambda match, key_value: match & F.col(key_value[0]).eqNullSafe(F.lit(key_value[1])),
+            zip(keys, hot_key),
+            F.lit(True),
+        ),
+        hot_keys,
+        F.lit(False),
+    )
+
+
+def salted_aggregate(
+        df: DataFrame,
+        keys: Sequence[str],
+        aggregations: Mapping[str, Tuple[str, str]],
+        hot_keys: Optional[Sequence[Tuple[Any, ...]]] = None,
+        salt_buckets: int = SALT_BUCKETS,
+) -> DataFrame:
+    """Aggregates the data frame by the keys, spreading the rows of hot keys over `salt_buckets` tasks.
+
+    Parameters
+    ----------
+    df
+        Data frame to aggregate.
+    keys
+        Grouping columns.
+    aggregations
+        Output column name -> (aggregate function, column), e.g. `{'rows': ('count', '*')}`.
+        Supported functions are `sum`, `count`, `min`, `max`, `collect_list`, `collect_set`
+        and `count_distinct` (of at most one column).
+    hot_keys
+        Keys to salt, detected with `detect_hot_keys` if not provided.
+    salt_buckets
+        Number of partial aggregates of every hot key.
+
+    Rows of the hot keys are aggregated per (key, salt) first and the partial results are merged
+    per key. Other keys get a single salt, so they are aggregated as usual. Spark combines `sum`,
+    `count`, `min` and `max` map side already; salting pays off mostly for `count_distinct` and
+    collects, whose values of a hot key would otherwise be processed by a single task. Distinct
+    values are salted by their hash, so the distinct counts of the salts add up.
+    """
+    unsupported = sorted({function for function, _ in aggregations.values()} - set(_MERGE_AGGREGATES))
+    if unsupported:
+        raise ValueError(f'Aggregate functions {unsupported} cannot be salted, use {sorted(_MERGE_AGGREGATES)}')
+    distinct_columns = {column for function, column in aggregations.values() if function == 'count_distinct'}
+    if len(distinct_columns) > 1:
+        raise ValueError(f'Only one count_distinct column can be salted, got {sorted(distinct_columns)}')
+
+    def aggregate(function: str, column: str) -> Column:
+        if function == 'count_distinct':
+            return F.countDistinct(column)
+        return getattr(F, function)(column)
+
+    if hot_keys is None:
+        hot_keys = detect_hot_keys(df, keys)
+    if not hot_keys:
+        return df.groupBy(*keys).agg(*[
+            aggregate(function, column).alias(name) for name, (function, column) in aggregations.items()
+        ])
+
+    if distinct_columns:
+        salt = F.pmod(F.hash(F.col(next(iter(distinct_columns)))), F.lit(salt_buckets))
+    else:
+        salt = F.floor(F.rand() * salt_buckets)
+    partial = df.withColumn(SALT_COLUMN, F.when(_is_hot_key(keys, hot_keys), salt).otherwise(F.lit(0)).cast('int')) \
+        .groupBy(*keys, SALT_COLUMN) \
+        .agg(*[aggregate(function, column).alias(name) for name, (function, column) in aggregations.items()])
+    return partial.groupBy(*keys).agg(*[
+        _MERGE_AGGREGATES[function](name).alias(name) for name, (function, _) in aggregations.items()
+    ])
+
+
+def salted_join(
+        df: DataFrame,
+        other: DataFrame,
+        keys: Sequence[str],
+        how: str = 'inner',
+        hot_keys: Optional[Sequence[Tuple[Any, ...]]] = None,
+        salt_buckets: int = SALT_BUCKETS,
+) -> DataFrame:
+    """Joins the (skewed) data frame with the other one, spreading the rows of hot keys over `salt_buckets` tasks.
+
+    Rows of the hot keys of `df` get a random salt, rows of the hot keys of `other` are replicated
+    for every salt, the rest of the rows are joined as usual. Hot keys are detected on `df` if not
+    provided. Only the joins keeping the rows of `df` (`inner`, `left`, `left_semi`, `left_anti`)
+    can be salted, the replicated rows of `other` would be duplicated otherwise.
+    """
+    if how not in ('inner', 'left', 'left_outer', 'left_semi', 'left_anti'):
+        raise ValueError(f'Join type {how} cannot be salted')
+
+    if hot_keys is None:
+        hot_keys = detect_hot_keys(df, keys)
+    if not hot_keys:
+        return df.join(other, list(keys), how)
+
+    is_hot_key = _is_hot_key(keys, hot_keys)
+    salted = df.withColumn(SALT_COLUMN, F.when(is_hot_key, F.floor(F.rand() * salt_buckets)).otherwise(F.lit(0)).cast('int'))
+    replicated = other.withColumn(SALT_COLUMN, F.explode(
+        F.when(is_hot_key, F.array(*[F.lit(salt) for salt in range(salt_buckets)])).otherwise(F.array(F.lit(0)))
+    ))
+    return salted.join(replicated, [*keys, SALT_COLUMN], how).drop(SALT_COLUMN)
+
+
+def _option(value: Any) -> Any:
+    """Returns the value of a Scala `Option` or `None`."""
+    return value.get() if value.isDefined() else None
+
+
+def _ensure_callback_server(spark: SparkSession):
+    """Starts the py4j callback server the JVM uses to call Python objects (as `pyspark.streaming` does)."""
+    # pylint: disable=protected-access
+    gateway = spark.sparkContext._gateway
+    if gateway.__dict__.get('_callback_server') is not None:
+        return
+    gateway.callback_server_parameters.eager_load = True
+    gateway.callback_server_parameters.daemonize = True
+    gateway.callback_server_parameters.daemonize_connections = True
+    gateway.callback_server_parameters.port = 0
+    gateway.start_callback_server(gateway.callback_server_parameters)
+    port = gateway._callback_server.server_socket.getsockname()[1]
+    gateway._callback_server.port = port
+    gateway._python_proxy_port = port
+    gateway_server = JavaObject('GATEWAY_SERVER', gateway._gateway_client)
+    gateway_server.resetCallbackClient(gateway_server.getCallbackClient().getAddress(), port)
+
+
+class SparkMetricsListener:
+    """Spark listener collecting per stage metrics of a job.
+
+    Records stage durations, input, output and shuffle bytes and rows, spills and the task
+    duration skew (maximum vs. median task duration) of every completed stage.
+    """
+
+    class Java:  # pylint: disable=too-few-public-methods
+        implements = ['org.apache.spark.scheduler.SparkListenerInterface']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._task_durations: Dict[int, List[int]] = defaultdict(list)
+        self._stages: List[Dict[str, Any]] = []
+        self._started_at = time.time()
+        self._spark = None
+
+    def __getattr__(self, name: str):
+        # other listener events are ignored
+        if name.startswith('on'):
+            return lambda *args: None
+        raise AttributeError(name)
+
+    @classmethod
+    def register(cls, spark: SparkSession) -> 'SparkMetricsListener':
+        """Creates a listener and adds it to the Spark context."""
+        _ensure_callback_server(spark)
+        listener = cls()
+        listener._spark = spark
+        spark.sparkContext._jsc.sc().addSparkListener(listener)  # pylint: disable=protected-access
+        return listener
+
+    def unregister(self):
+        """Waits for the queued events and removes the listener from the Spark context."""
+        spark_context = self._spark.sparkContext._jsc.sc()  # pylint: disable=protected-access
+        try:
+            spark_context.listenerBus().waitUntilEmpty(10000)
+        except Exception as error:  # pylint: disable=broad-except
+            print(f'Not all Spark events were processed: {error}')
+        spark_context.removeSparkListener(self)
+
+    def onTaskEnd(self, task_end):  # pylint: disable=invalid-name
+        with self._lock:
+            self._task_durations[task_end.stageId()].append(task_end.taskInfo().duration())
+
+    def onStageCompleted(self, stage_completed):  # pylint: disable=invalid-name
+        stage_info = stage_completed.stageInfo()
+        metrics = stage_info.taskMetrics()
+        submitted_at = _option(stage_info.submissionTime())
+        completed_at = _option(stage_info.completionTime())
+        with self._lock:
+            task_durations = self._task_durations.pop(stage_info.stageId(), [])
+        median_task_ms = statistics.median(task_durations) if task_durations else 0
+        max_task_ms = max(task_durations) if task_durations else 0
+
+        stage = {
+            'stage_id': stage_info.stageId(),
+            'attempt': stage_info.attemptNumber(),
+            'name': stage_info.name(),
+            'tasks': stage_info.numTasks(),
+            'failure_reason': _option(stage_info.failureReason()),
+            'duration_ms': completed_at - submitted_at if submitted_at and completed_at else None,
+            'executor_run_time_ms': metrics.executorRunTime(),
+            'input_bytes': metrics.inputMetrics().bytesRead(),
+            'input_rows': metrics.inputMetrics().recordsRead(),
+            'output_bytes': metrics.outputMetrics().bytesWritten(),
+            'output_rows': metrics.outputMetrics().recordsWritten(),
+            'shuffle_read_bytes': metrics.shuffleReadMetrics().totalBytesRead(),
+            'shuffle_write_bytes': metrics.shuffleWriteMetrics().bytesWritten(),
+            'memory_spill_bytes': metrics.memoryBytesSpilled(),
+            'disk_spill_bytes': metrics.diskBytesSpilled(),
+            'median_task_ms': median_task_ms,
+            'max_task_ms': max_task_ms,
+            'task_skew': round(max_task_ms / median_task_ms, 2) if median_task_ms else None,
+        }
+        with self._lock:
+            self._stages.append(stage)
+
+    def report(self, **attributes: Any) -> Dict[str, Any]:
+        """Returns the metrics document with totals over all stages."""
+        with self._lock:
+            stages = sorted(self._stages, key=lambda stage: (stage['stage_id'], stage['attempt']))
+        totals = {
+            key: sum(stage[key] for stage in stages)
+            for key in (
+                'executor_run_time_ms', 'input_bytes', 'input_rows', 'output_bytes', 'output_rows',
+                'shuffle_read_bytes', 'shuffle_write_bytes', 'memory_spill_bytes', 'disk_spill_bytes',
+            )
+        }
+        skews = [stage['task_skew'] for stage in stages if stage['task_skew']]
+        totals['max_task_skew'] = max(skews) if skews else None
+        return {
+            **attributes,
+            'started_at': datetime.utcfromtimestamp(self._started_at).isoformat(),
+            'duration_seconds': round(time.time() - self._started_at, 3),
+            'totals': totals,
+            'stages': stages,
+        }
+
+
+def write_json(spark: SparkSession, path: str, document: Dict[str, Any]) -> None:
+    file_system, jvm_path = _hadoop_file_system(spark, path)
+    stream = file_system.create(jvm_path, True)
+    try:
+        stream.write(bytearray(json.dumps(document, indent=2).encode('utf-8')))
+    finally:
+        stream.close()
+
+
+def read_json(spark: SparkSession, path: str) -> Optional[Dict[str, Any]]:
+    """Reads a JSON document written by `write_json`, returns `None` if it does not exist."""
+    file_system, jvm_path = _hadoop_file_system(spark, path)
+    if not file_system.exists(jvm_path):
+        return None
+    stream = file_system.open(jvm_path)
+    try:
+        # pylint: disable=protected-access
+        scanner = spark.sparkContext._jvm.java.util.Scanner(stream, 'UTF-8').useDelimiter('\\A')
+        return json.loads(scanner.next() if scanner.hasNext() else 'null')
+    finally:
+        stream.close()
+
+
+def write_metrics(spark: SparkSession, output_path: str, report: Dict[str, Any]) -> str:
+    """Writes the metrics document to the output path, returns its path."""
+    metrics_path = f"{output_path.rstrip('/')}/{METRICS_FILE_NAME}"
+    write_json(spark, metrics_path, report)
+    return metrics_path
+
+
+def run_id(args: Namespace) -> str:
+    """Returns an id of the job run derived from its arguments, a retried step gets the same id."""
+    arguments = {
+        key: str(value) for key, value in sorted(vars(args).items()) if key not in _RUN_ID_IGNORED_ARGUMENTS
+    }
+    return hashlib.sha256(json.dumps(arguments, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def run_checkpoint_path(args: Namespace) -> str:
+    """Returns the location of the stage checkpoints of the job run."""
+    base_path = args.checkpoint_path or f"{args.output_path.rstrip('/')}.checkpoints"
+    return f'{base_path.rstrip("/")}/{args.run_id or run_id(args)}'
+
+
+class StageCheckpoints:
+    """Checkpoints of the named stages of a job run.
+
+    The output of every stage is written to `{path}/{stage}` with a completion marker. A retried
+    run reads the output of the completed stages instead of computing them again, so it resumes
+    after the last completed stage. The checkpoints are deleted once the job succeeded (see
+    `run_job`), so a later run with the same arguments computes all stages again::
+
+        checkpoints = StageCheckpoints.for_run(spark, args)
+        events = checkpoints.stage('events', lambda: read_input(spark, args).where(...))
+        totals = checkpoints.stage('totals', lambda: salted_aggregate(events, ...))
+    """
+
+    def __init__(self, spark: SparkSession, path: str, checkpoint_format: str = 'parquet'):
+        self._spark = spark
+        self.path = path.rstrip('/')
+        self._format = checkpoint_format
+
+    @classmethod
+    def for_run(cls, spark: SparkSession, args: Namespace) -> 'StageCheckpoints':
+        """Returns the checkpoints of the job run, invalidated first with `--force`.
+
+        Checkpoints are stored under `--checkpoint-path` (`{output path}.checkpoints` by default),
+        scoped by `--run-id` (derived from the job arguments by default).
+        """
+        checkpoints = cls(spark, run_checkpoint_path(args))
+        if args.force:
+            checkpoints.invalidate()
+        return checkpoints
+
+    def stage_path(self, stage: str) -> str:
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', stage):
+            raise ValueError(f'Invalid stage name {stage}, use letters, digits, "_" and "-"')
+        return f'{self.path}/{stage}'
+
+    def is_complete(self, stage: str) -> bool:
+        return path_exists(self._spark, f'{self.stage_path(stage)}/{CHECKPOINT_MARKER_NAME}')
+
+    def stage(self, stage: str, compute: Callable[[], DataFrame]) -> DataFrame:
+        """Returns the checkpointed output of the stage, computing and writing it if not complete."""
+        stage_path = self.stage_path(stage)
+        if self.is_complete(stage):
+            print(f'Stage {stage} is complete, reading its checkpoint {stage_path}')
+        else:
+            started_at = time.time()
+            compute().write.format(self._format).mode('overwrite').save(stage_path)
+            write_json(self._spark, f'{stage_path}/{CHECKPOINT_MARKER_NAME}', {
+                'stage': stage,
+                'completed_at': datetime.utcnow().isoformat(),
+                'duration_seconds': round(time.time() - started_at, 3),
+            })
+            print(f'Stage {stage} checkpointed to {stage_path}')
+        return self._spark.read.format(self._format).load(stage_path)
+
+    def invalidate(self) -> None:
+        """Deletes the checkpoints of all stages of the run."""
+        file_system, jvm_path = _hadoop_file_system(self._spark, self.path)
+        if file_system.exists(jvm_path):
+            print(f'Deleting checkpoints {self.path}')
+            file_system.delete(jvm_path, True)
 
 
 def execute(spark: SparkSession, args: Namespace) -> None:
     # TODO
-    # spark code here...
+    # spark code here, read the input with read_input(spark, args)
+    # and write the output with write_output(df, args.output_path, target_file_size_mb=args.target_file_size_mb)
+    # aggregate and join skewed keys (e.g. accounts, campaigns) with salted_aggregate and salted_join
+    # checkpoint expensive stages with StageCheckpoints.for_run(spark, args).stage(name, compute)
+    # parse partner fields with transformations.transform(name, column) instead of row-wise Python UDFs
     print('Not implemented yet...')
 
+    if args.compact_output:
+        compact_output(spark, args.output_path, target_file_size_mb=args.target_file_size_mb)
+
+
+def run_job(spark: SparkSession, args: Namespace, job_name: str) -> None:
+    """Runs `execute`, collecting its metrics unless `--no-metrics` is set.
+
+    The stage checkpoints of the run are deleted once the job succeeded, they only serve retries
+    of a failed run.
+    """
+    if not args.metrics:
+        execute(spark, args)
+    else:
+        listener = SparkMetricsListener.register(spark)
+        succeeded = False
+        try:
+            execute(spark, args)
+            succeeded = True
+        finally:
+            listener.unregister()
+            report = listener.report(
+                job_name=job_name,
+                application_id=spark.sparkContext.applicationId,
+                succeeded=succeeded,
+                arguments={key: str(value) for key, value in vars(args).items()},
+            )
+            print(f'Job metrics: {json.dumps(report)}')
+            if succeeded:
+                print(f'Job metrics written to {write_metrics(spark, args.output_path, report)}')
+
+    StageCheckpoints(spark, run_checkpoint_path(args)).invalidate()
+
+
+def add_job_arguments(add_argument: Callable[..., Any]) -> None:
+    """Defines the arguments of `PipelineSparkJob` with the given `add_argument` of an argument parser."""
+    add_argument('--input-path', required=True)
+    add_argument('--output-path', required=True)
+    add_argument('--input-format', default='parquet')
+    add_argument('--start-date', type=valid_date, help='first processed date, format YYYY-MM-DD')
+    add_argument('--end-date', type=valid_date, help='end of the processed range (exclusive), format YYYY-MM-DD')
+    add_argument('--partition-template', default=DEFAULT_PARTITION_TEMPLATE,
+                 help='date partition layout of the input path (strftime format)')
+    add_argument('--target-file-size-mb', type=float, default=TARGET_FILE_SIZE_MB)
+    add_argument('--compact-output', action='store_true',
+                 help='compact output partitions with many small files')
+    add_argument('--no-metrics', dest='metrics', action='store_false',
+                 help=f'do not collect job metrics (written to the output path as {METRICS_FILE_NAME})')
+    add_argument('--checkpoint-path', help='stage checkpoints location, default {output path}.checkpoints')
+    add_argument('--run-id', help='scope of the stage checkpoints, derived from the job arguments by default')
+    add_argument('--force', dest='force', action='store_true', default=False,
+                 help='recompute all stages, invalidating their checkpoints')
+    add_argument('--no-force', dest='force', action='store_false')
+
 
 class PipelineSparkJob(PMISparkJob):
 
     def __init__(self):
         super().__init__()
 
-        self.add_argument('--input-path', required=True)
-        self.add_argument('--output-path', required=True)
+        add_job_arguments(self.add_argument)
 
     def _get_job_name(self, _):
         return "Spark job name"
 
     def execute(self, spark: SparkSession, args: Namespace):
-        execute(spark, args)
+        run_job(spark, args, self._get_job_name(args))
 
 
 if __name__ == '__main__':
@@ -1,10 +1,28 @@
+import hashlib
+import json
 import os
+import tempfile
+import time
+from typing import Optional
 
 import pytest
 from pyspark.sql import SparkSession
 import requests
 from mockito import unstub, verifyStubbedInvocationsAreUsed
 
+SPARK_AVRO_JAR_URL = 'https://repo1.maven.org/maven2/org/apache/spark/spark-avro_2.11/2.4.4/spark-avro_2.11-2.4.4.jar'
+
+# content-addressed cache of downloaded jars, shared by test sessions
+JAR_CACHE_DIR = os.environ.get(
+    'SPARK_TEST_JAR_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'etl-pm-pipeline', 'jars'),
+)
+
+SPARK_TEST_HIVE = os.environ.get('SPARK_TEST_HIVE', '').lower() in ('1', 'true', 'yes')
+SPARK_TEST_SHUFFLE_PARTITIONS = os.environ.get('SPARK_TEST_SHUFFLE_PARTITIONS', '2')
+
+_startup_times = {}
+
 
 @pytest.fixture(scope="function", autouse=True)
 def mockito_unstub():
@@ -21,19 +39,33 @@ def spark(tmpdir_factory):
     """Local SparkSession instance for testing Spark jobs.
 
     scope="session" allows this SparkSession instance to be shared
-    across all unit tests.
+    across all unit tests. The session is tuned for small data (few shuffle partitions, no UI),
+    Hive support is enabled only with `SPARK_TEST_HIVE=1`. Jars come from the local jar cache,
+    so the tests run offline once the cache is populated.
     """
 
-    additional_libs_path = tmpdir_factory.mktemp('libs')
-    spark_avro_path = _download_spark_avro(additional_libs_path.strpath)
+    started_at = time.perf_counter()
+    spark_avro_path = cached_jar(SPARK_AVRO_JAR_URL)
+    _startup_times['jars'] = time.perf_counter() - started_at
 
-    spark = SparkSession.builder \
+    work_dir = tmpdir_factory.mktemp('spark')
+    builder = SparkSession.builder \
         .master("local[2]") \
         .appName("unit-tests") \
-        .enableHiveSupport() \
         .config("spark.sql.session.timeZone", "UTC") \
-        .config('spark.jars', spark_avro_path) \
-        .getOrCreate()
+        .config("spark.sql.shuffle.partitions", SPARK_TEST_SHUFFLE_PARTITIONS) \
+        .config("spark.default.parallelism", "2") \
+        .config("spark.ui.enabled", "false") \
+        .config("spark.ui.showConsoleProgress", "false") \
+        .config("spark.sql.warehouse.dir", work_dir.join('warehouse').strpath) \
+        .config("spark.driver.extraJavaOptions", f"-Dderby.system.home={work_dir.strpath}")
+    if spark_avro_path:
+        builder = builder.config('spark.jars', spark_avro_path)
+    if SPARK_TEST_HIVE:
+        builder = builder.enableHiveSupport()
+
+    spark = builder.getOrCreate()
+    _startup_times['session'] = time.perf_counter() - started_at - _startup_times['jars']
 
     yield spark
 
@@ -41,9 +73,73 @@ def spark(tmpdir_factory):
     spark.stop()
 
 
-def _download_spark_avro(dir_path: str) -> str:
-    url = 'https://repo1.maven.org/maven2/org/apache/spark/spark-avro_2.11/2.4.4/spark-avro_2.11-2.4.4.jar'
-    r = requests.get(url, allow_redirects=True)
-    file_path = os.path.join(dir_path, 'spark-avro_2.11-2.4.4.jar')
-    open(file_path, 'wb').write(r.content)
-    return file_path
+def pytest_terminal_summary(terminalreporter):
+    """Reports the Spark session startup time, so it can be tracked."""
+    if _startup_times:
+        terminalreporter.write_line(
+            f"Spark session startup: {_startup_times['session']:.2f} s (jars: {_startup_times['jars']:.2f} s)"
+        )
+
+
+def _sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as jar_file:
+        for block in iter(lambda: jar_file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_jar(url: str, cache_dir: str = JAR_CACHE_DIR) -> Optional[str]:
+    """Returns the path of a jar in the content-addressed cache, downloading it on first use.
+
+    Jars are stored by their SHA-256 digest and the index maps URLs to digests. Cached jars are
+    verified against the digest, downloaded jars against the Maven `.sha1` checksum. Returns
+    `None` if the jar is not cached and cannot be downloaded (e.g. offline).
+    """
+    index_path = os.path.join(cache_dir, 'index.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+
+    digest = index.get(url)
+    if digest:
+        jar_path = os.path.join(cache_dir, f'{digest}.jar')
+        if os.path.exists(jar_path) and _sha256(jar_path) == digest:
+            return jar_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        download_path = _download_verified(url, cache_dir)
+    except (requests.RequestException, ValueError) as error:
+        print(f'Cannot download {url}, continuing without it: {error}')
+        return None
+
+    digest = _sha256(download_path)
+    jar_path = os.path.join(cache_dir, f'{digest}.jar')
+    os.replace(download_path, jar_path)
+
+    index[url] = digest
+    with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as index_file:
+        json.dump(index, index_file, indent=2)
+    os.replace(index_file.name, index_path)
+    return jar_path
+
+
+def _download_verified(url: str, dir_path: str) -> str:
+    checksum_response = requests.get(f'{url}.sha1', timeout=30)
+    checksum_response.raise_for_status()
+    expected_sha1 = checksum_response.text.split()[0].strip()
+    response = requests.get(url, allow_redirects=True, stream=True, timeout=30)
+    response.raise_for_status()
+
+    sha1 = hashlib.sha1()
+    with tempfile.NamedTemporaryFile('wb', dir=dir_path, suffix='.part', delete=False) as jar_file:
+        for block in response.iter_content(1024 * 1024):
+            sha1.update(block)
+            jar_file.write(block)
+
+    if sha1.hexdigest() != expected_sha1:
+        os.remove(jar_file.name)
+        raise ValueError(f'Checksum mismatch of {url}: {sha1.hexdigest()} != {expected_sha1}')
+    return jar_file.name
@@ -0,0 +1,232 @@
+"""Local Spark performance benchmark.
+
+Generates synthetic partner-shaped datasets (skewed accounts and campaigns, URLs, timestamps and
+metrics partitioned by date) at several scales and runs the implemented steps of
+`PipelineSparkJob` on them on `local[*]`: `read_input` of a date range, `salted_aggregate` of the
+skewed accounts and campaigns and `write_output` of the events. For every scale it records:
+
+* `read_s`, `aggregate_s`, `write_s` - durations of the steps.
+* `wall_time_s` - duration of all steps.
+* `peak_heap_mb` - peak JVM heap usage during the steps.
+* `shuffle_bytes` - shuffle write volume (see `SparkMetricsListener`).
+* `spill_bytes` - memory and disk spill.
+
+and compares them against the baselines stored in `spark_benchmark_baselines.json`, scales
+without a baseline fail the comparison. The committed baselines (`1m` and `10m`) were recorded
+on a single-core host with 5 GB of memory (local Spark 3.5, Java 17), re-record them with
+`--update-baselines` on the host running the benchmark. Run it from the repository root::
+
+    python -m emr.tests.spark_benchmark [--scales 1m,10m,50m] [--update-baselines] [--format json|table]
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from ..spark_job import (
+    SparkMetricsListener, add_job_arguments, detect_hot_keys, read_input, salted_aggregate, write_output,
+)
+
+SCALES = OrderedDict([
+    ('1m', 1000000),
+    ('10m', 10000000),
+    ('50m', 50000000),
+])
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spark_benchmark_baselines.json')
+
+# allowed slowdown (or growth of memory and shuffle volume) relative to the baseline
+DEFAULT_TOLERANCE = 1.25
+
+COMPARED_METRICS = ('read_s', 'aggregate_s', 'write_s', 'wall_time_s', 'peak_heap_mb', 'shuffle_bytes')
+
+# aggregations of the benchmarked `salted_aggregate` step
+AGGREGATIONS = {
+    'events': ('count', 'url'),
+    'impressions': ('sum', 'impressions'),
+    'revenue': ('sum', 'revenue'),
+    'first_event_ts': ('min', 'event_ts'),
+}
+
+
+def create_spark_session() -> SparkSession:
+    return SparkSession.builder \
+        .master('local[*]') \
+        .appName('spark-benchmark') \
+        .config('spark.sql.session.timeZone', 'UTC') \
+        .config('spark.ui.enabled', 'false') \
+        .getOrCreate()
+
+
+def generate_partner_data(spark: SparkSession, rows: int, path: str, days: int = 3, seed: int = 42):
+    """Writes a synthetic partner dataset partitioned by `date` to the path.
+
+    Accounts and campaigns follow a power-law distribution, a few keys carry most of the rows.
+    """
+    spark.range(rows) \
+        .withColumn('date', F.expr(f'date_add(to_date("2022-01-01"), cast(id % {days} AS INT))')) \
+        .withColumn('event_ts', F.expr('cast(unix_timestamp(date) + (id * 7919) % 86400 AS TIMESTAMP)')) \
+        .withColumn('account_id', F.expr(f'cast(pow(rand({seed}), 4) * 1000 AS INT)')) \
+        .withColumn('campaign_id', F.expr(f'concat("c-", cast(pow(rand({seed + 1}), 3) * 100000 AS INT))')) \
+        .withColumn('url', F.expr(f'concat("https://www.example", cast(rand({seed + 2}) * 5000 AS INT), ".com/page?id=", id)')) \
+        .withColumn('impressions', F.expr(f'cast(rand({seed + 3}) * 10 AS INT)')) \
+        .withColumn('viewable', F.expr(f'rand({seed + 4}) < 0.6')) \
+        .withColumn('revenue', F.expr(f'round(rand({seed + 5}) * 0.01, 6)')) \
+        .write.mode('overwrite').partitionBy('date').parquet(path)
+
+
+def _heap_pools(spark: SparkSession) -> List[Any]:
+    # pylint: disable=protected-access
+    management = spark.sparkContext._jvm.java.lang.management.ManagementFactory
+    heap = spark.sparkContext._jvm.java.lang.management.MemoryType.HEAP
+    return [pool for pool in management.getMemoryPoolMXBeans() if pool.getType().equals(heap)]
+
+
+def job_arguments(argv: List[str]) -> argparse.Namespace:
+    """Parses the arguments with the argument definitions of `PipelineSparkJob`."""
+    parser = argparse.ArgumentParser()
+    add_job_arguments(parser.add_argument)
+    return parser.parse_args(argv)
+
+
+def _timed(action) -> float:
+    started_at = time.perf_counter()
+    action()
+    return round(time.perf_counter() - started_at, 3)
+
+
+def run_scale(spark: SparkSession, rows: int, work_dir: str, days: int = 3) -> Dict[str, float]:
+    """Runs the job steps on a dataset of the given number of rows and returns their metrics."""
+    input_path = os.path.join(work_dir, 'input')
+    generate_partner_data(spark, rows, input_path, days)
+    args = job_arguments([
+        '--input-path', input_path,
+        '--output-path', os.path.join(work_dir, 'output'),
+        '--start-date', '2022-01-01',
+        '--end-date', f'2022-01-{days + 1:02d}',
+    ])
+
+    spark.sparkContext._jvm.System.gc()  # pylint: disable=protected-access
+    for pool in _heap_pools(spark):
+        pool.resetPeakUsage()
+    listener = SparkMetricsListener.register(spark)
+    try:
+        events = read_input(spark, args)
+        read_time = _timed(events.count)
+
+        def aggregate():
+            keys = ['account_id', 'campaign_id']
+            salted_aggregate(events, keys, AGGREGATIONS, detect_hot_keys(events, keys)).count()
+        aggregate_time = _timed(aggregate)
+
+        write_time = _timed(lambda: write_output(
+            events, args.output_path, partition_by=['date'], target_file_size_mb=args.target_file_size_mb,
+        ))
+    finally:
+        listener.unregister()
+
+    totals = listener.report()['totals']
+    return OrderedDict([
+        ('rows', rows),
+        ('read_s', read_time),
+        ('aggregate_s', aggregate_time),
+        ('write_s', write_time),
+        ('wall_time_s', round(read_time + aggregate_time + write_time, 3)),
+        ('peak_heap_mb', round(sum(pool.getPeakUsage().getUsed() for pool in _heap_pools(spark)) / 1024 ** 2, 1)),
+        ('shuffle_bytes', totals['shuffle_write_bytes']),
+        ('spill_bytes', totals['memory_spill_bytes'] + totals['disk_spill_bytes']),
+    ])
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baselines_file:
+        return json.load(baselines_file)
+
+
+def compare_to_baselines(
+        results: Mapping[str, Mapping[str, float]],
+        baselines: Mapping[str, Mapping[str, float]],
+        tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Returns descriptions of the metrics exceeding their baseline by more than the tolerance.
+
+    Scales without a baseline are reported as well, they cannot be checked.
+    """
+    regressions = []
+    for scale, metrics in results.items():
+        if scale not in baselines:
+            regressions.append(f'{scale}: no baseline, store one with --update-baselines')
+            continue
+        for metric in COMPARED_METRICS:
+            baseline = baselines.get(scale, {}).get(metric)
+            if baseline and metrics[metric] > baseline * tolerance:
+                regressions.append(f'{scale} {metric}: {metrics[metric]} (baseline {baseline}, tolerance {tolerance}x)')
+    return regressions
+
+
+def run_benchmark(scales: List[str]) -> Dict[str, Dict[str, float]]:
+    spark = create_spark_session()
+    results = OrderedDict()
+    try:
+        for scale in scales:
+            with tempfile.TemporaryDirectory(prefix=f'spark-benchmark-{scale}-') as work_dir:
+                results[scale] = run_scale(spark, SCALES[scale], work_dir)
+    finally:
+        spark.stop()
+    return results
+
+
+def format_report(results: Mapping[str, Mapping[str, float]], baselines: Mapping[str, Mapping[str, float]]) -> str:
+    lines = [f"{'scale':<6} {'metric':<14} {'value':>16} {'baseline':>16}"]
+    for scale, metrics in results.items():
+        for metric, value in metrics.items():
+            baseline = baselines.get(scale, {}).get(metric, '-')
+            lines.append(f'{scale:<6} {metric:<14} {value:>16} {baseline:>16}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(SCALES), help=f'comma separated scales ({", ".join(SCALES)})')
+    parser.add_argument('--format', choices=['json', 'table'], default='table')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--update-baselines', action='store_true', help=f'store the results in {BASELINES_PATH}')
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f'Unknown scales {unknown}, use {list(SCALES)}')
+
+    results = run_benchmark(scales)
+    baselines = load_baselines()
+    regressions = compare_to_baselines(results, baselines, args.tolerance)
+
+    if args.format == 'json':
+        print(json.dumps({'results': results, 'regressions': regressions}))
+    else:
+        print(format_report(results, baselines))
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(BASELINES_PATH, 'w') as baselines_file:
+            json.dump(baselines, baselines_file, indent=2)
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
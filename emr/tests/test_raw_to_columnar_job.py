@@ -0,0 +1,124 @@
+import json
+from argparse import Namespace
+from datetime import datetime
+
+import pytest
+from pyspark.sql import SparkSession
+from pyspark.sql import types as T
+
+from ..raw_to_columnar_job import (
+    COLUMN_STATS_FILE_NAME, SCHEMA_FILE_NAME, execute, merge_schemas, parquet_compression_available,
+)
+
+
+def test_merge_schemas_adds_columns_and_widens_types():
+    first = T.StructType([
+        T.StructField('account_id', T.IntegerType()),
+        T.StructField('revenue', T.LongType()),
+        T.StructField('url', T.StringType()),
+    ])
+    second = T.StructType([
+        T.StructField('account_id', T.LongType()),
+        T.StructField('revenue', T.DoubleType()),
+        T.StructField('url', T.StructType([T.StructField('host', T.StringType())])),
+        T.StructField('campaign_id', T.StringType()),
+    ])
+
+    assert merge_schemas([first, second]) == T.StructType([
+        T.StructField('account_id', T.LongType()),
+        T.StructField('revenue', T.DoubleType()),
+        T.StructField('url', T.StringType()),
+        T.StructField('campaign_id', T.StringType()),
+    ])
+
+
+def _write_raw_day(input_path, date, rows):
+    (input_path / f'date={date}').mkdir(parents=True)
+    (input_path / f'date={date}' / 'drop.json').write_text('\n'.join(json.dumps(row) for row in rows))
+
+
+def _args(input_path, output_path, start_date, end_date, compression='snappy'):
+    return Namespace(
+        input_path=str(input_path),
+        output_path=output_path,
+        input_format='json',
+        reader_options=[],
+        start_date=start_date,
+        end_date=end_date,
+        partition_template='date=%Y-%m-%d',
+        partition_column='date',
+        sort_by=['account_id'],
+        compression=compression,
+        target_file_size_mb=1,
+    )
+
+
+def test_execute_converts_days_with_different_schemas(spark: SparkSession, tmp_path):
+    input_path = tmp_path / 'raw'
+    _write_raw_day(input_path, '2022-01-01', [{'account_id': 1, 'impressions': 10}])
+    _write_raw_day(input_path, '2022-01-02', [{'account_id': 2, 'impressions': 2.5, 'campaign_id': 'c-1'}])
+    output_path = str(tmp_path / 'processed')
+
+    execute(spark, _args(input_path, output_path, datetime(2022, 1, 1), datetime(2022, 1, 3)))
+
+    rows = spark.read.option('mergeSchema', 'true').parquet(output_path).orderBy('account_id').collect()
+    assert [(row.account_id, row.impressions, row.campaign_id, str(row.date)) for row in rows] == [
+        (1, 10.0, None, '2022-01-01'),
+        (2, 2.5, 'c-1', '2022-01-02'),
+    ]
+    statistics = {}
+    for date in ('2022-01-01', '2022-01-02'):
+        with open(f'{output_path}/date={date}/{COLUMN_STATS_FILE_NAME}') as stats_file:
+            statistics[date] = json.load(stats_file)
+    assert [statistics[date]['rows'] for date in sorted(statistics)] == [1, 1]
+    assert statistics['2022-01-01']['columns']['campaign_id'] == {'type': 'string', 'null_count': 1, 'min': None, 'max': None}
+    assert statistics['2022-01-02']['columns']['campaign_id'] == {'type': 'string', 'null_count': 0, 'min': 'c-1', 'max': 'c-1'}
+    assert 'date' not in statistics['2022-01-02']['columns']
+
+
+def test_execute_keeps_column_types_of_existing_partitions(spark: SparkSession, tmp_path):
+    input_path = tmp_path / 'raw'
+    _write_raw_day(input_path, '2022-01-01', [{'account_id': 1, 'revenue': 2.5}])
+    _write_raw_day(input_path, '2022-01-02', [{'account_id': 2, 'revenue': 3, 'campaign_id': 'c-1'}])
+    _write_raw_day(input_path, '2022-01-03', [{'account_id': 3, 'revenue': 'n/a'}])
+    output_path = str(tmp_path / 'processed')
+
+    execute(spark, _args(input_path, output_path, datetime(2022, 1, 1), datetime(2022, 1, 2)))
+    # outputs without the schema file get the schema of their latest partitions
+    (tmp_path / 'processed' / SCHEMA_FILE_NAME).unlink()
+    # integer revenue of the second day is stored as the double of the first day
+    execute(spark, _args(input_path, output_path, datetime(2022, 1, 2), datetime(2022, 1, 3)))
+
+    output = spark.read.option('mergeSchema', 'true').parquet(output_path)
+    assert output.schema['revenue'].dataType == T.DoubleType()
+    assert [(row.account_id, row.revenue, row.campaign_id) for row in output.orderBy('account_id').collect()] == [
+        (1, 2.5, None),
+        (2, 3.0, 'c-1'),
+    ]
+
+    with open(f'{output_path}/{SCHEMA_FILE_NAME}') as schema_file:
+        schema = T.StructType.fromJson(json.load(schema_file))
+    assert {field.name: field.dataType for field in schema.fields} == {field.name: field.dataType for field in output.schema.fields}
+
+    # string revenue does not fit the existing double partitions
+    with pytest.raises(ValueError, match=r'revenue \(double -> string\)'):
+        execute(spark, _args(input_path, output_path, datetime(2022, 1, 3), datetime(2022, 1, 4)))
+    assert spark.read.option('mergeSchema', 'true').parquet(output_path).count() == 2
+
+
+def test_execute_with_default_zstd_compression(spark: SparkSession, tmp_path):
+    input_path = tmp_path / 'raw'
+    _write_raw_day(input_path, '2022-01-01', [{'account_id': 1, 'impressions': 10}])
+    output_path = str(tmp_path / 'processed')
+    args = _args(input_path, output_path, datetime(2022, 1, 1), None, compression='zstd')
+
+    if not parquet_compression_available(spark, 'zstd'):
+        # e.g. the Hadoop 2.7 of the local pyspark, fails before reading any data
+        with pytest.raises(ValueError, match='zstd is not available'):
+            execute(spark, args)
+        return
+
+    execute(spark, args)
+    assert spark.read.parquet(output_path).count() == 1
+    parquet_files = [path for path in (tmp_path / 'processed' / 'date=2022-01-01').iterdir() if path.suffix == '.parquet']
+    assert all('.zstd.' in path.name for path in parquet_files)
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ..spark_job import TARGET_FILE_SIZE_MB
+from .spark_benchmark import COMPARED_METRICS, compare_to_baselines, job_arguments, load_baselines
+
+# comma separated benchmark scales (e.g. "1m,10m"), the benchmark is skipped if not set
+SPARK_BENCHMARK_SCALES = os.environ.get('SPARK_BENCHMARK_SCALES')
+SPARK_BENCHMARK_TOLERANCE = os.environ.get('SPARK_BENCHMARK_TOLERANCE', '1.25')
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_compare_to_baselines():
+    baselines = {'1m': {'wall_time_s': 10.0, 'peak_heap_mb': 500.0, 'shuffle_bytes': 1000}}
+    results = {
+        '1m': {'wall_time_s': 13.0, 'peak_heap_mb': 600.0, 'shuffle_bytes': 1000},
+        '10m': {'wall_time_s': 100.0, 'peak_heap_mb': 900.0, 'shuffle_bytes': 9000},
+    }
+
+    assert compare_to_baselines(results, baselines, tolerance=1.25) == [
+        '1m wall_time_s: 13.0 (baseline 10.0, tolerance 1.25x)',
+        '10m: no baseline, store one with --update-baselines',
+    ]
+
+
+def test_baselines_are_stored_for_the_default_scale():
+    assert set(COMPARED_METRICS) <= set(load_baselines()['1m'])
+
+
+def test_job_arguments_use_the_job_defaults():
+    args = job_arguments(['--input-path', 'input', '--output-path', 'output', '--start-date', '2022-01-01'])
+
+    assert args.start_date.isoformat() == '2022-01-01T00:00:00'
+    assert args.target_file_size_mb == TARGET_FILE_SIZE_MB
+    assert args.metrics and not args.force
+
+
+@pytest.mark.skipif(not SPARK_BENCHMARK_SCALES, reason='set SPARK_BENCHMARK_SCALES to run the Spark benchmark')
+def test_spark_job_performance_within_baselines():
+    # fresh interpreter and JVM, the benchmark runs on local[*]
+    result = subprocess.run(
+        [
+            sys.executable, '-m', 'emr.tests.spark_benchmark',
+            '--scales', SPARK_BENCHMARK_SCALES,
+            '--tolerance', SPARK_BENCHMARK_TOLERANCE,
+            '--format', 'json',
+        ],
+        cwd=REPOSITORY_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+    assert result.stdout, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    print(json.dumps(report['results'], indent=2))
+
+    assert not report['regressions'], f"Spark job performance regressions: {report['regressions']}"
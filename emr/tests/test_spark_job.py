@@ -1,7 +1,210 @@
+import os
+from argparse import Namespace
+from datetime import datetime
+
+import pytest
 from pyspark.sql import DataFrame, Row, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+from pyspark.sql.functions import col
+
+from .. import spark_job
+from ..spark_job import (
+    SparkMetricsListener,
+    StageCheckpoints,
+    compact_output,
+    date_partition_paths,
+    detect_hot_keys,
+    list_data_files,
+    output_file_count,
+    read_date_range,
+    run_checkpoint_path,
+    run_job,
+    salted_aggregate,
+    salted_join,
+    write_output,
+)
+
+
+def test_date_partition_paths():
+    assert date_partition_paths('s3://bucket/input/', datetime(2022, 1, 30), datetime(2022, 2, 2)) == [
+        's3://bucket/input/date=2022-01-30',
+        's3://bucket/input/date=2022-01-31',
+        's3://bucket/input/date=2022-02-01',
+    ]
+    assert date_partition_paths(
+        's3://bucket/input', datetime(2022, 1, 1, 22), datetime(2022, 1, 2), 'year=%Y/month=%m/day=%d/hour=%H',
+    ) == [
+        's3://bucket/input/year=2022/month=01/day=01/hour=22',
+        's3://bucket/input/year=2022/month=01/day=01/hour=23',
+    ]
+
+
+def test_read_date_range_reads_only_partitions_in_range(spark: SparkSession, tmp_path):
+    input_path = str(tmp_path / 'input')
+    spark.createDataFrame([
+        Row(value=1, date='2022-01-01'),
+        Row(value=2, date='2022-01-02'),
+        Row(value=3, date='2022-01-04'),
+    ]).write.partitionBy('date').parquet(input_path)
+
+    df: DataFrame = read_date_range(spark, input_path, datetime(2022, 1, 2), datetime(2022, 1, 5))
+
+    assert sorted((row.value, str(row.date)) for row in df.collect()) == [(2, '2022-01-02'), (3, '2022-01-04')]
+
+
+def test_output_file_count():
+    schema = T.StructType([
+        T.StructField('name', T.StringType()),
+        T.StructField('count', T.LongType()),
+        T.StructField('tags', T.ArrayType(T.IntegerType())),
+    ])
+
+    assert output_file_count(0, schema) == 1
+    assert output_file_count(10 ** 8, schema, target_file_size_mb=256, compression_ratio=0.3) == 4
+
+
+def test_write_output_and_compaction_avoid_small_files(spark: SparkSession, tmp_path):
+    output_path = str(tmp_path / 'output')
+    df = spark.range(1000).selectExpr('id', 'id % 2 AS part').repartition(20)
+
+    write_output(df, output_path, partition_by=['part'], target_file_size_mb=1)
+    assert sorted(len(sizes) for sizes in list_data_files(spark, output_path).values()) == [1, 1]
+
+    df.write.mode('overwrite').partitionBy('part').parquet(output_path)
+    compact_output(spark, output_path)
+
+    assert sorted(len(sizes) for sizes in list_data_files(spark, output_path).values()) == [1, 1]
+    assert spark.read.parquet(output_path).count() == 1000
+    assert _entries(output_path) == ['_SUCCESS', 'part=0', 'part=1']
+
+
+def _entries(path):
+    # without the checksum files of the local file system
+    return sorted(name for name in os.listdir(path) if not name.endswith('.crc'))
+
+
+def test_compaction_recovers_interrupted_replacement(spark: SparkSession, tmp_path):
+    output_path = str(tmp_path / 'output')
+    spark.range(1000).selectExpr('id', 'id % 2 AS part').write.partitionBy('part').parquet(output_path)
+    # interrupted after the original partition was renamed aside
+    os.rename(os.path.join(output_path, 'part=0'), os.path.join(output_path, '.part=0.old'))
+
+    compact_output(spark, output_path)
+
+    assert _entries(output_path) == ['_SUCCESS', 'part=0', 'part=1']
+    assert spark.read.parquet(output_path).count() == 1000
+
+
+def test_metrics_listener_records_stages(spark: SparkSession):
+    listener = SparkMetricsListener.register(spark)
+    spark.range(1000, numPartitions=4).groupBy((col('id') % 10).alias('key')).count().collect()
+    listener.unregister()
+
+    report = listener.report(job_name='test')
+
+    assert report['job_name'] == 'test'
+    assert report['stages']
+    assert report['totals']['shuffle_write_bytes'] > 0
+    assert all(stage['median_task_ms'] <= stage['max_task_ms'] for stage in report['stages'])
+
+
+def _skewed_events(spark: SparkSession) -> DataFrame:
+    # account 0 has 90% of the rows
+    return spark.range(10000).selectExpr(
+        'IF(id % 10 = 9, id % 100, 0) AS account_id',
+        'id % 7 AS campaign_id',
+        'id % 3 AS impressions',
+    )
+
+
+def test_detect_hot_keys(spark: SparkSession):
+    assert detect_hot_keys(_skewed_events(spark), ['account_id'], threshold=0.5, sample_fraction=0.5, seed=1) == [(0,)]
+    assert detect_hot_keys(_skewed_events(spark), ['campaign_id'], threshold=0.5, sample_fraction=0.5, seed=1) == []
+
+
+def test_salted_aggregate_matches_aggregate(spark: SparkSession):
+    df = _skewed_events(spark)
+    aggregations = {
+        'rows': ('count', '*'),
+        'impressions': ('sum', 'impressions'),
+        'campaigns': ('count_distinct', 'campaign_id'),
+        'campaign_ids': ('collect_set', 'campaign_id'),
+    }
+
+    salted = salted_aggregate(df, ['account_id'], aggregations, hot_keys=[(0,)], salt_buckets=4)
+    expected = df.groupBy('account_id').agg(
+        F.count('*').alias('rows'),
+        F.sum('impressions').alias('impressions'),
+        F.countDistinct('campaign_id').alias('campaigns'),
+        F.collect_set('campaign_id').alias('campaign_ids'),
+    )
+
+    def rows(result: DataFrame):
+        return sorted((row.account_id, row.rows, row.impressions, row.campaigns, sorted(row.campaign_ids))
+                      for row in result.collect())
+    assert rows(salted) == rows(expected)
+
+
+def test_salted_join_matches_join(spark: SparkSession):
+    df = _skewed_events(spark)
+    accounts = spark.range(0, 100, 9).selectExpr('id AS account_id', 'concat("account-", id) AS name')
+
+    salted = salted_join(df, accounts, ['account_id'], how='left', hot_keys=[(0,)], salt_buckets=4)
+
+    assert sorted(salted.collect()) == sorted(df.join(accounts, ['account_id'], 'left').collect())
+
+
+def test_stage_checkpoints_skip_completed_stages(spark: SparkSession, tmp_path):
+    args = Namespace(output_path=str(tmp_path / 'output'), checkpoint_path=None, run_id=None, force=False)
+    computed = []
+
+    def compute(stage: str, rows: int):
+        def compute_stage():
+            computed.append(stage)
+            return spark.range(rows)
+        return compute_stage
+
+    checkpoints = StageCheckpoints.for_run(spark, args)
+    assert checkpoints.stage('first', compute('first', 10)).count() == 10
+    assert computed == ['first']
+
+    # a retry resumes after the completed stage
+    retry = StageCheckpoints.for_run(spark, args)
+    assert retry.path == checkpoints.path
+    assert retry.stage('first', compute('first', 10)).count() == 10
+    assert retry.stage('second', compute('second', 5)).count() == 5
+    assert computed == ['first', 'second']
+
+    args.force = True
+    forced = StageCheckpoints.for_run(spark, args)
+    assert not forced.is_complete('first') and not forced.is_complete('second')
+    forced.stage('first', compute('first', 10))
+    assert computed == ['first', 'second', 'first']
+
+
+def test_successful_run_deletes_stage_checkpoints(spark: SparkSession, tmp_path, monkeypatch):
+    args = Namespace(
+        output_path=str(tmp_path / 'output'), checkpoint_path=None, run_id=None, force=False, metrics=False,
+    )
+    computed = []
+
+    def execute(spark: SparkSession, args: Namespace, fail: bool = False):
+        def compute_events():
+            computed.append('events')
+            return spark.range(10)
+        StageCheckpoints.for_run(spark, args).stage('events', compute_events).write.mode('overwrite').parquet(args.output_path)
+        if fail:
+            raise RuntimeError('Failed after the events stage')
 
+    monkeypatch.setattr(spark_job, 'execute', lambda spark, args: execute(spark, args, fail=True))
+    with pytest.raises(RuntimeError):
+        run_job(spark, args, 'test')
+    monkeypatch.setattr(spark_job, 'execute', execute)
+    run_job(spark, args, 'test')
+    assert computed == ['events']
+    assert not os.path.exists(run_checkpoint_path(args))
 
-def test_dummy(spark: SparkSession):
-    # TODO
-    # test code here ...
-    print('Not implemented yet...')
+    # a later run with the same arguments recomputes the stages
+    run_job(spark, args, 'test')
+    assert computed == ['events', 'events']
@@ -0,0 +1,37 @@
+import pytest
+from pyspark.sql import Row, SparkSession
+from pyspark.sql import functions as F
+
+from ..transformations import transform
+from .transformation_benchmark import run_transformation_benchmark
+
+
+def test_transformations(spark: SparkSession):
+    df = spark.createDataFrame([
+        Row(url='HTTPS://www.Example.com/Page/?id=1#top', hex_id='0x1F', encoded='a%20b%2Fc', ts='2022-01-01 12:00'),
+        Row(url=None, hex_id='invalid', encoded=None, ts=None),
+    ])
+
+    rows = df.select(
+        transform('normalize_url', 'url').alias('url'),
+        transform('hex_id_to_long', 'hex_id').alias('id'),
+        transform('url_decode', 'encoded').alias('decoded'),
+        F.date_format(transform('local_to_utc', F.col('ts').cast('timestamp'), time_zone='America/New_York'), 'yyyy-MM-dd HH:mm')
+        .alias('ts'),
+    ).collect()
+
+    assert [tuple(row) for row in rows] == [
+        ('example.com/page', 31, 'a b/c', '2022-01-01 17:00'),
+        (None, None, None, None),
+    ]
+
+
+def test_unknown_transformation():
+    with pytest.raises(ValueError):
+        transform('unknown', 'url')
+
+
+def test_transformations_match_row_wise_implementations(spark: SparkSession):
+    results = run_transformation_benchmark(spark, rows=1000)
+
+    assert all(result['equal'] for result in results.values()), results
@@ -0,0 +1,133 @@
+"""Benchmark of the transformations against row-at-a-time Python UDFs.
+
+Runs every benchmarked transformation on synthetic partner values as a row-wise Python UDF and
+as the registered native or vectorized transformation (see `emr/transformations.py`), checks the
+results are equal and reports the durations. Run it from the repository root::
+
+    python -m emr.tests.transformation_benchmark [--rows 5000000] [--format json|table]
+
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import unquote
+
+from pyspark.sql import Column, DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+
+from ..transformations import transform
+
+DEFAULT_ROWS = 5000000
+
+
+def normalize_url_row(url: Optional[str]) -> Optional[str]:
+    if url is None:
+        return None
+    url = re.sub(r'^[a-z][a-z0-9+.-]*://', '', url.strip().lower())
+    url = re.sub(r'^www\.', '', url)
+    return re.sub(r'/+$', '', re.sub(r'[?#].*$', '', url))
+
+
+def hex_id_to_long_row(hex_id: Optional[str]) -> Optional[int]:
+    if hex_id is None:
+        return None
+    hex_id = re.sub(r'^0x', '', hex_id.strip().lower())
+    return int(hex_id, 16) if re.fullmatch(r'[0-9a-f]{1,15}', hex_id) else None
+
+
+def url_decode_row(value: Optional[str]) -> Optional[str]:
+    return None if value is None else unquote(value)
+
+
+# benchmarked transformation -> (input column, row-wise implementation, its return type)
+BENCHMARKS = OrderedDict([
+    ('normalize_url', ('url', normalize_url_row, T.StringType())),
+    ('hex_id_to_long', ('hex_id', hex_id_to_long_row, T.LongType())),
+    ('url_decode', ('encoded', url_decode_row, T.StringType())),
+])
+
+
+def create_spark_session() -> SparkSession:
+    return SparkSession.builder \
+        .master('local[*]') \
+        .appName('transformation-benchmark') \
+        .config('spark.sql.session.timeZone', 'UTC') \
+        .config('spark.ui.enabled', 'false') \
+        .getOrCreate()
+
+
+def generate_values(spark: SparkSession, rows: int) -> DataFrame:
+    return spark.range(rows).select(
+        F.expr('concat(IF(id % 3 = 0, "HTTPS://www.", "http://"), "Example", id % 5000, ".com/Page/?id=", id)')
+        .alias('url'),
+        F.expr('IF(id % 100 = 0, "invalid", concat("0x", hex(id * 7919)))').alias('hex_id'),
+        F.expr('concat("campaign%20", id % 1000, "%2Fcreative%3D", id)').alias('encoded'),
+    )
+
+
+def _timed_checksum(df: DataFrame, column: Column) -> Dict[str, Any]:
+    # the aggregation forces the evaluation of every value, without collecting them
+    started_at = time.perf_counter()
+    checksum = df.select(column.alias('value')).agg(F.sum(F.crc32(F.col('value').cast('string')))).first()[0]
+    return {'seconds': round(time.perf_counter() - started_at, 3), 'checksum': checksum}
+
+
+def run_transformation_benchmark(
+        spark: SparkSession,
+        rows: int,
+        benchmarks: Mapping[str, Tuple[str, Callable[[Any], Any], T.DataType]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Runs the benchmarks, returns durations of the row-wise and registered implementations."""
+    df = generate_values(spark, rows).cache()
+    df.count()
+    results = OrderedDict()
+    try:
+        for name, (column, row_function, return_type) in (benchmarks or BENCHMARKS).items():
+            row_wise = _timed_checksum(df, F.udf(row_function, return_type)(column))
+            registered = _timed_checksum(df, transform(name, column))
+            results[name] = OrderedDict([
+                ('rows', rows),
+                ('row_wise_s', row_wise['seconds']),
+                ('transformation_s', registered['seconds']),
+                ('speedup', round(row_wise['seconds'] / registered['seconds'], 2) if registered['seconds'] else None),
+                ('equal', row_wise['checksum'] == registered['checksum']),
+            ])
+    finally:
+        df.unpersist()
+    return results
+
+
+def format_report(results: Mapping[str, Mapping[str, Any]]) -> str:
+    lines = [f"{'transformation':<16} {'row-wise s':>12} {'transformation s':>17} {'speedup':>8} {'equal':>6}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<16} {result['row_wise_s']:>12} {result['transformation_s']:>17} "
+            f"{str(result['speedup']):>8} {str(result['equal']):>6}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--format', choices=['json', 'table'], default='table')
+    args = parser.parse_args()
+
+    spark = create_spark_session()
+    try:
+        results = run_transformation_benchmark(spark, args.rows)
+    finally:
+        spark.stop()
+
+    print(json.dumps(results) if args.format == 'json' else format_report(results))
+    return 0 if all(result['equal'] for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
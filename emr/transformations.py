@@ -0,0 +1,102 @@
+"""Column transformations of partner data.
+
+Transformations are registered either as native Spark expressions (evaluated in the JVM, always
+the fastest option) or as vectorized pandas UDFs (for logic without a Spark equivalent), which
+exchange batches of rows with the Python workers in the Arrow format instead of pickling every
+row as row-at-a-time Python UDFs do::
+
+    df.withColumn('url', transform('normalize_url', 'url'))
+
+New transformations are registered with the `native_transformation` and `vectorized_transformation`
+decorators. Vectorized transformations require `pandas` and `pyarrow` on the cluster (see
+`bootstrap/install_dependencies.sh`).
+"""
+
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
+from urllib.parse import unquote
+
+from pyspark.sql import Column
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+
+NATIVE = 'native'
+VECTORIZED = 'vectorized'
+
+
+class Transformation(NamedTuple):
+    name: str
+    kind: str
+    function: Callable[..., Any]
+    return_type: Optional[T.DataType] = None
+
+
+TRANSFORMATIONS: Dict[str, Transformation] = {}
+
+
+def _register(transformation: Transformation) -> None:
+    if transformation.name in TRANSFORMATIONS:
+        raise ValueError(f'Transformation {transformation.name} is already registered')
+    TRANSFORMATIONS[transformation.name] = transformation
+
+
+def native_transformation(name: Optional[str] = None):
+    """Registers a function building a Spark expression: `function(column: Column, **params) -> Column`."""
+    def register(function):
+        _register(Transformation(name or function.__name__, NATIVE, function))
+        return function
+    return register
+
+
+def vectorized_transformation(return_type: T.DataType, name: Optional[str] = None):
+    """Registers a function transforming a batch of values: `function(values: pandas.Series, **params) -> pandas.Series`."""
+    def register(function):
+        _register(Transformation(name or function.__name__, VECTORIZED, function, return_type))
+        return function
+    return register
+
+
+def transform(name: str, column: Union[str, Column], **params: Any) -> Column:
+    """Returns the column transformed by the registered transformation, the parameters are passed to it."""
+    if name not in TRANSFORMATIONS:
+        raise ValueError(f'Unknown transformation {name}, use one of {sorted(TRANSFORMATIONS)}')
+    transformation = TRANSFORMATIONS[name]
+    column = F.col(column) if isinstance(column, str) else column
+
+    if transformation.kind == NATIVE:
+        return transformation.function(column, **params)
+
+    # pylint: disable=import-outside-toplevel
+    from pyspark.sql.functions import PandasUDFType, pandas_udf
+
+    def transform_batch(values):
+        return transformation.function(values, **params)
+    return pandas_udf(transform_batch, transformation.return_type, PandasUDFType.SCALAR)(column)
+
+
+@native_transformation()
+def normalize_url(column: Column) -> Column:
+    """Lower cased URL without the scheme, `www.`, query, fragment and trailing slashes."""
+    url = F.lower(F.trim(column))
+    url = F.regexp_replace(url, r'^[a-z][a-z0-9+.-]*://', '')
+    url = F.regexp_replace(url, r'^www\.', '')
+    url = F.regexp_replace(url, r'[?#].*$', '')
+    return F.regexp_replace(url, r'/+$', '')
+
+
+@native_transformation()
+def hex_id_to_long(column: Column) -> Column:
+    """Decodes hexadecimal IDs (e.g. `0x1f`, `1F`) to numbers, invalid IDs are null."""
+    hex_id = F.regexp_replace(F.lower(F.trim(column)), r'^0x', '')
+    return F.when(hex_id.rlike(r'^[0-9a-f]{1,15}$'), F.conv(hex_id, 16, 10).cast(T.LongType()))
+
+
+@native_transformation()
+def local_to_utc(column: Column, time_zone: str) -> Column:
+    """Converts local timestamps of the partner time zone (e.g. `America/New_York`) to UTC."""
+    return F.to_utc_timestamp(column, time_zone)
+
+
+@vectorized_transformation(T.StringType())
+def url_decode(values):
+    """Decodes percent-encoded values (`%20` etc.), Spark 2.4 has no native URL decoding."""
+    return values.map(unquote, na_action='ignore')
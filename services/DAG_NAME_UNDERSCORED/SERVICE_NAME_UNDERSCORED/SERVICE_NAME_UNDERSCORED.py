@@ -1,8 +1,27 @@
 import argparse
+import asyncio
+import gzip
+import hashlib
+import json
 import logging
 import os
+import random
+import resource
+import sys
+import time
+import zlib
 from argparse import ArgumentParser
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+from datetime import datetime, timedelta
+from itertools import islice
+from tempfile import NamedTemporaryFile
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
 
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(format="%(levelname)s: %(message)s", level=LOG_LEVEL)
@@ -10,6 +29,28 @@ logger = logging.getLogger(__name__)
 
 DATE_FORMAT = '%Y%m%d'
 
+# size of the reads of the input and of the parts of the multipart upload of the output (S3 minimum is 5 MiB),
+# together with BATCH_SIZE records they bound the memory of the streaming pipeline
+CHUNK_SIZE = 8 * 1024 * 1024
+PART_SIZE = 8 * 1024 * 1024
+BATCH_SIZE = 10000
+
+# partner API requests: concurrency, rate limit and retries with exponential backoff (seconds)
+MAX_CONCURRENT_REQUESTS = 16
+REQUESTS_PER_SECOND = 10
+REQUEST_TIMEOUT = 60
+MAX_FETCH_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# download cache (validators of the processed partner reports), in the status table if its name is set
+DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'SERVICE_NAME'))
+STATUS_TABLE_NAME = os.environ.get('STATUS_TABLE_NAME')
+DOWNLOAD_CACHE_ITEM_PREFIX = 'download-cache#'
+# cache items are removed by the status table TTL (`expires_at` attribute), reports not seen for this long are new again
+DOWNLOAD_CACHE_TTL_SECONDS = 90 * 24 * 60 * 60
+
 
 def valid_date(date_string):
     try:
@@ -19,21 +60,579 @@ def valid_date(date_string):
         raise argparse.ArgumentTypeError(msg) from val_err
 
 
-def get_args():
+def in_shard(key, shard_index, shard_count):
+    """Returns True if the key (e.g. an input file name) is processed by the given shard.
+
+    Keys are assigned by a stable hash, so every shard of a sharded ECS task processes a
+    disjoint part of the input.
+    """
+    return zlib.crc32(key.encode()) % shard_count == shard_index
+
+
+def report_metrics(workers=1, **metrics):
+    """Logs the peak memory and other metrics of the run for the DAG ECS task right-sizing.
+
+    With worker processes the peak memory is estimated as if all `workers` peaked at once.
+    """
+    # ru_maxrss is in KiB on Linux, of the largest child process for RUSAGE_CHILDREN
+    peak_memory_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if workers > 1:
+        peak_memory_kib += workers * resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    metrics['peak_memory_mib'] = peak_memory_kib / 1024
+    print(f"PMI_METRICS {json.dumps(metrics)}", flush=True)
+
+
+def _s3_location(location):
+    parsed = urlparse(location)
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+def open_input(location, s3_client=None):
+    """Opens the local or S3 (`s3://bucket/key`) input as a binary stream."""
+    if location.startswith('s3://'):
+        bucket, key = _s3_location(location)
+        return (s3_client or boto3.client('s3')).get_object(Bucket=bucket, Key=key)['Body']
+    return open(location, 'rb')  # pylint: disable=consider-using-with
+
+
+def read_lines(stream, chunk_size=CHUNK_SIZE):
+    """Yields the lines (without line breaks) of the binary stream, reading it in chunks."""
+    remainder = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8')
+    if remainder:
+        yield remainder.rstrip(b'\r').decode('utf-8')
+
+
+def batches(records, batch_size=BATCH_SIZE):
+    """Yields lists of up to `batch_size` records."""
+    records = iter(records)
+    batch = list(islice(records, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(records, batch_size))
+
+
+class S3MultipartWriter:
+    """Writes a stream of bytes to an S3 object by a multipart upload, buffering a single part.
+
+    The upload is completed when the writer is closed and aborted if the `with` block fails, so
+    no partial object is ever visible.
+    """
+
+    def __init__(self, location, s3_client=None, part_size=PART_SIZE):
+        self.bucket, self.key = _s3_location(location)
+        self._client = s3_client or boto3.client('s3')
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = None
+
+    def write(self, data):
+        self._buffer.extend(data)
+        if len(self._buffer) >= self._part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self._parts) + 1
+        response = self._client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=part_number, Body=bytes(self._buffer),
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self._buffer.clear()
+
+    def close(self):
+        if self._upload_id is None:
+            # smaller than a part, a single request
+            self._client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            return
+        if self._buffer:
+            self._upload_part()
+        self._client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': self._parts},
+        )
+
+    def abort(self):
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_output(location, s3_client=None):
+    """Opens the local or S3 output for writing bytes, as a context manager."""
+    if location.startswith('s3://'):
+        return S3MultipartWriter(location, s3_client)
+    return open(location, 'wb')  # pylint: disable=consider-using-with
+
+
+def stream_file(input_location, output_location, stages=(), batch_size=BATCH_SIZE, s3_client=None):
+    """Transforms the input file line by line into the output file in bounded memory.
+
+    The lines are read in chunks and passed through the stages in batches, every stage is a
+    function taking a list of records and returning an iterable of records (e.g. parsing lines to
+    dicts, filtering, transforming, serializing back to lines). Records returned by the last stage
+    are written as lines (strings). The input is never fully loaded, the memory use does not
+    depend on its size. Returns the counts of the input and output lines.
+    """
+    counts = {'input_records': 0, 'output_records': 0}
+    with closing(open_input(input_location, s3_client)) as raw_stream, open_output(output_location, s3_client) as output:
+        # gzip files (.gz) are decompressed on the fly
+        stream = gzip.GzipFile(fileobj=raw_stream) if input_location.endswith('.gz') else raw_stream
+        for batch in batches(read_lines(stream), batch_size):
+            counts['input_records'] += len(batch)
+            for stage in stages:
+                batch = stage(batch)
+            lines = [f'{record}\n' for record in batch]
+            counts['output_records'] += len(lines)
+            output.write(''.join(lines).encode('utf-8'))
+    logger.info("Streamed %s to %s: %s", input_location, output_location, counts)
+    return counts
+
+
+class FetchError(Exception):
+    """A partner API request failed (after all retries)."""
+
+    def __init__(self, url, message, status=None):
+        super().__init__(f"Fetching {url} failed: {message}")
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    """Rate limiter allowing `rate` requests per second on average, in bursts of up to `capacity` requests."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self._rate = rate
+        self._capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a request is allowed."""
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+def backoff_delay(attempt, retry_after=None, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Returns a random delay before the retry (exponential backoff with full jitter), at least `Retry-After`."""
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+    return max(delay, retry_after or 0)
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+class AsyncFetcher:
+    """Fetches partner API pages or objects concurrently.
+
+    Requests share a pool of keep-alive connections, at most `concurrency` requests are in flight
+    and they are started at no more than `rate` requests per second. Connection errors, timeouts
+    and `RETRYABLE_STATUSES` responses are retried with jittered exponential backoff, honouring
+    the `Retry-After` header. Use it as an async context manager::
+
+        async with AsyncFetcher(rate=5, headers={'Authorization': token}) as fetcher:
+            pages = await fetcher.fetch_all(urls)
+    """
+
+    def __init__(
+            self,
+            rate=REQUESTS_PER_SECOND,
+            concurrency=MAX_CONCURRENT_REQUESTS,
+            max_attempts=MAX_FETCH_ATTEMPTS,
+            timeout=REQUEST_TIMEOUT,
+            headers=None,
+    ):
+        self._rate = rate
+        self._concurrency = concurrency
+        self._max_attempts = max_attempts
+        self._timeout = timeout
+        self._headers = headers
+        self._session = None
+        self._semaphore = None
+        self._rate_limiter = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._concurrency, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=self._timeout),
+            headers=self._headers,
+        )
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        self._rate_limiter = TokenBucket(self._rate)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._session.close()
+
+    async def fetch(self, url, method='GET', **request_kwargs):
+        """Returns the body of the response, raises `FetchError` if the request fails."""
+        _, _, body = await self.request(url, method, **request_kwargs)
+        return body
+
+    async def request(self, url, method='GET', **request_kwargs):
+        """Returns the status, headers and body of the response, raises `FetchError` if the request fails."""
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            async with self._semaphore:
+                await self._rate_limiter.acquire()
+                try:
+                    async with self._session.request(method, url, **request_kwargs) as response:
+                        if response.status not in RETRYABLE_STATUSES:
+                            if response.status >= 400:
+                                raise FetchError(url, f"HTTP {response.status}", response.status)
+                            return response.status, response.headers, await response.read()
+                        error = FetchError(url, f"HTTP {response.status}", response.status)
+                        retry_after = _retry_after(response)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as client_error:
+                    error = FetchError(url, repr(client_error))
+
+            if attempt >= self._max_attempts:
+                raise error
+            delay = backoff_delay(attempt, retry_after)
+            logger.warning("%s, retrying in %.1f s (attempt %s of %s)", error, delay, attempt, self._max_attempts)
+            await asyncio.sleep(delay)
+
+    async def fetch_all(self, urls, **request_kwargs):
+        """Fetches the URLs concurrently, returns the bodies or `FetchError`s in the order of the URLs."""
+        return await asyncio.gather(*[self.fetch(url, **request_kwargs) for url in urls], return_exceptions=True)
+
+
+def run_coroutine(coroutine):
+    """Runs the coroutine in a new event loop and returns its result (`asyncio.run` needs Python 3.7)."""
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        result = loop.run_until_complete(coroutine)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        return result
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def fetch_urls(urls, **fetcher_kwargs):
+    """Fetches the URLs with an `AsyncFetcher`, for synchronous code."""
+    async def fetch():
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            return await fetcher.fetch_all(urls)
+    return run_coroutine(fetch())
+
+
+class LocalCacheStore:
+    """Download cache entries stored as JSON files of a local directory."""
+
+    def __init__(self, directory=DOWNLOAD_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, source):
+        return os.path.join(self.directory, f"{hashlib.sha256(source.encode()).hexdigest()}.json")
+
+    def get(self, source):
+        try:
+            with open(self._path(source)) as entry_file:
+                return json.load(entry_file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, source, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        with NamedTemporaryFile('w', dir=self.directory, delete=False) as entry_file:
+            json.dump({'source': source, **entry}, entry_file)
+        os.replace(entry_file.name, self._path(source))
+
+
+class DynamoDbCacheStore:
+    """Download cache entries stored as items of the DAG status table (`id` is the source, prefixed).
+
+    The table name is passed to the ECS tasks in the `STATUS_TABLE_NAME` environment variable by
+    `PmiEcsFargateOperator`. The service image ships only this directory, so the table is accessed
+    with the plain DynamoDB client instead of the `StatusTable` client of the DAGs. Items expire
+    after `ttl` seconds. Once the table fails (e.g. the task role has no access to it) the entries
+    are kept in the `fallback` store for the rest of the run.
+    """
+
+    def __init__(self, table_name, client=None, fallback=None, ttl=DOWNLOAD_CACHE_TTL_SECONDS):
+        self.table_name = table_name
+        self.fallback = fallback or LocalCacheStore()
+        self.ttl = ttl
+        self._client = client
+        self._failed = False
+
+    def _call(self, operation, **kwargs):
+        if not self._failed:
+            try:
+                if self._client is None:
+                    self._client = boto3.client('dynamodb')
+                return getattr(self._client, operation)(TableName=self.table_name, **kwargs)
+            except (BotoCoreError, ClientError) as error:
+                logger.warning("Download cache table %s failed, using the fallback store: %s", self.table_name, error)
+                self._failed = True
+        return None
+
+    def get(self, source):
+        response = self._call('get_item', Key={'id': {'S': DOWNLOAD_CACHE_ITEM_PREFIX + source}}, ConsistentRead=True)
+        if self._failed:
+            return self.fallback.get(source)
+        item = response.get('Item')
+        if item is None:
+            return None
+        return {name: value['S'] for name, value in item.items() if name != 'id' and 'S' in value}
+
+    def put(self, source, entry):
+        item = {name: {'S': str(value)} for name, value in entry.items() if value is not None}
+        self._call('put_item', Item={
+            'id': {'S': DOWNLOAD_CACHE_ITEM_PREFIX + source},
+            'expires_at': {'N': str(int(time.time() + self.ttl))},
+            **item,
+        })
+        if self._failed:
+            self.fallback.put(source, entry)
+
+
+class Download(NamedTuple):
+    source: str
+    changed: bool
+    body: Optional[bytes]
+    entry: Dict[str, str]
+
+
+class DownloadCache:
+    """Skips partner reports which did not change since they were processed.
+
+    The ETag, Last-Modified and checksum of every processed source are kept in the store. HTTP
+    sources are requested conditionally (`If-None-Match`/`If-Modified-Since`), an unchanged report
+    is not downloaded again, reports without validators are compared by checksum. S3 sources are
+    compared by ETag, the changed ones are then streamed with `stream_file`. Entries are stored by
+    `commit` once the source was processed, so a failed run is never skipped by its retry. With
+    `force` every source is considered changed::
+
+        cache = download_cache(args)
+        download = await cache.fetch(fetcher, url)
+        if download.changed:
+            process(download.body)
+            cache.commit(download)
+    """
+
+    def __init__(self, store, force=False):
+        self.store = store
+        self.force = force
+
+    def _cached(self, source):
+        return None if self.force else self.store.get(source)
+
+    async def fetch(self, fetcher, url):
+        """Downloads the URL with the `AsyncFetcher` unless it did not change."""
+        cached = self._cached(url)
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        status, response_headers, body = await fetcher.request(url, headers=headers)
+        if status == 304:
+            logger.info("%s not modified, skipping it", url)
+            return Download(url, False, None, cached)
+
+        entry = {
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'checksum': hashlib.sha256(body).hexdigest(),
+        }
+        changed = not cached or cached.get('checksum') != entry['checksum']
+        if not changed:
+            logger.info("%s has the same content as processed before, skipping it", url)
+        return Download(url, changed, body, entry)
+
+    def check_s3(self, location, s3_client=None):
+        """Checks if the S3 object changed, without downloading it (the body of the result is None)."""
+        bucket, key = _s3_location(location)
+        head = (s3_client or boto3.client('s3')).head_object(Bucket=bucket, Key=key)
+        entry = {'etag': head['ETag'], 'last_modified': head['LastModified'].isoformat()}
+        cached = self._cached(location)
+        changed = not cached or cached.get('etag') != entry['etag']
+        if not changed:
+            logger.info("%s not modified, skipping it", location)
+        return Download(location, changed, None, entry)
+
+    def commit(self, download):
+        """Stores the validators of the processed download."""
+        self.store.put(download.source, {**download.entry, 'processed_at': datetime.utcnow().isoformat()})
+
+
+def download_cache(args):
+    """Returns the download cache of the run, in the status table if `--download-cache-table` is set.
+
+    The local directory (`--download-cache-dir`) is used if not set, or when the table fails.
+    """
+    if args.download_cache_table:
+        store = DynamoDbCacheStore(args.download_cache_table, fallback=LocalCacheStore(args.download_cache_dir))
+    else:
+        store = LocalCacheStore(args.download_cache_dir)
+    return DownloadCache(store, force=args.force)
+
+
+def get_args(argv=None):
     parser = ArgumentParser(description="PARTNER_NAME - SERVICE_NAME.")
 
-    parser.add_argument('--date', help=' format YYYY-MM-DD', type=valid_date)
+    parser.add_argument('--date', help='processed date, format YYYYMMDD', type=valid_date)
+    parser.add_argument('--start-date', help='first date of the processed range, format YYYYMMDD', type=valid_date)
+    parser.add_argument('--end-date', help='end of the processed range (exclusive), format YYYYMMDD', type=valid_date)
+    parser.add_argument(
+        '--workers',
+        help='number of days processed in parallel (processes), up to the vCPUs of the task',
+        type=int,
+        default=1,
+    )
+    parser.add_argument('--force', dest='force', action='store_true', default=False,
+                        help='process all sources, even if they did not change since processed')
+    parser.add_argument('--no-force', dest='force', action='store_false')
+    parser.add_argument(
+        '--download-cache-table',
+        help='status table storing the download cache, a local directory is used if not set',
+        default=STATUS_TABLE_NAME,
+    )
+    parser.add_argument('--download-cache-dir', help='local download cache directory', default=DOWNLOAD_CACHE_DIR)
+    parser.add_argument(
+        '--shard-index',
+        help='index of the shard processed by this task',
+        type=int,
+        default=int(os.environ.get('SHARD_INDEX', 0)),
+    )
+    parser.add_argument(
+        '--shard-count',
+        help='total number of shards',
+        type=int,
+        default=int(os.environ.get('SHARD_COUNT', 1)),
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error(f"--shard-index must be between 0 and {args.shard_count - 1}")
+    if args.date and (args.start_date or args.end_date):
+        parser.error("--date cannot be combined with --start-date/--end-date")
+    if args.end_date and not args.start_date:
+        parser.error("--end-date requires --start-date")
+    if args.start_date and args.end_date and args.end_date <= args.start_date:
+        parser.error("--end-date must be after --start-date")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
     return args
 
 
+def processed_dates(args):
+    """Returns the dates to process, a single `--date` (may be None) or the `--start-date`/`--end-date` range."""
+    if not args.start_date:
+        return [args.date]
+    end_date = args.end_date or args.start_date + timedelta(days=1)
+    return [args.start_date + timedelta(days=days) for days in range((end_date - args.start_date).days)]
+
+
+def process_date(date, args):
+    """Processes a single date, returns its metrics (e.g. `{'input_bytes': ...}`).
+
+    With `--workers` > 1 it runs in a worker process, so the arguments and the result must be picklable.
+    """
+    logger.info("Processing %s", date.strftime(DATE_FORMAT) if date else 'no date')
+
+    # TODO
+    # Implement your service, process only the input keys for which
+    # in_shard(key, args.shard_index, args.shard_count) is True
+    # and return the processed input size as {'input_bytes': ...}
+    # stream large files with stream_file(input, output, stages) instead of loading them into memory
+    # and fetch partner API pages concurrently with fetch_urls(urls, rate=...)
+    # skip reports which did not change since processed with download_cache(args)
+
+    return {}
+
+
+def _run_date(date, args):
+    # failures are returned rather than raised, so that a failure of one date does not affect the others
+    started_at = time.monotonic()
+    try:
+        result = {'status': 'succeeded', 'metrics': process_date(date, args)}
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception("Processing %s failed", date)
+        result = {'status': 'failed', 'error': repr(error)}
+    result['seconds'] = round(time.monotonic() - started_at, 3)
+    return result
+
+
+def run_dates(dates, args, workers=1):
+    """Processes the dates, in a pool of `workers` processes if more than one, returns the results by date."""
+    if workers == 1 or len(dates) == 1:
+        return {date: _run_date(date, args) for date in dates}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_date, date, args): date for date in dates}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                # the worker process died (e.g. out of memory)
+                results[futures[future]] = {'status': 'failed', 'error': repr(error), 'seconds': None}
+    return {date: results[date] for date in dates}
+
+
+def summary_report(results):
+    """Returns a table of the results by date with the totals."""
+    lines = [f"{'date':<10} {'status':<10} {'seconds':>9}  error"]
+    for date, result in results.items():
+        date_string = date.strftime(DATE_FORMAT) if date else '-'
+        lines.append(f"{date_string:<10} {result['status']:<10} {str(result['seconds']):>9}  {result.get('error', '')}".rstrip())
+    failed = sum(result['status'] == 'failed' for result in results.values())
+    lines.append(f"{len(results) - failed} of {len(results)} date(s) succeeded")
+    return '\n'.join(lines)
+
+
 def main():
     _args = get_args()
     logger.info("Starting SERVICE_NAME with parameters: %s", _args.__dict__)
 
-    # TODO
-    # Implement your service
+    results = run_dates(processed_dates(_args), _args, _args.workers)
+    logger.info("Summary:\n%s", summary_report(results))
+
+    failed_dates = [date.strftime(DATE_FORMAT) for date, result in results.items() if result['status'] == 'failed' and date]
+    report_metrics(
+        workers=_args.workers,
+        dates=len(results),
+        failed_dates=failed_dates,
+        input_bytes=sum(result.get('metrics', {}).get('input_bytes', 0) for result in results.values()),
+    )
+    if any(result['status'] == 'failed' for result in results.values()):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
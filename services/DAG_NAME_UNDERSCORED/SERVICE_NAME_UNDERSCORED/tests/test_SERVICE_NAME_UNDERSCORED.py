@@ -1,4 +1,339 @@
+import gzip
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+from botocore.exceptions import ClientError
+
+from .. import SERVICE_NAME_UNDERSCORED as service
+from ..SERVICE_NAME_UNDERSCORED import (
+    AsyncFetcher,
+    DownloadCache,
+    DynamoDbCacheStore,
+    FetchError,
+    LocalCacheStore,
+    S3MultipartWriter,
+    TokenBucket,
+    fetch_urls,
+    get_args,
+    in_shard,
+    processed_dates,
+    read_lines,
+    run_coroutine,
+    run_dates,
+    stream_file,
+    summary_report,
+)
+
+
 def test_dummy():
     # TODO
     # test code here ...
     print('Not implemented yet...')
+
+
+class _ChunkedStream:
+    def __init__(self, data):
+        self._data = data
+        self.read_sizes = []
+
+    def read(self, size):
+        self.read_sizes.append(size)
+        chunk, self._data = self._data[:size], self._data[size:]
+        return chunk
+
+
+def test_read_lines_reads_in_chunks():
+    stream = _ChunkedStream(b'first\r\nsecond\n\nlast')
+
+    assert list(read_lines(stream, chunk_size=4)) == ['first', 'second', '', 'last']
+    assert set(stream.read_sizes) == {4}
+
+
+def test_stream_file_transforms_records_in_batches(tmp_path):
+    input_path = tmp_path / 'input.jsonl.gz'
+    with gzip.open(input_path, 'wt') as input_file:
+        for index in range(25):
+            input_file.write(json.dumps({'id': index, 'clicks': index % 3}) + '\n')
+    output_path = tmp_path / 'output.csv'
+    batch_sizes = []
+
+    def parse(lines):
+        batch_sizes.append(len(lines))
+        return [json.loads(line) for line in lines]
+
+    def with_clicks(records):
+        return [f"{record['id']},{record['clicks']}" for record in records if record['clicks']]
+
+    counts = stream_file(str(input_path), str(output_path), [parse, with_clicks], batch_size=10)
+
+    assert batch_sizes == [10, 10, 5]
+    assert counts == {'input_records': 25, 'output_records': 16}
+    assert output_path.read_text().splitlines()[:2] == ['1,1', '2,2']
+
+
+class _FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body):  # pylint: disable=invalid-name
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key):  # pylint: disable=invalid-name
+        upload_id = f'upload-{len(self.uploads)}'
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):  # pylint: disable=invalid-name,unused-argument
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):  # pylint: disable=invalid-name
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):  # pylint: disable=invalid-name,unused-argument
+        del self.uploads[UploadId]
+
+
+def test_s3_multipart_writer_uploads_parts():
+    client = _FakeS3Client()
+
+    with S3MultipartWriter('s3://bucket/output/data.csv', client, part_size=5) as writer:
+        for _ in range(11):
+            writer.write(b'x')
+    with S3MultipartWriter('s3://bucket/output/small.csv', client, part_size=5) as writer:
+        writer.write(b'xyz')
+
+    assert client.objects == {('bucket', 'output/data.csv'): b'x' * 11, ('bucket', 'output/small.csv'): b'xyz'}
+
+    try:
+        with S3MultipartWriter('s3://bucket/output/failed.csv', client, part_size=5) as writer:
+            writer.write(b'x' * 6)
+            raise RuntimeError('failed')
+    except RuntimeError:
+        pass
+    assert not client.uploads
+    assert ('bucket', 'output/failed.csv') not in client.objects
+
+
+class _StubApiHandler(BaseHTTPRequestHandler):
+    """Partner API stub: `/page/N` returns N, `/flaky` fails once, `/missing` returns 404, `/report` has an ETag."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            attempts = server.requests.count(self.path)
+        time.sleep(0.02)
+        headers = {}
+        if self.path == '/missing':
+            status, body = 404, b'missing'
+        elif self.path == '/report':
+            headers['ETag'] = '"v1"'
+            status, body = (304, b'') if self.headers.get('If-None-Match') == '"v1"' else (200, b'report')
+        elif self.path == '/flaky' and attempts == 1:
+            status, body = 503, b'unavailable'
+        else:
+            status, body = 200, self.path.rsplit('/', 1)[-1].encode()
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(status)
+        if status == 503:
+            headers['Retry-After'] = '0'
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer needs Python 3.7
+    daemon_threads = True
+
+
+@pytest.fixture
+def stub_api():
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _StubApiHandler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.requests = []
+    server.in_flight = server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetcher_bounds_concurrency_and_reuses_connections(stub_api):
+    base_url = f'http://127.0.0.1:{stub_api.server_port}'
+    urls = [f'{base_url}/page/{index}' for index in range(40)]
+
+    pages = fetch_urls(urls, rate=1000, concurrency=4)
+
+    assert pages == [str(index).encode() for index in range(40)]
+    assert stub_api.max_in_flight <= 4
+    assert len(stub_api.connections) <= 4
+
+
+def test_fetcher_retries_failures(stub_api):
+    base_url = f'http://127.0.0.1:{stub_api.server_port}'
+
+    flaky, missing = fetch_urls([f'{base_url}/flaky', f'{base_url}/missing'], rate=1000)
+
+    assert flaky == b'flaky'
+    assert isinstance(missing, FetchError) and missing.status == 404
+    assert stub_api.requests.count('/flaky') == 2
+    assert stub_api.requests.count('/missing') == 1
+
+
+def test_token_bucket_limits_rate():
+    async def acquire(count):
+        bucket = TokenBucket(rate=50)
+        for _ in range(count):
+            await bucket.acquire()
+
+    started_at = time.monotonic()
+    run_coroutine(acquire(11))
+
+    assert time.monotonic() - started_at >= 0.18
+
+
+def test_processed_dates():
+    assert processed_dates(get_args(['--date', '20220101'])) == [datetime(2022, 1, 1)]
+    assert processed_dates(get_args(['--start-date', '20220130', '--end-date', '20220202'])) == [
+        datetime(2022, 1, 30), datetime(2022, 1, 31), datetime(2022, 2, 1),
+    ]
+    with pytest.raises(SystemExit):
+        get_args(['--date', '2022-01-01'])
+    with pytest.raises(SystemExit):
+        get_args(['--date', '20220101', '--start-date', '20220101'])
+
+
+def test_shards_cover_keys_once():
+    keys = [f'partner/2022/01/01/part-{index:05d}.csv.gz' for index in range(1000)]
+
+    shards = [{key for key in keys if in_shard(key, shard_index, 4)} for shard_index in range(4)]
+
+    assert sum(len(shard) for shard in shards) == len(keys)
+    assert set.union(*shards) == set(keys)
+    assert all(shards)
+
+
+def test_shard_arguments(monkeypatch):
+    assert (get_args([]).shard_index, get_args([]).shard_count) == (0, 1)
+    args = get_args(['--shard-index', '3', '--shard-count', '4'])
+    assert (args.shard_index, args.shard_count) == (3, 4)
+    monkeypatch.setenv('SHARD_INDEX', '1')
+    monkeypatch.setenv('SHARD_COUNT', '2')
+    assert (get_args([]).shard_index, get_args([]).shard_count) == (1, 2)
+
+    for argv in (['--shard-index', '4', '--shard-count', '4'], ['--shard-index', '-1'], ['--shard-count', '0']):
+        with pytest.raises(SystemExit):
+            get_args(argv)
+
+
+def test_run_dates_isolates_failures(monkeypatch):
+    def process_date(date, _):
+        if date.day == 2:
+            raise ValueError('invalid input')
+        return {'input_bytes': date.day}
+    monkeypatch.setattr(service, 'process_date', process_date)
+    args = get_args(['--start-date', '20220101', '--end-date', '20220104'])
+
+    results = run_dates(processed_dates(args), args)
+
+    assert [result['status'] for result in results.values()] == ['succeeded', 'failed', 'succeeded']
+    assert results[datetime(2022, 1, 3)]['metrics'] == {'input_bytes': 3}
+    assert repr(ValueError('invalid input')) in summary_report(results)
+    assert summary_report(results).endswith('2 of 3 date(s) succeeded')
+
+
+def test_run_dates_in_worker_processes():
+    args = get_args(['--start-date', '20220101', '--end-date', '20220105', '--workers', '2'])
+
+    results = run_dates(processed_dates(args), args, workers=2)
+
+    assert list(results) == processed_dates(args)
+    assert all(result['status'] == 'succeeded' for result in results.values())
+
+
+def test_download_cache_skips_unchanged_reports(stub_api, tmp_path):
+    url = f'http://127.0.0.1:{stub_api.server_port}/report'
+    cache = DownloadCache(LocalCacheStore(str(tmp_path)))
+
+    async def fetch(download_cache):
+        async with AsyncFetcher() as fetcher:
+            return await download_cache.fetch(fetcher, url)
+
+    first = run_coroutine(fetch(cache))
+    assert first.changed and first.body == b'report'
+    # not processed successfully yet
+    assert run_coroutine(fetch(cache)).changed
+
+    cache.commit(first)
+    second = run_coroutine(fetch(cache))
+    assert not second.changed and second.body is None
+    assert run_coroutine(fetch(DownloadCache(cache.store, force=True))).changed
+    assert stub_api.requests.count('/report') == 4
+
+
+def test_download_cache_table_items_expire_and_fall_back_to_local_store(tmp_path):
+    class _DynamoDbClient:  # pylint: disable=too-few-public-methods
+        def __init__(self):
+            self.items = {}
+            self.denied = False
+
+        def get_item(self, TableName, Key, ConsistentRead):  # pylint: disable=invalid-name,unused-argument
+            if self.denied:
+                raise ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'GetItem')
+            return {'Item': self.items[Key['id']['S']]} if Key['id']['S'] in self.items else {}
+
+        def put_item(self, TableName, Item):  # pylint: disable=invalid-name,unused-argument
+            self.items[Item['id']['S']] = Item
+
+    client = _DynamoDbClient()
+    store = DynamoDbCacheStore('status-table', client=client, fallback=LocalCacheStore(str(tmp_path)))
+
+    store.put('s3://bucket/report', {'etag': '"v1"', 'last_modified': None})
+    item = client.items['download-cache#s3://bucket/report']
+    assert 0 < int(item['expires_at']['N']) - time.time() <= service.DOWNLOAD_CACHE_TTL_SECONDS
+    assert store.get('s3://bucket/report') == {'etag': '"v1"'}
+
+    client.denied = True
+    assert store.get('s3://bucket/report') is None
+    store.put('s3://bucket/report', {'etag': '"v2"'})
+    assert LocalCacheStore(str(tmp_path)).get('s3://bucket/report')['etag'] == '"v2"'
+    assert store.get('s3://bucket/report')['etag'] == '"v2"'
+
+
+def test_download_cache_compares_s3_etags(tmp_path):
+    class _S3Client:  # pylint: disable=too-few-public-methods
+        etag = '"v1"'
+
+        def head_object(self, Bucket, Key):  # pylint: disable=invalid-name,unused-argument
+            return {'ETag': self.etag, 'LastModified': datetime(2022, 1, 1)}
+
+    client = _S3Client()
+    cache = DownloadCache(LocalCacheStore(str(tmp_path)))
+
+    cache.commit(cache.check_s3('s3://bucket/report.csv', client))
+    assert not cache.check_s3('s3://bucket/report.csv', client).changed
+
+    client.etag = '"v2"'
+    assert cache.check_s3('s3://bucket/report.csv', client).changed
@@ -1,5 +1,6 @@
 """Data loader launcher stack"""
 from aws_cdk import (
+    aws_iam as iam,
     core,
 )
 from etl_pm_pipeline_cdk_common.ecs_base_stack import EcsStack
@@ -26,3 +27,22 @@ class DAG_NAME_CAMEL_CASEStack(EcsStack):
             ecs_task_exec_role_description="ecs task execution role"
         )
         # region_designator = get_region_designator(self.region)
+
+        # role of the service tasks, the services keep their state (e.g. the download cache) in the
+        # status table passed by `PmiEcsFargateOperator`, the service task definitions must use it
+        # as their `task_role` (exported below for task definitions of other stacks)
+        self.service_task_role = iam.Role(
+            self,
+            "ServiceTaskRole",
+            assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
+            description="DAG_NAME service task role",
+        )
+        prereqs_stack.status_table().grant_read_write_data(self.service_task_role)
+
+        core.CfnOutput(
+            self,
+            "ServiceTaskRoleArn",
+            value=self.service_task_role.role_arn,
+            description="ARN of the task role of the DAG_NAME service tasks",
+            export_name=f"{self.stack_name}:ServiceTaskRoleArn",
+        )
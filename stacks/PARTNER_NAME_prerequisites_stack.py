@@ -81,6 +81,8 @@ class PARTNER_NAME_CAMEL_CASEPrerequisitesStack(BasePrerequisitesStack):
                 name="id", type=dynamodb.AttributeType.STRING
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            # short-lived items (e.g. failure alert windows) set their expiry epoch seconds
+            time_to_live_attribute="expires_at",
             removal_policy=core.RemovalPolicy.DESTROY,
         )
 
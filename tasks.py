@@ -18,6 +18,9 @@ from invoke import task
 
 APP_NAME = 'etl-pm-pipeline-PARTNER_NAME'
 
+# shipped with the DAGs package, the DAGs validate the deployed configuration against it
+ENV_CONFIG_SCHEMA_PATH = 'dags/etl_pm_pipeline_PARTNER_NAME/envs-config.schema.json'
+
 AWS_STACKS = {
     'etl-pm-shared-{env_id}',
     'etl-pm-pipeline-PARTNER_NAME-{env_id}-prereqs',
@@ -34,7 +37,7 @@ def validate_stacks(ctx):
 def validate(ctx):
     lint_python_code(ctx, ['tasks.py'])
 
-    validate_json_schema(ctx, 'envs-config.json', 'envs-config.schema.json')
+    validate_json_schema(ctx, 'envs-config.json', ENV_CONFIG_SCHEMA_PATH)
 
 
 @task(help={